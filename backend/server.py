@@ -1,18 +1,41 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File, Body
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File, Body, Response, Request, Query
+from fastapi.responses import StreamingResponse, FileResponse
+from starlette.background import BackgroundTask
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
+from pymongo import IndexModel, InsertOne, UpdateOne, ReturnDocument, ASCENDING, DESCENDING
+from pymongo.errors import BulkWriteError, OperationFailure
+import bson
 import os
+import asyncio
+import json
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict, EmailStr
+from pydantic import BaseModel, Field, ConfigDict, EmailStr, ValidationError
 from typing import List, Optional
 import uuid
 from datetime import datetime, timezone, timedelta
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import io
+import time
 from passlib.context import CryptContext
 import jwt
 import base64
+import hashlib
+import re
+import zipfile
+import zlib
+import csv
+import heapq
+import tempfile
+
+import multiprocessing
+from PIL import Image, ImageOps
+import pandas as pd
+import openpyxl
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -110,6 +133,9 @@ class Family(BaseModel):
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: Optional[datetime] = None
 
+class FamilyListItem(Family):
+    image_thumbnails: List[str] = []  # روابط الصور المصغرة (للقوائم)
+
 class FamilyCreate(BaseModel):
     family_code: Optional[str] = None  # رمز العائلة
     fac_name: Optional[str] = None  # اسم الفاك (اسم مستعار)
@@ -133,11 +159,19 @@ class FamilyCreate(BaseModel):
     female_children_count: Optional[int] = 0
     male_children_count: Optional[int] = 0
 
+# Parsed Amount Model - القيمة الرقمية المستخرجة من نص المبلغ (تُحسب مرة واحدة عند الحفظ)
+class ParsedAmount(BaseModel):
+    value: float = 0.0  # مجموع الأرقام الموجودة في النص
+    currency: Optional[str] = None  # العملة (SYP, USD, ...)
+    unit: Optional[str] = None  # الوحدة للتبرعات العينية (سلة، كيلو، ...)
+    confidence: float = 0.0  # 1.0 رقم واحد، 0.5 عدة أرقام تم جمعها، 0.0 لا يوجد رقم
+
 # Donation Models - نموذج محسّن للتبرعات
 class Donation(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     family_id: str  # معرف العائلة المستفيدة
+    neighborhood_id: Optional[str] = None  # حي العائلة (نسخة مخزنة لاستعلامات اللجان)
     donor_id: Optional[str] = None  # معرف المتبرع (إذا كان مسجلاً)
     donor_name: str  # اسم المتبرع
     donor_phone: Optional[str] = None  # رقم هاتف المتبرع
@@ -145,6 +179,7 @@ class Donation(BaseModel):
     donation_type: str  # مالية، عينية، خدمية، أخرى
     transfer_type: str = "fixed"  # fixed (ثابت) or transferable (قابل للنقل)
     amount: str  # القيمة أو الكمية (نص حر مثل: "500 ريال" أو "سلة غذائية")
+    parsed_amount: Optional[ParsedAmount] = None  # القيمة الرقمية المستخرجة من amount
     description: str  # وصف المساعدة
     notes: Optional[str] = None  # ملاحظات إضافية
     status: str = "pending"  # pending, inprogress, completed, cancelled, rejected
@@ -528,8 +563,10 @@ class FamilyNeed(BaseModel):
     family_id: str  # معرف العائلة
     need_id: str  # معرف الاحتياج
     amount: Optional[str] = None  # المبلغ أو الكمية (نص)
+    parsed_amount: Optional[ParsedAmount] = None  # القيمة الرقمية المستخرجة من amount
     estimated_amount: float = 0.0  # المبلغ التقديري
     duration_type: str = "مرة واحدة"  # مرة واحدة أو شهري
+    month: Optional[str] = None  # الشهر للاحتياجات الشهرية (مثل: NOV-2025)
     notes: Optional[str] = None  # ملاحظات
     status: str = "pending"  # pending, fulfilled, cancelled
     is_active: bool = True  # نشط أو متوقف
@@ -546,6 +583,13 @@ class FamilyNeedCreate(BaseModel):
     estimated_amount: Optional[float] = 0.0
     notes: Optional[str] = None
 
+class FamilyNeedBatchItem(FamilyNeedCreate):
+    family_id: Optional[str] = None  # إذا لم يُحدد يُستخدم family_id العام للطلب
+
+class FamilyNeedBatchRequest(BaseModel):
+    family_id: Optional[str] = None  # العائلة الافتراضية لكل العناصر
+    needs: List[FamilyNeedBatchItem]
+
 class FamilyNeedUpdate(BaseModel):
     need_id: Optional[str] = None
     amount: Optional[str] = None
@@ -556,6 +600,12 @@ class FamilyNeedUpdate(BaseModel):
     estimated_amount: Optional[float] = None
     status: Optional[str] = None
 
+class FamilyNeedBatchUpdateItem(FamilyNeedUpdate):
+    id: str  # معرف سجل احتياج العائلة
+
+class FamilyNeedBatchUpdateRequest(BaseModel):
+    updates: List[FamilyNeedBatchUpdateItem]
+
 # Family Need Audit Log Models
 class FamilyNeedAuditLog(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -703,12 +753,248 @@ class HealthcareProviderUpdate(BaseModel):
 
 # ============= Helper Functions =============
 
+class TTLCache:
+    """ذاكرة مؤقتة داخل العملية (LRU) محدودة الحجم مع مدة صلاحية لكل عنصر"""
+
+    def __init__(self, maxsize: int, ttl_seconds: float):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        item = self._data.get(key)
+        if item is None or item[0] < time.monotonic():
+            if item is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def set(self, key, value, ttl_seconds: Optional[float] = None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+# ذاكرة مؤقتة للمستخدمين (user_id -> User) وللتوكنات المفكوكة (token -> user_id)
+# مدة الصلاحية قصيرة لأن كل عملية (worker) لها ذاكرتها الخاصة
+USER_CACHE_TTL_SECONDS = float(os.environ.get('USER_CACHE_TTL_SECONDS', 60))
+TOKEN_CACHE_TTL_SECONDS = float(os.environ.get('TOKEN_CACHE_TTL_SECONDS', 300))
+user_cache = TTLCache(maxsize=int(os.environ.get('USER_CACHE_SIZE', 1000)), ttl_seconds=USER_CACHE_TTL_SECONDS)
+token_cache = TTLCache(maxsize=int(os.environ.get('TOKEN_CACHE_SIZE', 5000)), ttl_seconds=TOKEN_CACHE_TTL_SECONDS)
+
+# حقول الصلاحيات تُقرأ من قاعدة البيانات في كل طلب (قراءة صغيرة بالفهرس) قبل الوثوق بالنسخة المؤقتة،
+# لأن invalidate_user_cache تمسح ذاكرة العملية الحالية فقط والعمال الآخرون يحتفظون بنسختهم حتى انتهاء TTL
+USER_AUTH_FIELDS = ("role", "is_active", "neighborhood_id", "committee_member_id")
+
+def invalidate_user_cache(user_id: str):
+    """يجب استدعاؤها بعد أي تعديل على بيانات المستخدم (الدور، الحالة، الملف الشخصي، كلمة المرور)"""
+    user_cache.pop(user_id)
+
+def user_auth_changed(cached_user: "User", auth_fields: dict) -> bool:
+    defaults = {"role": "user", "is_active": True}
+    return any(getattr(cached_user, field) != auth_fields.get(field, defaults.get(field)) for field in USER_AUTH_FIELDS)
+
+# ============= Reference Data Cache =============
+
+# مجموعات صغيرة نادرة التغيير تُقرأ في كل صفحة تقريباً
+REFERENCE_COLLECTIONS = [
+    "neighborhoods", "positions", "jobs", "education_levels", "user_roles",
+    "family_categories", "income_levels", "need_assessments", "needs",
+]
+# كل worker له نسخته - التعديل من worker آخر يظهر بعد هذه المدة على الأكثر
+REFERENCE_CACHE_TTL_SECONDS = float(os.environ.get('REFERENCE_CACHE_TTL_SECONDS', 300))
+
+class ReferenceDataCache:
+    """نسخة داخل العملية من المجموعات المرجعية مع رقم إصدار لكل مجموعة
+    
+    - bump(collection) يجب استدعاؤها بعد كل إضافة/تعديل/تفعيل/حذف
+    - المستندات المعادة مشتركة بين الطلبات ولا يجوز تعديلها
+    """
+
+    def __init__(self, collections: List[str], ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.versions = {collection: 0 for collection in collections}
+        self._data = {}  # collection -> (expires_at, docs, content_hash)
+        self._locks = {collection: asyncio.Lock() for collection in collections}
+        self.hits = 0
+        self.misses = 0
+
+    def _fresh(self, collection: str):
+        item = self._data.get(collection)
+        if item is None or item[0] < time.monotonic():
+            return None
+        return item
+
+    async def get(self, collection: str) -> List[dict]:
+        item = self._fresh(collection)
+        if item is None:
+            async with self._locks[collection]:  # طلب واحد يقرأ من MongoDB والباقي ينتظر
+                item = self._fresh(collection)
+                if item is None:
+                    self.misses += 1
+                    version = self.versions[collection]
+                    docs = await db[collection].find({}, {"_id": 0}).to_list(None)
+                    item = (time.monotonic() + self.ttl_seconds, docs, section_version(docs))
+                    # لا تُحفظ نسخة قُرئت قبل تعديل حدث أثناء القراءة
+                    if self.versions[collection] == version:
+                        self._data[collection] = item
+                    return docs
+        self.hits += 1
+        return item[1]
+
+    def bump(self, collection: str):
+        self.versions[collection] += 1
+        self._data.pop(collection, None)
+
+    def etag(self, collections: List[str]) -> Optional[str]:
+        """ETag لمجموعة من المجموعات بدون الوصول لقاعدة البيانات (None إذا لم تكن كلها محملة)"""
+        hashes = []
+        for collection in collections:
+            item = self._fresh(collection)
+            if item is None:
+                return None
+            hashes.append(f"{collection}:{item[2]}")
+        return '"' + hashlib.sha1(",".join(hashes).encode('utf-8')).hexdigest()[:20] + '"'
+
+    def stats(self) -> dict:
+        return {
+            "loaded": sorted(self._data),
+            "versions": dict(self.versions),
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+reference_cache = ReferenceDataCache(REFERENCE_COLLECTIONS, REFERENCE_CACHE_TTL_SECONDS)
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+# تشفير كلمات المرور (bcrypt) عملية ثقيلة (~250ms) لذلك تُنفذ في مجموعة threads محدودة
+# بدلاً من event loop حتى لا يتوقف باقي الطلبات أثناء موجات تسجيل الدخول
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+PASSWORD_HASH_MAX_QUEUE = int(os.environ.get('PASSWORD_HASH_MAX_QUEUE', 100))
+password_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+password_hash_stats = {
+    "in_flight": 0,
+    "max_queue_depth": 0,
+    "completed": 0,
+    "rejected": 0,
+    "total_wait_seconds": 0.0,
+    "max_wait_seconds": 0.0,
+}
+
+def password_hash_queue_depth() -> int:
+    return max(0, password_hash_stats["in_flight"] - PASSWORD_HASH_WORKERS)
+
+def password_hash_metrics() -> dict:
+    completed = password_hash_stats["completed"]
+    return {
+        **password_hash_stats,
+        "workers": PASSWORD_HASH_WORKERS,
+        "queue_depth": password_hash_queue_depth(),
+        "avg_wait_seconds": password_hash_stats["total_wait_seconds"] / completed if completed else 0.0
+    }
+
+async def run_password_job(func, *args):
+    """تنفيذ عملية bcrypt في مجموعة threads المخصصة مع قياس زمن الانتظار في الطابور"""
+    if password_hash_queue_depth() >= PASSWORD_HASH_MAX_QUEUE:
+        password_hash_stats["rejected"] += 1
+        raise HTTPException(status_code=503, detail="الخادم مشغول حالياً، يرجى المحاولة بعد قليل")
+
+    submitted_at = time.monotonic()
+
+    def job():
+        return time.monotonic(), func(*args)
+
+    password_hash_stats["in_flight"] += 1
+    password_hash_stats["max_queue_depth"] = max(password_hash_stats["max_queue_depth"], password_hash_queue_depth())
+    try:
+        started_at, result = await asyncio.get_running_loop().run_in_executor(password_hash_executor, job)
+    finally:
+        password_hash_stats["in_flight"] -= 1
+
+    wait_seconds = started_at - submitted_at
+    password_hash_stats["completed"] += 1
+    password_hash_stats["total_wait_seconds"] += wait_seconds
+    password_hash_stats["max_wait_seconds"] = max(password_hash_stats["max_wait_seconds"], wait_seconds)
+    return result
+
+async def verify_password_async(plain_password, hashed_password):
+    return await run_password_job(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    return await run_password_job(get_password_hash, password)
+
+AMOUNT_NUMBER_PATTERN = re.compile(r'\d+(?:\.\d+)?')
+AMOUNT_CURRENCIES = [
+    ("TRY", ["تركي", "TRY"]),
+    ("USD", ["$", "دولار", "USD"]),
+    ("EUR", ["€", "يورو", "EUR"]),
+    ("SAR", ["ريال", "SAR"]),
+    ("SYP", ["ل.س", "ليرة", "SYP", "S.P"]),
+]
+AMOUNT_UNITS = ["سلة", "سلال", "كيلو", "كغ", "kg", "لتر", "قطعة", "علبة", "كيس", "حصة", "وجبة"]
+# الكلمات العربية تُكتب مع حروف متصلة (بالدولار، ليرة تركية، دولارات)
+ARABIC_WORD_PREFIXES = "(?:وال|بال|فال|ال|لل|و|ب|ل|ف)?"
+ARABIC_WORD_SUFFIXES = "(?:ات|ان|ين|ية|ة|ا)?"
+
+def amount_marker_pattern(marker: str) -> re.Pattern:
+    """مطابقة العملة/الوحدة ككلمة كاملة فقط (try لا تطابق country) - الأرقام والرموز حولها مسموحة"""
+    pattern = re.escape(marker)
+    if re.fullmatch(r'[\u0600-\u06FF]+', marker):
+        pattern = ARABIC_WORD_PREFIXES + pattern + ARABIC_WORD_SUFFIXES
+    if marker[0].isalpha():
+        pattern = r'(?<![^\W\d_])' + pattern
+    if marker[-1].isalpha():
+        pattern += r'(?![^\W\d_])'
+    return re.compile(pattern, re.IGNORECASE)
+
+AMOUNT_CURRENCY_PATTERNS = [
+    (code, [amount_marker_pattern(marker) for marker in markers]) for code, markers in AMOUNT_CURRENCIES
+]
+AMOUNT_UNIT_PATTERNS = [(unit, amount_marker_pattern(unit)) for unit in AMOUNT_UNITS]
+
+def parse_amount(amount) -> dict:
+    """تحليل نص المبلغ الحر إلى قيمة رقمية وعملة ووحدة (يُستدعى مرة واحدة عند الحفظ)"""
+    text = str(amount or "")
+    # إزالة الفواصل والمسافات واستخراج جميع الأرقام (نفس منطق حساب المجاميع السابق)
+    clean_str = text.replace(",", "").replace(" ", "")
+    numbers = AMOUNT_NUMBER_PATTERN.findall(clean_str)
+    value = sum(float(num) for num in numbers)
+
+    currency = next(
+        (code for code, patterns in AMOUNT_CURRENCY_PATTERNS if any(p.search(text) for p in patterns)),
+        None
+    )
+    unit = next((u for u, pattern in AMOUNT_UNIT_PATTERNS if pattern.search(text)), None)
+
+    if not numbers:
+        confidence = 0.0
+    elif len(numbers) == 1:
+        confidence = 1.0
+    else:
+        confidence = 0.5
+
+    return ParsedAmount(value=value, currency=currency, unit=unit, confidence=confidence).model_dump()
+
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -722,15 +1008,33 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
+    user_id = token_cache.get(token)
+    if user_id is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            user_id: str = payload.get("sub")
+            if user_id is None:
+                raise credentials_exception
+        except jwt.PyJWTError:
             raise credentials_exception
-    except jwt.PyJWTError:
-        raise credentials_exception
+        
+        # لا نحتفظ بالتوكن في الذاكرة بعد انتهاء صلاحيته
+        ttl = TOKEN_CACHE_TTL_SECONDS
+        if payload.get("exp"):
+            ttl = min(ttl, payload["exp"] - datetime.now(timezone.utc).timestamp())
+        token_cache.set(token, user_id, ttl_seconds=ttl)
+    
+    cached_user = user_cache.get(user_id)
+    if cached_user is not None:
+        auth_fields = await db.users.find_one({"id": user_id}, {"_id": 0, **{field: 1 for field in USER_AUTH_FIELDS}})
+        if auth_fields is None:
+            user_cache.pop(user_id)
+            raise credentials_exception
+        if not user_auth_changed(cached_user, auth_fields):
+            return cached_user.model_copy()
+        user_cache.pop(user_id)  # تغير الدور أو الحالة من عامل آخر
     
-    user = await db.users.find_one({"id": user_id}, {"_id": 0})
+    user = await db.users.find_one({"id": user_id}, {"_id": 0, "password": 0})
     if user is None:
         raise credentials_exception
     
@@ -741,7 +1045,9 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     if user.get('email') == '':
         user['email'] = None
     
-    return User(**user)
+    user_obj = User(**user)
+    user_cache.set(user_id, user_obj)
+    return user_obj.model_copy()
 
 async def get_admin_user(current_user: User = Depends(get_current_user)):
     if current_user.role != "admin":
@@ -783,6 +1089,175 @@ def can_delete(current_user: User):
         raise HTTPException(status_code=403, detail="لا يمكنك حذف البيانات")
     return True
 
+# ============= Arabic Search Normalization =============
+
+# التشكيل والتطويل يُحذفان، وأشكال الحروف المتقاربة توحّد حتى يطابق "احمد" كلمة "أحمد"
+ARABIC_DIACRITICS_PATTERN = re.compile(r'[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED\u0640]')
+ARABIC_LETTER_MAP = str.maketrans({"أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا", "ى": "ي", "ة": "ه", "ؤ": "و", "ئ": "ي"})
+
+def normalize_search_text(text: Optional[str]) -> str:
+    text = ARABIC_DIACRITICS_PATTERN.sub("", text or "").translate(ARABIC_LETTER_MAP).lower()
+    return " ".join(re.findall(r"\w+", text))
+
+def audit_search_fields(doc: dict) -> dict:
+    """حقول البحث المخزنة لسجل الحركات (اسم الاحتياج واسم المستخدم)"""
+    search_text = normalize_search_text(f"{doc.get('need_name') or ''} {doc.get('user_name') or ''}")
+    return {"search_text": search_text, "search_tokens": sorted(set(search_text.split()))}
+
+# ============= Audit Sink (تسجيل الحركات المجمّع) =============
+
+class AuditSink:
+    """
+    كتابة سجلات الحركات (family_needs_audit_log, donation_history) على دفعات في الخلفية
+    - write لا ينتظر قاعدة البيانات في الوضع buffered
+    - التفريغ بـ insert_many عند اكتمال دفعة (batch_size) أو بعد flush_interval ثانية، وعند إيقاف الخادم
+    - الطابور محدود (max_queue): عند امتلائه تُسقط الأحداث الجديدة وتُحسب في dropped
+    - durability = "sync": كتابة مباشرة مع الانتظار (لا فقدان عند توقف الخادم المفاجئ)
+    """
+
+    def __init__(self, batch_size: int, flush_interval: float, max_queue: int, durability: str):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.durability = durability
+        self._buffer = []  # (collection_name, doc)
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.max_depth = 0
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._flusher())
+
+    async def write(self, collection_name: str, doc: dict):
+        await self.write_many(collection_name, [doc])
+
+    async def write_many(self, collection_name: str, docs: List[dict]):
+        if not docs:
+            return
+        if self.durability == "sync" or self._task is None:
+            await db[collection_name].insert_many(docs, ordered=False)
+            self.written += len(docs)
+            return
+        space = self.max_queue - len(self._buffer)
+        if space < len(docs):
+            self.dropped += len(docs) - max(space, 0)
+            docs = docs[:max(space, 0)]
+        self._buffer.extend((collection_name, doc) for doc in docs)
+        self.max_depth = max(self.max_depth, len(self._buffer))
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    async def _flusher(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        """كتابة كل الأحداث المعلّقة الآن"""
+        if not self._buffer or self._flush_lock is None:
+            return
+        async with self._flush_lock:
+            pending, self._buffer = self._buffer, []
+            by_collection = {}
+            for collection_name, doc in pending:
+                by_collection.setdefault(collection_name, []).append(doc)
+            batches = list(by_collection.items())
+            for index, (collection_name, docs) in enumerate(batches):
+                write = asyncio.ensure_future(self._write_batch(collection_name, docs))
+                try:
+                    await asyncio.shield(write)
+                except asyncio.CancelledError:
+                    # إيقاف الخادم أثناء الكتابة: ننتظر الدفعة الجارية ونعيد الباقي للطابور قبل الإلغاء
+                    await write
+                    self._buffer[:0] = [(name, doc) for name, rest in batches[index + 1:] for doc in rest]
+                    raise
+            self.flushes += 1
+
+    async def _write_batch(self, collection_name: str, docs: List[dict]):
+        try:
+            await db[collection_name].insert_many(docs, ordered=False)
+            self.written += len(docs)
+        except BulkWriteError as e:
+            # المستندات المكتوبة لا تُعاد (تجنب التكرار) - الفاشلة تُحسب كمفقودة
+            failed = len(e.details.get("writeErrors", []))
+            self.written += len(docs) - failed
+            self.dropped += failed
+            self.failed_flushes += 1
+        except Exception as e:
+            # خطأ اتصال: نعيد الأحداث للطابور لمحاولة لاحقة (ضمن الحد الأقصى)
+            self.failed_flushes += 1
+            space = self.max_queue - len(self._buffer)
+            retry = [(collection_name, doc) for doc in docs[:max(space, 0)]]
+            self.dropped += len(docs) - len(retry)
+            self._buffer[:0] = retry
+            logger.error(f"تعذر كتابة سجلات {collection_name}: {e}")
+
+    async def stop(self):
+        """إيقاف الكاتب مع تفريغ الأحداث المعلّقة (عند إيقاف الخادم)"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "durability": self.durability,
+            "queue_depth": len(self._buffer),
+            "max_depth": self.max_depth,
+            "written": self.written,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes
+        }
+
+audit_sink = AuditSink(
+    batch_size=int(os.environ.get('AUDIT_BATCH_SIZE', 200)),
+    flush_interval=float(os.environ.get('AUDIT_FLUSH_INTERVAL_SECONDS', 1.0)),
+    max_queue=int(os.environ.get('AUDIT_MAX_QUEUE', 10000)),
+    durability=os.environ.get('AUDIT_DURABILITY', 'buffered')
+)
+
+def build_need_audit_doc(
+    family_id: str,
+    need_record_id: Optional[str],
+    need_id: str,
+    need_name: str,
+    action_type: str,
+    user_id: str,
+    user_name: str,
+    changes: Optional[dict] = None,
+    notes: Optional[str] = None
+) -> dict:
+    log_entry = FamilyNeedAuditLog(
+        family_id=family_id,
+        need_id=need_id,
+        need_record_id=need_record_id,
+        need_name=need_name,
+        action_type=action_type,
+        user_id=user_id,
+        user_name=user_name,
+        changes=changes,
+        notes=notes
+    )
+    doc = log_entry.model_dump()
+    doc.update(audit_search_fields(doc))
+    return doc
+
 async def log_need_action(
     family_id: str,
     need_record_id: Optional[str],
@@ -796,23 +1271,8 @@ async def log_need_action(
 ):
     """تسجيل حركة على احتياج عائلة"""
     try:
-        log_entry = FamilyNeedAuditLog(
-            family_id=family_id,
-            need_id=need_id,
-            need_record_id=need_record_id,
-            need_name=need_name,
-            action_type=action_type,
-            user_id=user_id,
-            user_name=user_name,
-            changes=changes,
-            notes=notes
-        )
-        
-        doc = log_entry.model_dump()
-        doc['timestamp'] = doc['timestamp'].isoformat()
-        
-        await db.family_needs_audit_log.insert_one(doc)
-        print(f"✅ تم تسجيل الحركة: {action_type} - {need_name} بواسطة {user_name}")
+        doc = build_need_audit_doc(family_id, need_record_id, need_id, need_name, action_type, user_id, user_name, changes, notes)
+        await audit_sink.write("family_needs_audit_log", doc)
     except Exception as e:
         print(f"⚠️ خطأ في تسجيل الحركة: {e}")
         # لا نرمي خطأ هنا لأننا لا نريد أن يفشل العملية الأساسية بسبب فشل التسجيل
@@ -842,7 +1302,7 @@ async def register(user_input: UserCreate):
     
     # Create user
     user_dict = user_input.model_dump()
-    user_dict['password'] = get_password_hash(user_dict['password'])
+    user_dict['password'] = await get_password_hash_async(user_dict['password'])
     user_obj = User(**{k: v for k, v in user_dict.items() if k != 'password'})
     
     doc = user_obj.model_dump()
@@ -863,7 +1323,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
         # محاولة البحث بالبريد الإلكتروني
         user = await db.users.find_one({"email": form_data.username}, {"_id": 0})
     
-    if not user or not verify_password(form_data.password, user['password']):
+    if not user or not await verify_password_async(form_data.password, user['password']):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="رقم الجوال أو كلمة المرور غير صحيحة",
@@ -922,6 +1382,7 @@ async def update_user_role(
     result = await db.users.update_one({"id": user_id}, {"$set": {"role": role}})
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
+    invalidate_user_cache(user_id)
     
     return {"message": "User role updated successfully"}
 
@@ -950,6 +1411,7 @@ async def toggle_user_status(
     result = await db.users.update_one({"id": user_id}, {"$set": update_data})
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
+    invalidate_user_cache(user_id)
     
     return {"message": f"User {'activated' if is_active else 'deactivated'} successfully"}
 
@@ -980,6 +1442,7 @@ async def update_profile(
     if update_data:
         update_data['updated_at'] = datetime.now(timezone.utc)
         await db.users.update_one({"id": current_user.id}, {"$set": update_data})
+        invalidate_user_cache(current_user.id)
     
     # جلب المستخدم المحدث
     updated_user = await db.users.find_one({"id": current_user.id}, {"_id": 0})
@@ -1003,11 +1466,11 @@ async def change_password(
     # جلب المستخدم مع كلمة المرور
     user_doc = await db.users.find_one({"id": current_user.id})
     
-    if not user_doc or not verify_password(password_data.current_password, user_doc['password']):
+    if not user_doc or not await verify_password_async(password_data.current_password, user_doc['password']):
         raise HTTPException(status_code=400, detail="Current password is incorrect")
     
     # تشفير كلمة المرور الجديدة
-    hashed_password = get_password_hash(password_data.new_password)
+    hashed_password = await get_password_hash_async(password_data.new_password)
     
     # تحديث كلمة المرور
     await db.users.update_one(
@@ -1017,6 +1480,7 @@ async def change_password(
             "updated_at": datetime.now(timezone.utc)
         }}
     )
+    invalidate_user_cache(current_user.id)
     
     return {"message": "Password changed successfully"}
 
@@ -1066,6 +1530,7 @@ async def update_user_by_admin(
     
     # تحديث المستخدم
     await db.users.update_one({"id": user_id}, {"$set": update_dict})
+    invalidate_user_cache(user_id)
     
     # جلب المستخدم المحدث
     updated_user = await db.users.find_one({"id": user_id}, {"_id": 0})
@@ -1097,7 +1562,7 @@ async def reset_user_password(
         raise HTTPException(status_code=400, detail="كلمة المرور يجب أن تكون 6 أحرف على الأقل")
     
     # تشفير كلمة المرور الجديدة
-    hashed_password = get_password_hash(new_password)
+    hashed_password = await get_password_hash_async(new_password)
     
     # تحديث كلمة المرور
     await db.users.update_one(
@@ -1108,12 +1573,333 @@ async def reset_user_password(
             "updated_by_user_id": admin.id
         }}
     )
+    invalidate_user_cache(user_id)
     
     return {"message": f"تم تغيير كلمة المرور للمستخدم {user.get('full_name', 'N/A')} بنجاح"}
 
+# ============= Blob Storage (الصور والملفات) =============
+
+# الصور تُخزن مرة واحدة في GridFS باسم يساوي sha256 للمحتوى، والمستندات تحفظ رابطاً قصيراً فقط
+BLOB_URL_PREFIX = os.environ.get('BLOB_URL_PREFIX', '/api/blobs')
+BLOB_STREAM_CHUNK_SIZE = 255 * 1024
+blob_bucket = AsyncIOMotorGridFSBucket(db, bucket_name="blobs")
+DATA_URL_PATTERN = re.compile(r'^data:(?P<content_type>[\w.+-]+/[\w.+-]+)?(?:;[^,;]+=[^,;]+)*;base64,(?P<data>.*)$', re.DOTALL)
+
+# حقول الصور في كل مجموعة (نص أو قائمة نصوص) - تُستخدم في ترحيل الصور المضمّنة
+EMBEDDED_IMAGE_FIELDS = {
+    "families": ["image", "images"],
+    "donations": ["completion_images", "delivery_images"],
+    "neighborhoods": ["image", "logo"],
+    "committee_members": ["image"],
+    "healthcare_providers": ["image"],
+    "health_cases": ["image"],
+    "projects": ["image"],
+    "stories": ["image"],
+    "hero_content": ["background_image"],
+    "mission_content": ["hero_background_image", "vision_image"],
+}
+
+def blob_url(blob_hash: str) -> str:
+    return f"{BLOB_URL_PREFIX}/{blob_hash}"
+
+async def find_blob(blob_hash: str) -> Optional[dict]:
+    return await db["blobs.files"].find_one({"filename": blob_hash}, sort=[("uploadDate", -1)])
+
+def blob_hash_from_url(url) -> Optional[str]:
+    """الـ hash من رابط ملف (نسبي كما يُخزن، أو كامل كما تعرضه الواجهة)"""
+    if not isinstance(url, str):
+        return None
+    if url.startswith(("http://", "https://")):
+        url = "/" + url.split("://", 1)[1].partition("/")[2]
+    if url.startswith(f"{BLOB_URL_PREFIX}/"):
+        return url[len(BLOB_URL_PREFIX) + 1:].split("?", 1)[0]
+    return None
+
+async def save_blob(data: bytes, content_type: Optional[str], **metadata) -> str:
+    """حفظ محتوى ثنائي (مرة واحدة لكل محتوى) وإرجاع الـ hash"""
+    blob_hash = hashlib.sha256(data).hexdigest()
+    if not await find_blob(blob_hash):
+        await blob_bucket.upload_from_stream(
+            blob_hash, data,
+            metadata={"content_type": content_type or "application/octet-stream", **metadata}
+        )
+    return blob_hash
+
+async def store_blob(data: bytes, content_type: Optional[str]) -> str:
+    """حفظ محتوى ثنائي وإرجاع رابطه"""
+    return blob_url(await save_blob(data, content_type))
+
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_BYTES', 10 * 1024 * 1024))
+UPLOAD_CHUNK_SIZE = 256 * 1024
+
+# التعرف على نوع الصورة من أول بايتات الملف (لا نثق بالـ content_type القادم من المتصفح)
+IMAGE_SIGNATURES = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+]
+
+# SVG (شعارات وأيقونات) نص XML - يُرسل مع CSP sandbox حتى لا تعمل السكربتات المضمنة فيه
+SVG_CONTENT_TYPE = "image/svg+xml"
+SVG_CONTENT_SECURITY_POLICY = "sandbox; default-src 'none'; style-src 'unsafe-inline'; img-src data:"
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:12] in (b"ftypheic", b"ftypheix", b"ftypmif1", b"ftypavif"):
+        return "image/avif" if head[8:12] == b"avif" else "image/heic"
+    for signature, content_type in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    text = head.lstrip(b"\xef\xbb\xbf \t\r\n").lower()
+    if text.startswith(b"<svg") or (text.startswith((b"<?xml", b"<!doctype svg", b"<!--")) and b"<svg" in text):
+        return SVG_CONTENT_TYPE
+    return None
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    """مقارنة If-None-Match (قائمة مفصولة بفواصل، * ، W/) مع ETag بالمساواة (مقارنة ضعيفة كما في RFC 9110)"""
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    current = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == current for tag in if_none_match.split(","))
+
+async def store_upload(file: UploadFile) -> str:
+    """
+    حفظ صورة مرفوعة في مخزن الملفات على دفعات (ذاكرة ثابتة لكل رفع)
+    - الحد الأقصى للحجم MAX_UPLOAD_BYTES
+    - حساب sha256 أثناء الكتابة ثم إعادة التسمية (أو الحذف إذا كان المحتوى موجوداً مسبقاً)
+    """
+    first_chunk = await file.read(UPLOAD_CHUNK_SIZE)
+    content_type = sniff_image_type(first_chunk)
+    if not content_type:
+        raise HTTPException(status_code=415, detail="نوع الملف غير مدعوم، يرجى رفع صورة")
+    
+    digest = hashlib.sha256()
+    size = 0
+    grid_in = blob_bucket.open_upload_stream(f"upload-{uuid.uuid4()}", metadata={"content_type": content_type})
+    try:
+        chunk = first_chunk
+        while chunk:
+            size += len(chunk)
+            if size > MAX_UPLOAD_BYTES:
+                raise HTTPException(status_code=413, detail=f"حجم الملف أكبر من المسموح ({MAX_UPLOAD_BYTES // (1024 * 1024)}MB)")
+            digest.update(chunk)
+            await grid_in.write(chunk)
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        await grid_in.close()
+    except BaseException:
+        await grid_in.abort()
+        raise
+    
+    blob_hash = digest.hexdigest()
+    if await find_blob(blob_hash):
+        await blob_bucket.delete(grid_in._id)
+    else:
+        await blob_bucket.rename(grid_in._id, blob_hash)
+    return blob_url(blob_hash)
+
+async def store_data_url(value):
+    """تحويل data URL (base64) إلى رابط blob - القيم الأخرى (روابط عادية) تُعاد كما هي"""
+    blob_hash = blob_hash_from_url(value)
+    if blob_hash:
+        return blob_url(blob_hash)  # الرابط الكامل المرسل للواجهة يُخزن نسبياً
+    if not isinstance(value, str) or not value.startswith("data:"):
+        return value
+    match = DATA_URL_PATTERN.match(value)
+    if not match:
+        return value
+    data = await asyncio.to_thread(base64.b64decode, match.group("data"))
+    return await store_blob(data, match.group("content_type"))
+
+async def store_data_urls(values):
+    if isinstance(values, list):
+        return [await store_data_url(value) for value in values]
+    return await store_data_url(values)
+
+async def normalize_image_fields(collection_name: str, data: dict) -> dict:
+    """حقول الصور قبل كل حفظ: data URL -> مخزن الملفات، وروابط ملفاتنا تُخزن نسبية (/api/blobs/...)"""
+    for field in EMBEDDED_IMAGE_FIELDS.get(collection_name, []):
+        if data.get(field):
+            data[field] = await store_data_urls(data[field])
+    return data
+
+# ============= Image Renditions (الصور المصغرة WebP) =============
+
+# الحجم الأقصى (بالبكسل) لكل نسخة - original تحافظ على الأبعاد وتُحوّل إلى WebP فقط
+IMAGE_RENDITIONS = {"thumbnail": 320, "medium": 1280, "original": None}
+IMAGE_WEBP_QUALITY = int(os.environ.get('IMAGE_WEBP_QUALITY', 80))
+IMAGE_PROCESS_WORKERS = int(os.environ.get('IMAGE_PROCESS_WORKERS', 2))
+image_process_pool = None
+image_rendition_jobs = {}
+
+def render_webp_renditions(data: bytes) -> dict:
+    """توليد نسخ WebP للصورة - تعمل في process منفصل (عملية ثقيلة على المعالج)"""
+    renditions = {}
+    with Image.open(io.BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info or "A" in image.getbands() else "RGB")
+        for name, max_size in IMAGE_RENDITIONS.items():
+            rendition = image.copy()
+            if max_size:
+                rendition.thumbnail((max_size, max_size))
+            buffer = io.BytesIO()
+            rendition.save(buffer, "WEBP", quality=IMAGE_WEBP_QUALITY)
+            renditions[name] = buffer.getvalue()
+    return renditions
+
+def get_image_process_pool() -> ProcessPoolExecutor:
+    global image_process_pool
+    if image_process_pool is None:
+        # spawn بدلاً من fork: العملية الحالية فيها threads (Motor) وقد ترث العمليات الفرعية أقفالاً مقفلة
+        image_process_pool = ProcessPoolExecutor(
+            max_workers=IMAGE_PROCESS_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return image_process_pool
+
+async def generate_image_renditions(blob_hash: str):
+    """توليد نسخ الصورة وحفظها كملفات مستقلة مع ربطها في metadata الملف الأصلي"""
+    try:
+        file_doc = await find_blob(blob_hash)
+        if not file_doc:
+            return
+        metadata = file_doc.get("metadata") or {}
+        content_type = metadata.get("content_type", "")
+        if (metadata.get("renditions") or metadata.get("renditions_failed") or metadata.get("rendition_of")
+                or not content_type.startswith("image/") or content_type == SVG_CONTENT_TYPE):
+            return
+        grid_out = await blob_bucket.open_download_stream(file_doc["_id"])
+        data = await grid_out.read()
+        try:
+            renditions = await asyncio.get_running_loop().run_in_executor(get_image_process_pool(), render_webp_renditions, data)
+        except Exception as e:
+            # صيغة لا تستطيع Pillow قراءتها (مثل HEIC): لا نعيد المحاولة مع كل طلب
+            await db["blobs.files"].update_many({"filename": blob_hash}, {"$set": {"metadata.renditions_failed": str(e)}})
+            logger.warning(f"تعذر توليد الصور المصغرة للملف {blob_hash}: {e}")
+            return
+        rendition_hashes = {}
+        for name, content in renditions.items():
+            rendition_hashes[name] = await save_blob(content, "image/webp", rendition_of=blob_hash)
+        await db["blobs.files"].update_many({"filename": blob_hash}, {"$set": {"metadata.renditions": rendition_hashes}})
+    except Exception as e:
+        logger.error(f"خطأ في توليد الصور المصغرة للملف {blob_hash}: {e}")
+
+def schedule_image_renditions(urls):
+    """جدولة توليد النسخ في الخلفية (بدون انتظار)"""
+    for url in (urls if isinstance(urls, list) else [urls]):
+        blob_hash = blob_hash_from_url(url)
+        if not blob_hash or blob_hash in image_rendition_jobs:
+            continue
+        task = asyncio.create_task(generate_image_renditions(blob_hash))
+        image_rendition_jobs[blob_hash] = task
+        task.add_done_callback(lambda _, h=blob_hash: image_rendition_jobs.pop(h, None))
+
+def rendition_url(url, rendition: str = "thumbnail"):
+    """رابط نسخة مصغرة للصور المخزنة - الروابط الأخرى تُعاد كما هي"""
+    blob_hash = blob_hash_from_url(url)
+    return f"{blob_url(blob_hash)}?rendition={rendition}" if blob_hash else url
+
+def add_image_thumbnails(family: dict) -> dict:
+    family['image_thumbnails'] = [rendition_url(url) for url in family.get('images') or []]
+    return family
+
+def parse_range_header(range_header: str, length: int):
+    """قراءة ترويسة Range (مجال واحد فقط) وإرجاع (start, end) أو None إذا كان غير صالح"""
+    match = re.fullmatch(r'bytes=(\d*)-(\d*)', range_header.strip())
+    if not match or (not match.group(1) and not match.group(2)):
+        return None
+    if match.group(1):
+        start = int(match.group(1))
+        end = int(match.group(2)) if match.group(2) else length - 1
+    else:
+        # bytes=-N (آخر N بايت)
+        start = max(0, length - int(match.group(2)))
+        end = length - 1
+    end = min(end, length - 1)
+    if start > end or start >= length:
+        return None
+    return start, end
+
+@api_router.get("/blobs/{blob_hash}")
+async def get_blob(blob_hash: str, request: Request, rendition: Optional[str] = None):
+    """تحميل صورة/ملف مع دعم ETag (304) و Range (206)
+    
+    - rendition: thumbnail أو medium أو original (WebP) - إذا لم تكن جاهزة بعد تُرسل الصورة الأصلية
+    """
+    file_doc = await find_blob(blob_hash)
+    if not file_doc:
+        raise HTTPException(status_code=404, detail="الملف غير موجود")
+    
+    # المحتوى لا يتغير أبداً لأن الاسم هو hash المحتوى
+    cache_control = "public, max-age=31536000, immutable"
+    if rendition:
+        if rendition not in IMAGE_RENDITIONS:
+            raise HTTPException(status_code=400, detail="نوع النسخة غير مدعوم")
+        metadata = file_doc.get("metadata") or {}
+        rendition_hash = (metadata.get("renditions") or {}).get(rendition)
+        rendition_doc = await find_blob(rendition_hash) if rendition_hash else None
+        if rendition_doc:
+            blob_hash, file_doc = rendition_hash, rendition_doc
+        elif metadata.get("renditions_failed") or metadata.get("content_type") == SVG_CONTENT_TYPE:
+            pass  # لا توجد نسخ لهذا الملف (SVG أو صيغة غير مدعومة): يُرسل الأصل
+        else:
+            # النسخة غير جاهزة: نرسل الأصل مؤقتاً ونولّد النسخ في الخلفية
+            schedule_image_renditions(blob_url(blob_hash))
+            cache_control = "public, max-age=60"
+    
+    length = file_doc["length"]
+    etag = f'"{blob_hash}"'
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": cache_control,
+    }
+    if (file_doc.get("metadata") or {}).get("content_type") == SVG_CONTENT_TYPE:
+        headers["Content-Security-Policy"] = SVG_CONTENT_SECURITY_POLICY
+        headers["X-Content-Type-Options"] = "nosniff"
+    
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    
+    start, end = 0, length - 1
+    status_code = 200
+    range_header = request.headers.get("range")
+    if range_header and length:
+        byte_range = parse_range_header(range_header, length)
+        if byte_range is None:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{length}"})
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{length}"
+    headers["Content-Length"] = str(end - start + 1 if length else 0)
+    
+    grid_out = await blob_bucket.open_download_stream(file_doc["_id"])
+    grid_out.seek(start)
+    
+    async def stream():
+        remaining = end - start + 1 if length else 0
+        while remaining > 0:
+            chunk = await grid_out.read(min(BLOB_STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    
+    return StreamingResponse(
+        stream(),
+        status_code=status_code,
+        media_type=(file_doc.get("metadata") or {}).get("content_type", "application/octet-stream"),
+        headers=headers
+    )
+
 # ============= Family Routes =============
 
-@api_router.get("/families", response_model=List[Family])
+@api_router.get("/families", response_model=List[FamilyListItem])
 async def get_families(current_user: User = Depends(get_admin_or_committee_user)):
     """جلب العائلات - مع فلترة حسب الحي لموظفي اللجنة"""
     query = filter_by_neighborhood(current_user, {})
@@ -1123,27 +1909,36 @@ async def get_families(current_user: User = Depends(get_admin_or_committee_user)
             family['created_at'] = datetime.fromisoformat(family['created_at'])
         if isinstance(family.get('updated_at'), str):
             family['updated_at'] = datetime.fromisoformat(family['updated_at'])
+        add_image_thumbnails(family)
     return families
 
 # ============= Public Routes (لا تحتاج authentication) =============
 
+# الإحصائيات العامة تُطلب في كل زيارة للصفحة الرئيسية - نحفظها مؤقتاً ونمسحها عند تعديل العائلات أو التصنيفات
+PUBLIC_STATS_CACHE_TTL_SECONDS = float(os.environ.get('PUBLIC_STATS_CACHE_TTL_SECONDS', 60))
+public_stats_cache = TTLCache(maxsize=1, ttl_seconds=PUBLIC_STATS_CACHE_TTL_SECONDS)
+
+def invalidate_public_stats():
+    """يجب استدعاؤها بعد إضافة/تعديل/تفعيل العائلات أو التصنيفات"""
+    public_stats_cache.clear()
+
 @api_router.get("/public/families-stats")
 async def get_public_families_stats():
     """إحصائيات عامة للعائلات حسب التصنيفات - بدون authentication"""
+    cached = public_stats_cache.get("families_stats")
+    if cached is not None:
+        return cached
     try:
-        # جلب جميع العائلات النشطة
-        families = await db.families.find({"is_active": {"$ne": False}}, {"_id": 0, "id": 1, "category_id": 1}).to_list(10000)
+        # عدد العائلات النشطة لكل تصنيف (داخل قاعدة البيانات)
+        counts = await db.families.aggregate([
+            {"$match": {"is_active": {"$ne": False}}},
+            {"$group": {"_id": "$category_id", "count": {"$sum": 1}}}
+        ]).to_list(None)
+        category_counts = {item["_id"]: item["count"] for item in counts}
         
         # جلب جميع التصنيفات النشطة
         categories = await db.family_categories.find({"is_active": {"$ne": False}}, {"_id": 0}).to_list(1000)
         
-        # حساب عدد العائلات لكل تصنيف
-        category_counts = {}
-        for family in families:
-            cat_id = family.get('category_id')
-            if cat_id:
-                category_counts[cat_id] = category_counts.get(cat_id, 0) + 1
-        
         # إضافة العدد لكل تصنيف
         result = []
         for category in categories:
@@ -1152,10 +1947,12 @@ async def get_public_families_stats():
                 "families_count": category_counts.get(category['id'], 0)
             })
         
-        return {
+        stats = {
             "categories": result,
-            "total_families": len(families)
+            "total_families": sum(category_counts.values())
         }
+        public_stats_cache.set("families_stats", stats)
+        return stats
     except Exception as e:
         print(f"Error in get_public_families_stats: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1191,6 +1988,7 @@ async def get_families_by_category(
                 family['created_at'] = datetime.fromisoformat(family['created_at'])
             if isinstance(family.get('updated_at'), str):
                 family['updated_at'] = datetime.fromisoformat(family['updated_at'])
+            add_image_thumbnails(family)
         
         return families
     except Exception as e:
@@ -1218,40 +2016,275 @@ async def get_family(family_id: str):
         family['created_at'] = datetime.fromisoformat(family['created_at'])
     return Family(**family)
 
+# ============= Family Number Counter =============
+
+FAMILY_NUMBER_COUNTER_ID = "family_number"
+family_number_counter_seeded = False  # العداد موجود - لا حاجة لفحصه مرة أخرى في هذه العملية
+
+def format_family_number(number: int) -> str:
+    return f"FAM-{number:03d}"
+
+async def allocate_family_numbers(count: int = 1) -> List[str]:
+    """
+    حجز أرقام عائلات متتالية بعملية ذرية واحدة على مجموعة counters
+    - آمن مع الإضافة المتزامنة من عدة موظفين
+    - count > 1 يحجز مجموعة أرقام دفعة واحدة (للاستيراد)
+    - إذا لم يُنشأ العداد بعد (ترحيل v6 يعمل في الخلفية) يُهيأ أولاً من أكبر رقم موجود
+    """
+    global family_number_counter_seeded
+    if not family_number_counter_seeded:
+        if not await db.counters.find_one({"id": FAMILY_NUMBER_COUNTER_ID}, {"_id": 1}):
+            await seed_family_number_counter()  # $max - آمن إذا هيأه طلب آخر بالتوازي
+        family_number_counter_seeded = True
+    counter = await db.counters.find_one_and_update(
+        {"id": FAMILY_NUMBER_COUNTER_ID},
+        {"$inc": {"value": count}},
+        projection={"_id": 0, "value": 1},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    last_number = counter["value"]
+    return [format_family_number(number) for number in range(last_number - count + 1, last_number + 1)]
+
 @api_router.post("/families", response_model=Family)
 async def create_family(family_input: FamilyCreate, current_user: User = Depends(get_admin_or_committee_user)):
-    family_dict = family_input.model_dump()
-    
-    # توليد رقم العائلة تلقائياً
-    # نحصل على آخر رقم عائلة ونزيد واحد
-    last_family = await db.families.find_one(
-        {"family_number": {"$exists": True, "$ne": None}},
-        {"_id": 0, "family_number": 1},
-        sort=[("family_number", -1)]
+    family_input = family_input.model_copy(
+        update=await normalize_image_fields("families", family_input.model_dump(include={"image", "images"}))
     )
+    # توليد رقم العائلة تلقائياً من العداد
+    family_number = (await allocate_family_numbers(1))[0]
+    family_obj, doc = build_family_document(family_input, family_number, current_user.id)
     
-    if last_family and last_family.get('family_number'):
-        # استخراج الرقم من الصيغة FAM-001
-        try:
-            last_num = int(last_family['family_number'].split('-')[1])
-            new_num = last_num + 1
-        except:
-            new_num = 1
-    else:
-        new_num = 1
-    
-    family_dict['family_number'] = f"FAM-{new_num:03d}"
+    await db.families.insert_one(doc)
+    invalidate_public_stats()
+    return family_obj
+
+def build_family_document(family_input: FamilyCreate, family_number: str, user_id: str):
+    """تجهيز مستند عائلة جديدة للحفظ - يعيد (Family, doc)"""
+    family_dict = family_input.model_dump()
+    family_dict['family_number'] = family_number
     
     # حفظ معرف المستخدم الذي أضاف العائلة
-    family_dict['created_by_user_id'] = current_user.id
+    family_dict['created_by_user_id'] = user_id
+    
+    # تهيئة المبالغ الإجمالية (يتم تحديثها لاحقاً بالفروقات عبر $inc)
+    family_dict['donations_by_status'] = empty_donations_by_status()
+    family_dict['inactive_donations_by_status'] = empty_donations_by_status()
     
     family_obj = Family(**family_dict)
     
     doc = family_obj.model_dump()
     doc['created_at'] = doc['created_at'].isoformat()
+    return family_obj, doc
+
+# ============= Family Import (CSV / Excel) =============
+
+FAMILY_IMPORT_BATCH_SIZE = int(os.environ.get('FAMILY_IMPORT_BATCH_SIZE', 500))
+FAMILY_IMPORT_MAX_BYTES = int(os.environ.get('FAMILY_IMPORT_MAX_BYTES', 10 * 1024 * 1024))
+FAMILY_IMPORT_MAX_ROWS = int(os.environ.get('FAMILY_IMPORT_MAX_ROWS', 20000))
+
+# أسماء الأعمدة المقبولة في ملف الاستيراد (بالعربية) - أسماء الحقول الإنجليزية مقبولة أيضاً
+FAMILY_IMPORT_COLUMNS = {
+    "رمز العائلة": "family_code",
+    "اسم الفاك": "fac_name",
+    "الاسم": "name",
+    "اسم العائلة": "name",
+    "الهاتف": "phone",
+    "رقم الهاتف": "phone",
+    "الاسم الأول للمعيل": "provider_first_name",
+    "اسم الأب للمعيل": "provider_father_name",
+    "الكنية للمعيل": "provider_surname",
+    "عدد الأفراد": "members_count",
+    "الوصف": "description",
+    "الاحتياج الشهري": "monthly_need",
+    "الحي": "neighborhood_id",
+    "التصنيف": "category_id",
+    "مستوى الدخل": "income_level_id",
+    "تقييم الاحتياج": "need_assessment_id",
+    "الأب موجود": "father_present",
+    "الأم موجودة": "mother_present",
+    "عدد الأطفال الإناث": "female_children_count",
+    "عدد الأطفال الذكور": "male_children_count",
+}
+
+# الحقول المرجعية: تقبل المعرف أو الاسم
+FAMILY_IMPORT_REFERENCES = {
+    "neighborhood_id": "neighborhoods",
+    "category_id": "family_categories",
+    "income_level_id": "income_levels",
+    "need_assessment_id": "need_assessments",
+}
+
+BOOLEAN_IMPORT_VALUES = {"نعم": True, "لا": False, "موجود": True, "موجودة": True, "غير موجود": False, "غير موجودة": False}
+
+def iter_spreadsheet_rows(file_obj, is_excel: bool):
+    """قراءة الملف على دفعات (قوائم من (رقم الصف، القيم)) بدون تحميله كاملاً في الذاكرة"""
+    if is_excel:
+        workbook = openpyxl.load_workbook(file_obj, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            headers = [str(h).strip() if h is not None else "" for h in next(rows, [])]
+            batch = []
+            for row_number, values in enumerate(rows, start=2):
+                batch.append((row_number, dict(zip(headers, values))))
+                if len(batch) >= FAMILY_IMPORT_BATCH_SIZE:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+        finally:
+            workbook.close()
+    else:
+        row_number = 2
+        reader = pd.read_csv(file_obj, dtype=str, keep_default_na=False, encoding="utf-8-sig", chunksize=FAMILY_IMPORT_BATCH_SIZE)
+        for chunk in reader:
+            records = chunk.rename(columns=lambda c: str(c).strip()).to_dict("records")
+            yield [(row_number + i, record) for i, record in enumerate(records)]
+            row_number += len(records)
+
+def normalize_import_row(raw: dict, references: dict, ignored_fields=()):
+    """تحويل صف من الملف إلى حقول FamilyCreate (أسماء الأعمدة، القيم المرجعية، القيم المنطقية)
+    
+    يعيد (row, problems) حيث problems قائمة القيم المرجعية غير الموجودة
+    - ignored_fields: حقول تُهمل من الملف (مثل الحي المفروض على موظفي اللجنة)
+    """
+    row = {}
+    problems = []
+    for column, value in raw.items():
+        field = FAMILY_IMPORT_COLUMNS.get(column, column)
+        if field not in FamilyCreate.model_fields or field in ignored_fields:
+            continue
+        if isinstance(value, str):
+            value = unescape_formula(value.strip())
+        if value is None or value == "":
+            continue
+        if field in FAMILY_IMPORT_REFERENCES:
+            if str(value) not in references[field]:
+                problems.append(f"{column}: القيمة '{value}' غير موجودة")
+                continue
+            value = references[field][str(value)]
+        elif field in ("father_present", "mother_present") and isinstance(value, str):
+            value = BOOLEAN_IMPORT_VALUES.get(value, value)
+        elif isinstance(value, float) and value.is_integer() and field.endswith("_count"):
+            value = int(value)
+        row[field] = value
+    return row, problems
+
+async def load_import_references() -> dict:
+    """جدول (الاسم أو المعرف -> المعرف) لكل حقل مرجعي"""
+    references = {}
+    for field, collection in FAMILY_IMPORT_REFERENCES.items():
+        lookup = {}
+        for item in await reference_cache.get(collection):
+            lookup[item["id"]] = item["id"]
+            if item.get("name"):
+                lookup[item["name"]] = item["id"]
+        references[field] = lookup
+    return references
+
+@api_router.post("/families/import")
+async def import_families(
+    file: UploadFile = File(...),
+    dry_run: bool = False,
+    current_user: User = Depends(get_admin_or_committee_user)
+):
+    """
+    استيراد عائلات من ملف CSV أو Excel (xlsx)
+    - الصف الأول: أسماء الأعمدة (بالعربية كما في FAMILY_IMPORT_COLUMNS أو أسماء الحقول)
+    - الحي والتصنيف ومستوى الدخل وتقييم الاحتياج: بالاسم أو المعرف
+    - الصفوف غير الصالحة لا تُضاف وتظهر في errors مع رقم الصف
+    - dry_run=true: التحقق فقط بدون حفظ
+    - الحد الأقصى FAMILY_IMPORT_MAX_BYTES للملف و FAMILY_IMPORT_MAX_ROWS صفاً (ما بعده لا يُقرأ ويعود truncated)
+    """
+    filename = (file.filename or "").lower()
+    is_excel = filename.endswith((".xlsx", ".xlsm"))
     
-    await db.families.insert_one(doc)
-    return family_obj
+    file.file.seek(0, os.SEEK_END)
+    if file.file.tell() > FAMILY_IMPORT_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"حجم الملف أكبر من المسموح ({FAMILY_IMPORT_MAX_BYTES // (1024 * 1024)}MB)")
+    file.file.seek(0)
+    
+    references = await load_import_references()
+    forced_neighborhood_id = None
+    ignored_fields = ()
+    if current_user.role in ["committee_member", "committee_president"]:
+        # موظفو اللجنة يستوردون عائلات حيّهم فقط (عمود الحي في الملف يُهمل)
+        forced_neighborhood_id = filter_by_neighborhood(current_user)["neighborhood_id"]
+        ignored_fields = ("neighborhood_id",)
+    
+    imported = 0
+    total_rows = 0
+    truncated = False
+    errors = []
+    family_numbers = []
+    rows = iter_spreadsheet_rows(file.file, is_excel)
+    try:
+        while not truncated:
+            # قراءة وتحليل الدفعة التالية خارج event loop
+            batch = await asyncio.to_thread(next, rows, None)
+            if batch is None:
+                break
+            if total_rows + len(batch) > FAMILY_IMPORT_MAX_ROWS:
+                batch = batch[:FAMILY_IMPORT_MAX_ROWS - total_rows]
+                truncated = True
+            total_rows += len(batch)
+            
+            valid = []
+            for row_number, raw in batch:
+                row, problems = normalize_import_row(raw, references, ignored_fields)
+                if not row and not problems:
+                    total_rows -= 1  # صف فارغ
+                    continue
+                if forced_neighborhood_id:
+                    row["neighborhood_id"] = forced_neighborhood_id
+                try:
+                    family_input = FamilyCreate(**row)
+                except ValidationError as e:
+                    problems += [f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()]
+                if problems:
+                    errors.append({"row": row_number, "errors": problems})
+                else:
+                    valid.append((row_number, family_input))
+            
+            if dry_run or not valid:
+                continue
+            
+            # حجز أرقام الدفعة كاملة بعملية واحدة ثم الحفظ بـ bulk_write
+            numbers = await allocate_family_numbers(len(valid))
+            operations = [
+                InsertOne(build_family_document(family_input, number, current_user.id)[1])
+                for (_, family_input), number in zip(valid, numbers)
+            ]
+            try:
+                result = await db.families.bulk_write(operations, ordered=False)
+                imported += result.inserted_count
+                family_numbers.extend(numbers)
+            except BulkWriteError as e:
+                # ordered=False: باقي صفوف الدفعة حُفظت - الصفوف الفاشلة تُضاف إلى errors
+                imported += e.details.get("nInserted", 0)
+                failed = {}
+                for write_error in e.details.get("writeErrors", []):
+                    failed[write_error["index"]] = write_error.get("errmsg", "")
+                for index, ((row_number, _), number) in enumerate(zip(valid, numbers)):
+                    if index in failed:
+                        errors.append({"row": row_number, "errors": [f"تعذر الحفظ: {failed[index]}"]})
+                    else:
+                        family_numbers.append(number)
+            invalidate_public_stats()
+    except (ValueError, UnicodeDecodeError, zipfile.BadZipFile) as e:
+        raise HTTPException(status_code=400, detail=f"تعذر قراءة الملف: {str(e)}")
+    
+    return {
+        "dry_run": dry_run,
+        "truncated": truncated,
+        "total_rows": total_rows,
+        "valid_rows": total_rows - len(errors),
+        "imported": imported,
+        "failed": len(errors),
+        "errors": errors,
+        "first_family_number": family_numbers[0] if family_numbers else None,
+        "last_family_number": family_numbers[-1] if family_numbers else None
+    }
 
 @api_router.put("/families/{family_id}", response_model=Family)
 async def update_family(family_id: str, family_input: FamilyCreate, current_user: User = Depends(get_admin_or_committee_user)):
@@ -1272,8 +2305,14 @@ async def update_family(family_id: str, family_input: FamilyCreate, current_user
     
     # حفظ معرف المستخدم الذي قام بالتعديل
     update_data['updated_by_user_id'] = current_user.id
+    await normalize_image_fields("families", update_data)
     
     await db.families.update_one({"id": family_id}, {"$set": update_data})
+    invalidate_public_stats()
+    
+    # نقل تبرعات العائلة للحي الجديد عند تغيير الحي
+    if existing.get('neighborhood_id') != update_data.get('neighborhood_id'):
+        await sync_donations_neighborhood(family_id, update_data.get('neighborhood_id'))
     
     updated = await db.families.find_one({"id": family_id}, {"_id": 0})
     if isinstance(updated.get('created_at'), str):
@@ -1289,10 +2328,9 @@ async def add_family_image(family_id: str, file: UploadFile = File(...), current
     if not family:
         raise HTTPException(status_code=404, detail="Family not found")
     
-    # قراءة الصورة وتحويلها إلى Base64
-    contents = await file.read()
-    base64_image = base64.b64encode(contents).decode('utf-8')
-    image_url = f"data:{file.content_type};base64,{base64_image}"
+    # حفظ الصورة في مخزن الملفات وإضافة رابطها فقط إلى العائلة
+    image_url = await store_upload(file)
+    schedule_image_renditions(image_url)
     
     # إضافة الصورة إلى قائمة الصور
     current_images = family.get('images', [])
@@ -1358,6 +2396,7 @@ async def toggle_family_status(
     result = await db.families.update_one({"id": family_id}, {"$set": update_data})
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Family not found")
+    invalidate_public_stats()
     
     return {"message": f"Family {'activated' if is_active else 'deactivated'} successfully"}
 
@@ -1365,7 +2404,7 @@ async def toggle_family_status(
 @api_router.get("/family-categories", response_model=List[FamilyCategory])
 async def get_family_categories(current_user: User = Depends(get_admin_or_committee_user)):
     """جلب تصنيفات العائلات - متاح للأدمن وموظفي اللجنة"""
-    categories = await db.family_categories.find({}, {"_id": 0}).to_list(1000)
+    categories = await reference_cache.get("family_categories")
     return categories
 
 @api_router.post("/family-categories", response_model=FamilyCategory)
@@ -1375,6 +2414,8 @@ async def create_family_category(category_data: FamilyCategoryCreate, current_us
     
     category = FamilyCategory(**category_data.model_dump())
     await db.family_categories.insert_one(category.model_dump())
+    reference_cache.bump("family_categories")
+    invalidate_public_stats()
     return category
 
 @api_router.put("/family-categories/{category_id}", response_model=FamilyCategory)
@@ -1393,6 +2434,8 @@ async def update_family_category(
     result = await db.family_categories.update_one({"id": category_id}, {"$set": update_dict})
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Family category not found")
+    reference_cache.bump("family_categories")
+    invalidate_public_stats()
     
     updated_category = await db.family_categories.find_one({"id": category_id}, {"_id": 0})
     return FamilyCategory(**updated_category)
@@ -1416,13 +2459,15 @@ async def toggle_family_category_status(
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Family category not found")
+    reference_cache.bump("family_categories")
+    invalidate_public_stats()
     
     return {"message": f"Family category {'activated' if is_active else 'deactivated'} successfully"}
 
 # ============= Income Levels Routes =============
 @api_router.get("/income-levels", response_model=List[IncomeLevel])
 async def get_income_levels(current_user: User = Depends(get_admin_or_committee_user)):
-    levels = await db.income_levels.find({}, {"_id": 0}).to_list(1000)
+    levels = await reference_cache.get("income_levels")
     return levels
 
 @api_router.post("/income-levels", response_model=IncomeLevel)
@@ -1432,6 +2477,7 @@ async def create_income_level(level_data: IncomeLevelCreate, current_user: User
     
     level = IncomeLevel(**level_data.model_dump())
     await db.income_levels.insert_one(level.model_dump())
+    reference_cache.bump("income_levels")
     return level
 
 @api_router.put("/income-levels/{level_id}", response_model=IncomeLevel)
@@ -1450,6 +2496,7 @@ async def update_income_level(
     result = await db.income_levels.update_one({"id": level_id}, {"$set": update_dict})
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Income level not found")
+    reference_cache.bump("income_levels")
     
     updated_level = await db.income_levels.find_one({"id": level_id}, {"_id": 0})
     return IncomeLevel(**updated_level)
@@ -1473,6 +2520,7 @@ async def toggle_income_level_status(
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Income level not found")
+    reference_cache.bump("income_levels")
     
     return {"message": f"Income level {'activated' if is_active else 'deactivated'} successfully"}
 
@@ -1480,7 +2528,7 @@ async def toggle_income_level_status(
 
 @api_router.get("/need-assessments", response_model=List[NeedAssessment])
 async def get_need_assessments(current_user: User = Depends(get_current_user)):
-    assessments = await db.need_assessments.find({}, {"_id": 0}).to_list(1000)
+    assessments = await reference_cache.get("need_assessments")
     return [NeedAssessment(**assessment) for assessment in assessments]
 
 @api_router.post("/need-assessments", response_model=NeedAssessment)
@@ -1495,6 +2543,7 @@ async def create_need_assessment(
     doc['created_at'] = doc['created_at'].isoformat()
     
     await db.need_assessments.insert_one(doc)
+    reference_cache.bump("need_assessments")
     return assessment_obj
 
 @api_router.put("/need-assessments/{assessment_id}", response_model=NeedAssessment)
@@ -1514,6 +2563,7 @@ async def update_need_assessment(
     result = await db.need_assessments.update_one({"id": assessment_id}, {"$set": update_dict})
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Need assessment not found")
+    reference_cache.bump("need_assessments")
     
     updated_assessment = await db.need_assessments.find_one({"id": assessment_id}, {"_id": 0})
     return NeedAssessment(**updated_assessment)
@@ -1537,6 +2587,7 @@ async def toggle_need_assessment_status(
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Need assessment not found")
+    reference_cache.bump("need_assessments")
     
     return {"message": f"Need assessment {'activated' if is_active else 'deactivated'} successfully"}
 
@@ -1544,7 +2595,7 @@ async def toggle_need_assessment_status(
 
 @api_router.get("/needs", response_model=List[Need])
 async def get_needs(current_user: User = Depends(get_current_user)):
-    needs = await db.needs.find({}, {"_id": 0}).to_list(1000)
+    needs = await reference_cache.get("needs")
     return [Need(**need) for need in needs]
 
 @api_router.post("/needs", response_model=Need)
@@ -1563,6 +2614,7 @@ async def create_need(
     doc['created_at'] = doc['created_at'].isoformat()
     
     await db.needs.insert_one(doc)
+    reference_cache.bump("needs")
     return need_obj
 
 @api_router.put("/needs/{need_id}", response_model=Need)
@@ -1590,6 +2642,7 @@ async def update_need(
     result = await db.needs.update_one({"id": need_id}, {"$set": update_dict})
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Need not found")
+    reference_cache.bump("needs")
     
     updated_need = await db.needs.find_one({"id": need_id}, {"_id": 0})
     
@@ -1620,6 +2673,7 @@ async def toggle_need_status(
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Need not found")
+    reference_cache.bump("needs")
     
     return {"message": f"Need {'activated' if is_active else 'deactivated'} successfully"}
 
@@ -1682,31 +2736,41 @@ async def get_family_needs(family_id: str, current_user: User = Depends(get_curr
     
     return result
 
+DONATION_STATUSES = ["completed", "inprogress", "pending", "cancelled", "rejected"]
+
+def _amount_value_expr(field: str):
+    """تعبير aggregation يستخرج مجموع الأرقام من نص المبلغ (للسجلات التي لم يُحفظ لها parsed_amount بعد)"""
+    cleaned = {"$replaceAll": {
+        "input": {"$replaceAll": {
+            "input": {"$toString": {"$ifNull": [field, ""]}},
+            "find": ",",
+            "replacement": ""
+        }},
+        "find": " ",
+        "replacement": ""
+    }}
+    return {"$reduce": {
+        "input": {"$regexFindAll": {"input": cleaned, "regex": r"\d+(?:\.\d+)?"}},
+        "initialValue": 0.0,
+        "in": {"$add": ["$$value", {"$toDouble": "$$this.match"}]}
+    }}
+
+def _stored_amount_expr():
+    """القيمة الرقمية المحفوظة للمبلغ مع الرجوع لتحليل النص للسجلات القديمة"""
+    return {"$ifNull": ["$parsed_amount.value", _amount_value_expr("$amount")]}
+
+async def sum_amounts(collection, match: dict, value_expr=None) -> float:
+    """جمع المبالغ الرقمية في قاعدة البيانات مباشرة"""
+    result = await collection.aggregate([
+        {"$match": match},
+        {"$group": {"_id": None, "total": {"$sum": value_expr or _stored_amount_expr()}}}
+    ]).to_list(1)
+    return float(result[0]["total"]) if result else 0.0
+
 async def update_family_total_needs_amount(family_id: str):
     """تحديث المبلغ الإجمالي لاحتياجات العائلة (كل الاحتياجات - نشطة ومتوقفة)"""
-    import re
     try:
-        # جلب جميع احتياجات العائلة (النشطة والمتوقفة)
-        family_needs = await db.family_needs.find({
-            "family_id": family_id
-        }, {"_id": 0}).to_list(1000)
-        
-        total = 0.0
-        for need in family_needs:
-            amount_str = need.get("amount", "")
-            if amount_str:
-                try:
-                    # إزالة الفواصل والمسافات
-                    clean_str = str(amount_str).replace(",", "").replace(" ", "")
-                    # استخراج جميع الأرقام (مع دعم الأرقام العشرية)
-                    numbers = re.findall(r'\d+(?:\.\d+)?', clean_str)
-                    if numbers:
-                        # جمع جميع الأرقام المستخرجة (في حال وجود عدة أرقام)
-                        for num in numbers:
-                            total += float(num)
-                except Exception as e:
-                    print(f"خطأ في معالجة المبلغ '{amount_str}': {e}")
-                    pass
+        total = await sum_amounts(db.family_needs, {"family_id": family_id})
         
         # تحديث العائلة
         await db.families.update_one(
@@ -1714,66 +2778,33 @@ async def update_family_total_needs_amount(family_id: str):
             {"$set": {"total_needs_amount": total}}
         )
         
-        print(f"تم تحديث إجمالي احتياجات العائلة {family_id}: {total}")
+        logger.debug(f"تم تحديث إجمالي احتياجات العائلة {family_id}: {total}")
         return total
     except Exception as e:
-        print(f"خطأ في تحديث إجمالي الاحتياجات: {e}")
+        logger.error(f"خطأ في تحديث إجمالي الاحتياجات: {e}")
         return 0.0
 
 async def update_family_total_donations_amount(family_id: str):
     """تحديث المبلغ الإجمالي لتبرعات العائلة حسب الحالة"""
-    import re
     try:
-        # جلب جميع تبرعات العائلة (النشطة وغير النشطة)
-        all_donations = await db.donations.find({
-            "family_id": family_id
-        }, {"_id": 0}).to_list(10000)
-        
-        # تصنيف التبرعات حسب الحالة (نشطة)
-        totals = {
-            "completed": 0.0,      # مكتملة (المعتمد)
-            "inprogress": 0.0,     # قيد التنفيذ
-            "pending": 0.0,        # معلقة
-            "cancelled": 0.0,      # ملغاة
-            "rejected": 0.0        # مرفوضة
-        }
-        
-        # تصنيف التبرعات غير النشطة حسب الحالة
-        inactive_totals = {
-            "completed": 0.0,
-            "inprogress": 0.0,
-            "pending": 0.0,
-            "cancelled": 0.0,
-            "rejected": 0.0
-        }
+        # تجميع مبالغ التبرعات (النشطة وغير النشطة) حسب الحالة في قاعدة البيانات
+        groups = await db.donations.aggregate([
+            {"$match": {"family_id": family_id}},
+            {"$group": {
+                "_id": {
+                    "status": {"$cond": [{"$in": ["$status", DONATION_STATUSES]}, "$status", "pending"]},
+                    "is_active": {"$ne": ["$is_active", False]}
+                },
+                "total": {"$sum": _stored_amount_expr()}
+            }}
+        ]).to_list(None)
         
-        for donation in all_donations:
-            amount = donation.get("amount", "")
-            status = donation.get("status", "pending")
-            is_active = donation.get("is_active", True)
-            
-            if amount:
-                try:
-                    # إزالة الفواصل والمسافات
-                    clean_str = str(amount).replace(",", "").replace(" ", "").replace("ل.س", "")
-                    # استخراج جميع الأرقام (مع دعم الأرقام العشرية)
-                    numbers = re.findall(r'\d+(?:\.\d+)?', clean_str)
-                    if numbers:
-                        amount_value = 0.0
-                        # جمع جميع الأرقام المستخرجة
-                        for num in numbers:
-                            amount_value += float(num)
-                        
-                        # إضافة إلى الفئة المناسبة
-                        target_dict = totals if is_active else inactive_totals
-                        if status in target_dict:
-                            target_dict[status] += amount_value
-                        else:
-                            # افتراضياً معلق
-                            target_dict["pending"] += amount_value
-                except Exception as e:
-                    print(f"خطأ في معالجة مبلغ التبرع '{amount}': {e}")
-                    pass
+        # تصنيف التبرعات حسب الحالة (نشطة وغير نشطة)
+        totals = {status_name: 0.0 for status_name in DONATION_STATUSES}
+        inactive_totals = {status_name: 0.0 for status_name in DONATION_STATUSES}
+        for group in groups:
+            target_dict = totals if group["_id"]["is_active"] else inactive_totals
+            target_dict[group["_id"]["status"]] += float(group["total"])
         
         # المجموع الكلي (للتوافق مع الكود القديم)
         total = sum(totals.values())
@@ -1783,36 +2814,266 @@ async def update_family_total_donations_amount(family_id: str):
             {"id": family_id},
             {"$set": {
                 "total_donations_amount": total,  # المجموع الكلي
-                "donations_by_status": {
-                    "completed": totals["completed"],      # المكتملة (المعتمد)
-                    "inprogress": totals["inprogress"],    # قيد التنفيذ
-                    "pending": totals["pending"],          # المعلقة
-                    "cancelled": totals["cancelled"],      # الملغاة
-                    "rejected": totals["rejected"]         # المرفوضة
-                },
-                "inactive_donations_by_status": {
-                    "completed": inactive_totals["completed"],
-                    "inprogress": inactive_totals["inprogress"],
-                    "pending": inactive_totals["pending"],
-                    "cancelled": inactive_totals["cancelled"],
-                    "rejected": inactive_totals["rejected"]
-                }
+                "donations_by_status": totals,
+                "inactive_donations_by_status": inactive_totals
             }}
         )
         
-        print(f"تم تحديث تبرعات العائلة {family_id}:")
-        print(f"  - النشطة - مكتملة: {totals['completed']}")
-        print(f"  - النشطة - قيد التنفيذ: {totals['inprogress']}")
-        print(f"  - النشطة - معلقة: {totals['pending']}")
-        print(f"  - غير النشطة - مكتملة: {inactive_totals['completed']}")
-        print(f"  - غير النشطة - معلقة: {inactive_totals['pending']}")
-        print(f"  - الإجمالي النشط: {total}")
+        logger.debug(f"تم تحديث تبرعات العائلة {family_id}: النشطة {totals} - غير النشطة {inactive_totals}")
         
         return total
     except Exception as e:
-        print(f"خطأ في تحديث إجمالي التبرعات: {e}")
+        logger.error(f"خطأ في تحديث إجمالي التبرعات: {e}")
         return 0.0
 
+# ============= Incremental Family Totals (تحديث المبالغ بالفروقات) =============
+
+def empty_donations_by_status() -> dict:
+    return {status_name: 0.0 for status_name in DONATION_STATUSES}
+
+def _stored_amount(doc: dict) -> float:
+    """القيمة الرقمية المحفوظة للسجل (أو تحليل النص للسجلات القديمة)"""
+    parsed = doc.get("parsed_amount") or {}
+    if parsed.get("value") is not None:
+        return float(parsed["value"])
+    return parse_amount(doc.get("amount"))["value"]
+
+def need_totals_delta(need: Optional[dict], sign: int) -> dict:
+    """مساهمة سجل احتياج في مبالغ العائلة (sign = 1 للإضافة، -1 للإزالة)"""
+    if not need:
+        return {}
+    return {"total_needs_amount": sign * _stored_amount(need)}
+
+def donation_totals_delta(donation: Optional[dict], sign: int) -> dict:
+    """مساهمة تبرع في مبالغ العائلة حسب حالته وتفعيله (sign = 1 للإضافة، -1 للإزالة)"""
+    if not donation:
+        return {}
+    value = sign * _stored_amount(donation)
+    status_name = donation.get("status") if donation.get("status") in DONATION_STATUSES else "pending"
+    if donation.get("is_active") is not False:
+        return {
+            f"donations_by_status.{status_name}": value,
+            "total_donations_amount": value
+        }
+    return {f"inactive_donations_by_status.{status_name}": value}
+
+def merge_totals_deltas(*deltas: dict) -> dict:
+    merged = {}
+    for delta in deltas:
+        for key, value in delta.items():
+            merged[key] = merged.get(key, 0.0) + value
+    return {key: value for key, value in merged.items() if value}
+
+async def apply_family_totals_delta(family_id: Optional[str], delta: dict):
+    """
+    تحديث مبالغ العائلة ذرياً عبر $inc بدلاً من إعادة حساب كل الاحتياجات والتبرعات
+    - O(1) بغض النظر عن عدد سجلات العائلة، وآمن مع الكتابات المتزامنة
+    - عند فشل $inc (مثلاً donations_by_status = null في عائلة قديمة) يتم الحساب الكامل في الخلفية
+    - totals_seq يزيد مع كل فرق حتى لا يكتب الحساب الكامل نتيجة قديمة فوقه (انظر build_family_totals_pipeline)
+    """
+    if not family_id or not delta:
+        return
+    try:
+        await db.families.update_one({"id": family_id}, {"$inc": {**delta, "totals_seq": 1}})
+    except Exception as e:
+        print(f"تعذر تحديث مبالغ العائلة {family_id} بالفروقات، سيتم الحساب الكامل: {e}")
+        family_summary_queue.mark_dirty(family_id)
+
+def build_family_totals_pipeline(family_ids: Optional[List[str]] = None):
+    """
+    بناء pipeline (على مجموعة families) يحسب المبالغ الإجمالية للعائلات على الخادم في عملية $group واحدة
+    ويكتب النتائج في مجموعة families عبر $merge
+    - family_ids: لتقييد الحساب على عائلات محددة (None = جميع العائلات)
+    - totals_seq للعائلة يُقرأ قبل الاحتياجات والتبرعات، و$merge لا يكتب إذا تغير أثناء الحساب
+      (فرق $inc وصل بين القراءة والكتابة يبقى ولا يُستبدل بنتيجة لا تتضمنه)
+    """
+    family_match = {"family_id": {"$in": family_ids}} if family_ids is not None else {}
+    families_match = {"id": {"$in": family_ids}} if family_ids is not None else {}
+
+    group_stage = {
+        "_id": "$family_id",
+        "total_needs_amount": {"$sum": "$needs_amount"},
+        "totals_seq": {"$max": "$totals_seq"},
+    }
+    for status_name in DONATION_STATUSES:
+        for prefix, active in (("active", True), ("inactive", False)):
+            group_stage[f"{prefix}_{status_name}"] = {"$sum": {"$cond": [
+                {"$and": [
+                    {"$eq": ["$donation_active", active]},
+                    {"$eq": ["$donation_status", status_name]}
+                ]},
+                "$donation_amount",
+                0.0
+            ]}}
+
+    return [
+        # جميع العائلات حتى التي ليس لها احتياجات أو تبرعات (لتصفير مبالغها) مع totals_seq الحالي
+        {"$match": families_match},
+        {"$project": {"_id": 0, "family_id": "$id", "totals_seq": {"$ifNull": ["$totals_seq", 0]}}},
+        # الاحتياجات (النشطة والمتوقفة)
+        {"$unionWith": {"coll": "family_needs", "pipeline": [
+            {"$match": family_match},
+            {"$project": {
+                "_id": 0,
+                "family_id": 1,
+                "needs_amount": _stored_amount_expr()
+            }}
+        ]}},
+        # التبرعات (النشطة وغير النشطة)
+        {"$unionWith": {"coll": "donations", "pipeline": [
+            {"$match": family_match},
+            {"$project": {
+                "_id": 0,
+                "family_id": 1,
+                "donation_amount": _stored_amount_expr(),
+                "donation_status": {"$cond": [{"$in": ["$status", DONATION_STATUSES]}, "$status", "pending"]},
+                "donation_active": {"$ne": ["$is_active", False]}
+            }}
+        ]}},
+        {"$match": {"family_id": {"$type": "string"}}},
+        {"$group": group_stage},
+        {"$project": {
+            "_id": 0,
+            "id": "$_id",
+            "total_needs_amount": 1,
+            "totals_seq": 1,
+            "total_donations_amount": {"$add": [f"$active_{s}" for s in DONATION_STATUSES]},
+            "donations_by_status": {s: f"$active_{s}" for s in DONATION_STATUSES},
+            "inactive_donations_by_status": {s: f"$inactive_{s}" for s in DONATION_STATUSES}
+        }},
+        {"$merge": {
+            "into": "families",
+            "on": "id",
+            # الكتابة فقط إذا لم يصل فرق $inc جديد منذ قراءة totals_seq
+            "whenMatched": [{"$replaceWith": {"$cond": [
+                {"$eq": [{"$ifNull": ["$totals_seq", 0]}, "$$new.totals_seq"]},
+                {"$mergeObjects": ["$$ROOT", "$$new"]},
+                "$$ROOT"
+            ]}}],
+            "whenNotMatched": "discard"
+        }}
+    ]
+
+async def recalculate_family_totals_pipeline(family_ids: Optional[List[str]] = None):
+    """إعادة حساب المبالغ الإجمالية على الخادم (يتطلب فهرس id الفريد على families)"""
+    await db.families.aggregate(build_family_totals_pipeline(family_ids)).to_list(None)
+
+# ============= Family Summary Recompute Queue =============
+
+FAMILY_RECOMPUTE_DEBOUNCE_SECONDS = float(os.environ.get('FAMILY_RECOMPUTE_DEBOUNCE_SECONDS', 0.5))
+FAMILY_RECOMPUTE_WORKERS = int(os.environ.get('FAMILY_RECOMPUTE_WORKERS', 4))
+# حد أقصى للتأجيل حتى لا تتأخر العائلة النشطة باستمرار (الافتراضي 5 أضعاف debounce)
+FAMILY_RECOMPUTE_MAX_WAIT_SECONDS = float(os.environ.get('FAMILY_RECOMPUTE_MAX_WAIT_SECONDS', FAMILY_RECOMPUTE_DEBOUNCE_SECONDS * 5))
+
+class FamilySummaryQueue:
+    """
+    طابور داخلي لإعادة حساب ملخصات العائلات في الخلفية
+    - mark_dirty لا ينتظر أي عملية على قاعدة البيانات
+    - العائلة التي تُعلَّم عدة مرات خلال فترة الانتظار (debounce) يُعاد حسابها مرة واحدة
+    - العائلة النشطة باستمرار يُعاد حسابها بعد max_wait_seconds من أول تعليم على الأكثر
+    - عدد محدود من العمال (workers) يعالجون الطابور
+    """
+
+    def __init__(self, debounce_seconds: float, workers: int, max_wait_seconds: Optional[float] = None):
+        self.debounce_seconds = debounce_seconds
+        self.max_wait_seconds = max_wait_seconds if max_wait_seconds is not None else debounce_seconds * 5
+        self.workers = workers
+        self._dirty = {}  # family_id -> (وقت أول تعليم، وقت آخر تعليم)
+        self._in_progress = set()
+        self._queue: Optional[asyncio.Queue] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks = []
+        self._stopping = False
+        self.processed = 0
+        self.coalesced = 0
+        self.failed = 0
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._tasks = [asyncio.create_task(self._scheduler())]
+        self._tasks += [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        if self._dirty:
+            self._wakeup.set()
+
+    def mark_dirty(self, family_id: Optional[str]):
+        """تعليم عائلة لإعادة حساب ملخصها المالي"""
+        if not family_id:
+            return
+        now = asyncio.get_running_loop().time()
+        if family_id in self._dirty:
+            self.coalesced += 1
+            self._dirty[family_id] = (self._dirty[family_id][0], now)
+        else:
+            self._dirty[family_id] = (now, now)
+        if self._wakeup:
+            self._wakeup.set()
+
+    async def _scheduler(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._dirty:
+                if self._stopping:
+                    return
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            now = loop.time()
+            for family_id, (first_marked_at, marked_at) in list(self._dirty.items()):
+                # العائلة قيد الحساب حالياً: ننتظر انتهاءه ثم نعيد الحساب مرة أخرى
+                if family_id in self._in_progress:
+                    continue
+                if (self._stopping or now - marked_at >= self.debounce_seconds
+                        or now - first_marked_at >= self.max_wait_seconds):
+                    del self._dirty[family_id]
+                    self._in_progress.add(family_id)
+                    self._queue.put_nowait(family_id)
+
+            await asyncio.sleep(min(self.debounce_seconds, 0.1) if self._stopping else self.debounce_seconds / 2)
+
+    async def _worker(self):
+        while True:
+            family_id = await self._queue.get()
+            try:
+                await recalculate_family_totals_pipeline([family_id])
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"خطأ في إعادة حساب ملخص العائلة {family_id}: {e}")
+            finally:
+                self._in_progress.discard(family_id)
+                self._queue.task_done()
+
+    async def drain(self):
+        """معالجة كل العائلات المعلّقة فوراً ثم إيقاف العمال (عند إيقاف الخادم)"""
+        if not self._tasks:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        scheduler, workers = self._tasks[0], self._tasks[1:]
+        await scheduler
+        await self._queue.join()
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._dirty),
+            "queued": self._queue.qsize() if self._queue else 0,
+            "in_progress": len(self._in_progress),
+            "processed": self.processed,
+            "coalesced": self.coalesced,
+            "failed": self.failed
+        }
+
+family_summary_queue = FamilySummaryQueue(
+    FAMILY_RECOMPUTE_DEBOUNCE_SECONDS, FAMILY_RECOMPUTE_WORKERS, FAMILY_RECOMPUTE_MAX_WAIT_SECONDS
+)
+
 async def log_donation_history(
     donation_id: str,
     action_type: str,
@@ -1834,8 +3095,7 @@ async def log_donation_history(
             changes=changes
         )
         
-        await db.donation_history.insert_one(history_log.model_dump())
-        print(f"تم تسجيل حركة التبرع: {action_type} - {donation_id}")
+        await audit_sink.write("donation_history", history_log.model_dump())
     except Exception as e:
         print(f"خطأ في تسجيل تاريخ التبرع: {e}")
 
@@ -1884,6 +3144,7 @@ async def add_family_need(
         family_need_dict = need_input.model_dump()
         family_need_dict["family_id"] = family_id
         family_need_dict["created_by_user_id"] = current_user.id
+        family_need_dict["parsed_amount"] = parse_amount(need_input.amount)
         
         print(f"Creating family need with data: {family_need_dict}")
         
@@ -1894,7 +3155,7 @@ async def add_family_need(
         await db.family_needs.insert_one(doc)
         
         # تحديث المبلغ الإجمالي للعائلة
-        await update_family_total_needs_amount(family_id)
+        await apply_family_totals_delta(family_id, need_totals_delta(doc, 1))
         
         # تسجيل الحركة
         await log_need_action(
@@ -1920,6 +3181,251 @@ async def add_family_need(
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"خطأ في إضافة الاحتياج: {str(e)}")
 
+FAMILY_NEEDS_BATCH_MAX = int(os.environ.get('FAMILY_NEEDS_BATCH_MAX', 500))
+
+@api_router.post("/family-needs/batch")
+async def add_family_needs_batch(
+    batch: FamilyNeedBatchRequest,
+    current_user: User = Depends(get_admin_or_committee_user)
+):
+    """
+    إضافة عدة احتياجات دفعة واحدة (لعائلة واحدة أو عدة عائلات)
+    - التحقق من العائلات والاحتياجات والتكرار باستعلام واحد لكل منها
+    - العناصر غير الصالحة لا تُضاف وتظهر في errors مع ترتيبها (index) في الطلب
+    - المبالغ الإجمالية تُحدث مرة واحدة لكل عائلة
+    """
+    if not batch.needs:
+        raise HTTPException(status_code=400, detail="لا توجد احتياجات للإضافة")
+    if len(batch.needs) > FAMILY_NEEDS_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"الحد الأقصى {FAMILY_NEEDS_BATCH_MAX} احتياج في الطلب الواحد")
+    
+    items = [(index, item, item.family_id or batch.family_id) for index, item in enumerate(batch.needs)]
+    family_ids = list({family_id for _, _, family_id in items if family_id})
+    need_ids = list({item.need_id for _, item, _ in items})
+    
+    # التحقق من العائلات (موظفو اللجنة: عائلات حيّهم فقط) والاحتياجات
+    families_query = filter_by_neighborhood(current_user, {"id": {"$in": family_ids}})
+    existing_family_ids = set(await db.families.distinct("id", families_query))
+    needs = {
+        need["id"]: need
+        async for need in db.needs.find({"id": {"$in": need_ids}}, {"_id": 0, "id": 1, "name": 1})
+    }
+    existing_keys = {
+        (fn["family_id"], fn["need_id"], fn.get("month"))
+        async for fn in db.family_needs.find(
+            {"family_id": {"$in": family_ids}, "need_id": {"$in": need_ids}},
+            {"_id": 0, "family_id": 1, "need_id": 1, "month": 1}
+        )
+    }
+    
+    errors = []
+    docs = []
+    doc_indexes = []
+    for index, item, family_id in items:
+        key = (family_id, item.need_id, item.month)
+        if not family_id:
+            errors.append({"index": index, "detail": "family_id مطلوب"})
+        elif family_id not in existing_family_ids:
+            errors.append({"index": index, "detail": "Family not found"})
+        elif item.need_id not in needs:
+            errors.append({"index": index, "detail": "Need not found"})
+        elif key in existing_keys:
+            errors.append({"index": index, "detail": "هذا الاحتياج موجود بالفعل لهذه العائلة في نفس الشهر"})
+        else:
+            existing_keys.add(key)
+            family_need_dict = item.model_dump(exclude={"family_id"})
+            family_need_dict["family_id"] = family_id
+            family_need_dict["created_by_user_id"] = current_user.id
+            family_need_dict["parsed_amount"] = parse_amount(item.amount)
+            doc = FamilyNeed(**family_need_dict).model_dump()
+            doc['created_at'] = doc['created_at'].isoformat()
+            docs.append(doc)
+            doc_indexes.append(index)
+    
+    # الإدخال دفعة واحدة - الفهرس الفريد (family_id, need_id, month) يمنع التكرار مع الطلبات المتزامنة
+    failed_positions = set()
+    if docs:
+        try:
+            await db.family_needs.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            for write_error in e.details.get("writeErrors", []):
+                position = write_error["index"]
+                failed_positions.add(position)
+                detail = "هذا الاحتياج موجود بالفعل لهذه العائلة في نفس الشهر" if write_error.get("code") == 11000 else write_error.get("errmsg")
+                errors.append({"index": doc_indexes[position], "detail": detail})
+    created = [doc for position, doc in enumerate(docs) if position not in failed_positions]
+    
+    # تحديث المبالغ الإجمالية مرة واحدة لكل عائلة
+    deltas_by_family = {}
+    for doc in created:
+        deltas_by_family.setdefault(doc["family_id"], []).append(need_totals_delta(doc, 1))
+    for family_id, deltas in deltas_by_family.items():
+        await apply_family_totals_delta(family_id, merge_totals_deltas(*deltas))
+    
+    # تسجيل الحركات دفعة واحدة
+    if created:
+        audit_docs = [
+            build_need_audit_doc(
+                family_id=doc["family_id"],
+                need_record_id=doc["id"],
+                need_id=doc["need_id"],
+                need_name=needs[doc["need_id"]].get('name', 'غير محدد'),
+                action_type="created",
+                user_id=current_user.id,
+                user_name=current_user.full_name,
+                changes={
+                    "amount": doc.get("amount"),
+                    "duration_type": doc.get("duration_type"),
+                    "estimated_amount": doc.get("estimated_amount"),
+                    "notes": doc.get("notes")
+                }
+            )
+            for doc in created
+        ]
+        try:
+            await audit_sink.write_many("family_needs_audit_log", audit_docs)
+        except Exception as e:
+            print(f"⚠️ خطأ في تسجيل الحركات: {e}")
+    
+    for doc in created:
+        doc.pop("_id", None)
+    
+    return {
+        "created": created,
+        "created_count": len(created),
+        "failed_count": len(errors),
+        "errors": sorted(errors, key=lambda error: error["index"])
+    }
+
+# الأسماء العربية للحقول في سجل الحركات
+FAMILY_NEED_FIELD_NAMES = {
+    "need_id": "نوع الاحتياج",
+    "amount": "المبلغ",
+    "duration_type": "المدة",
+    "notes": "الملاحظات",
+    "estimated_amount": "المبلغ التقديري",
+    "status": "الحالة",
+    "is_active": "حالة التفعيل"
+}
+
+def family_need_changes(existing: dict, update_data: dict) -> dict:
+    """التغييرات التفصيلية (القيمة القديمة والجديدة) لسجل الحركات"""
+    changes = {}
+    for key, new_value in update_data.items():
+        old_value = existing.get(key)
+        if old_value != new_value:
+            changes[FAMILY_NEED_FIELD_NAMES.get(key, key)] = {"old": old_value, "new": new_value}
+    return changes
+
+def family_need_update_action(update_data: dict) -> str:
+    if "is_active" in update_data:
+        return "activated" if update_data["is_active"] else "deactivated"
+    return "updated"
+
+@api_router.put("/family-needs/batch")
+async def update_family_needs_batch(
+    batch: FamilyNeedBatchUpdateRequest,
+    current_user: User = Depends(get_admin_or_committee_user)
+):
+    """
+    تعديل عدة احتياجات دفعة واحدة (bulk_write واحد)
+    - العناصر غير الصالحة لا تُعدل وتظهر في errors مع ترتيبها (index) في الطلب
+    - المبالغ الإجمالية تُحدث مرة واحدة لكل عائلة
+    """
+    if not batch.updates:
+        raise HTTPException(status_code=400, detail="لا توجد احتياجات للتعديل")
+    if len(batch.updates) > FAMILY_NEEDS_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"الحد الأقصى {FAMILY_NEEDS_BATCH_MAX} احتياج في الطلب الواحد")
+    
+    record_ids = list({item.id for item in batch.updates})
+    records = {
+        record["id"]: record
+        async for record in db.family_needs.find({"id": {"$in": record_ids}}, {"_id": 0})
+    }
+    # موظفو اللجنة: عائلات حيّهم فقط
+    families_query = filter_by_neighborhood(current_user, {"id": {"$in": list({r["family_id"] for r in records.values()})}})
+    allowed_family_ids = set(await db.families.distinct("id", families_query))
+    need_ids = {record.get("need_id") for record in records.values()} | {item.need_id for item in batch.updates if item.need_id}
+    needs = {
+        need["id"]: need
+        async for need in db.needs.find({"id": {"$in": list(need_ids)}}, {"_id": 0, "id": 1, "name": 1})
+    }
+    
+    errors = []
+    operations = []
+    planned = []  # (index, before, update_data, changes)
+    now = datetime.now(timezone.utc).isoformat()
+    for index, item in enumerate(batch.updates):
+        existing = records.get(item.id)
+        if not existing or existing["family_id"] not in allowed_family_ids:
+            errors.append({"index": index, "detail": "Family need record not found"})
+            continue
+        update_data = item.model_dump(exclude={"id"}, exclude_none=True)
+        if update_data.get("need_id") and update_data["need_id"] not in needs:
+            errors.append({"index": index, "detail": "Need not found"})
+            continue
+        changes = family_need_changes(existing, update_data)
+        if "amount" in update_data:
+            update_data["parsed_amount"] = parse_amount(update_data["amount"])
+        update_data["updated_by_user_id"] = current_user.id
+        update_data["updated_at"] = now
+        operations.append(UpdateOne({"id": item.id}, {"$set": update_data}))
+        planned.append((index, existing, update_data, changes))
+    
+    # التعديل دفعة واحدة - الفهرس الفريد (family_id, need_id, month) يرفض التكرار
+    failed_positions = set()
+    if operations:
+        try:
+            await db.family_needs.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            for write_error in e.details.get("writeErrors", []):
+                position = write_error["index"]
+                failed_positions.add(position)
+                detail = "هذا الاحتياج موجود بالفعل لهذه العائلة في نفس الشهر" if write_error.get("code") == 11000 else write_error.get("errmsg")
+                errors.append({"index": planned[position][0], "detail": detail})
+    applied = [entry for position, entry in enumerate(planned) if position not in failed_positions]
+    
+    # تحديث المبالغ الإجمالية مرة واحدة لكل عائلة
+    deltas_by_family = {}
+    for _, existing, update_data, _ in applied:
+        if "amount" in update_data:
+            deltas_by_family.setdefault(existing["family_id"], []).extend([
+                need_totals_delta(existing, -1),
+                need_totals_delta({**existing, **update_data}, 1)
+            ])
+    for family_id, deltas in deltas_by_family.items():
+        await apply_family_totals_delta(family_id, merge_totals_deltas(*deltas))
+    
+    # تسجيل الحركات دفعة واحدة
+    audit_docs = [
+        build_need_audit_doc(
+            family_id=existing["family_id"],
+            need_record_id=existing["id"],
+            need_id=existing.get("need_id"),
+            need_name=needs.get(existing.get("need_id"), {}).get('name', 'غير محدد'),
+            action_type=family_need_update_action(update_data),
+            user_id=current_user.id,
+            user_name=current_user.full_name,
+            changes=changes
+        )
+        for _, existing, update_data, changes in applied if changes
+    ]
+    if audit_docs:
+        try:
+            await audit_sink.write_many("family_needs_audit_log", audit_docs)
+        except Exception as e:
+            print(f"⚠️ خطأ في تسجيل الحركات: {e}")
+    
+    updated = await db.family_needs.find(
+        {"id": {"$in": [existing["id"] for _, existing, _, _ in applied]}}, {"_id": 0}
+    ).to_list(None)
+    return {
+        "updated": updated,
+        "updated_count": len(applied),
+        "failed_count": len(errors),
+        "errors": sorted(errors, key=lambda error: error["index"])
+    }
+
 @api_router.put("/families/{family_id}/needs/{need_record_id}")
 async def update_family_need(
     family_id: str,
@@ -1941,34 +3447,21 @@ async def update_family_need(
     need_name = need.get('name', 'غير محدد') if need else 'غير محدد'
     
     # تسجيل التغييرات التفصيلية
-    changes = {}
     update_data = {k: v for k, v in need_update.model_dump().items() if v is not None}
+    changes = family_need_changes(existing, update_data)
     
-    for key, new_value in update_data.items():
-        old_value = existing.get(key)
-        if old_value != new_value:
-            # تحديد الأسماء العربية للحقول
-            field_names = {
-                "need_id": "نوع الاحتياج",
-                "amount": "المبلغ",
-                "duration_type": "المدة",
-                "notes": "الملاحظات",
-                "estimated_amount": "المبلغ التقديري",
-                "status": "الحالة",
-                "is_active": "حالة التفعيل"
-            }
-            field_name = field_names.get(key, key)
-            changes[field_name] = {"old": old_value, "new": new_value}
-    
+    if "amount" in update_data:
+        update_data["parsed_amount"] = parse_amount(update_data["amount"])
     update_data["updated_by_user_id"] = current_user.id
     update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
     
-    await db.family_needs.update_one(
+    # التحديث مع إرجاع السجل المحدث (find_one_and_update لحساب الفرق من القيم الفعلية)
+    previous_record = await db.family_needs.find_one_and_update(
         {"id": need_record_id},
-        {"$set": update_data}
+        {"$set": update_data},
+        projection={"_id": 0},
+        return_document=ReturnDocument.BEFORE
     )
-    
-    # إرجاع السجل المحدث
     updated_record = await db.family_needs.find_one({"id": need_record_id}, {"_id": 0})
     
     # تحويل التواريخ
@@ -1978,21 +3471,20 @@ async def update_family_need(
         updated_record['updated_at'] = datetime.fromisoformat(updated_record['updated_at'])
     
     # تحديث المبلغ الإجمالي للعائلة
-    await update_family_total_needs_amount(family_id)
+    if "amount" in update_data:
+        await apply_family_totals_delta(family_id, merge_totals_deltas(
+            need_totals_delta(previous_record, -1),
+            need_totals_delta(updated_record, 1)
+        ))
     
     # تسجيل الحركة
     if changes:  # فقط إذا كان هناك تغييرات
-        action_type = "updated"
-        # تحديد نوع الإجراء الخاص
-        if "is_active" in update_data:
-            action_type = "activated" if update_data["is_active"] else "deactivated"
-        
         await log_need_action(
             family_id=family_id,
             need_record_id=need_record_id,
             need_id=existing.get("need_id"),
             need_name=need_name,
-            action_type=action_type,
+            action_type=family_need_update_action(update_data),
             user_id=current_user.id,
             user_name=current_user.full_name,
             changes=changes
@@ -2036,13 +3528,28 @@ async def delete_family_need(
     )
     
     # حذف السجل
-    await db.family_needs.delete_one({"id": need_record_id})
+    deleted_record = await db.family_needs.find_one_and_delete({"id": need_record_id}, projection={"_id": 0})
     
     # تحديث المبلغ الإجمالي للعائلة
-    await update_family_total_needs_amount(family_id)
+    await apply_family_totals_delta(family_id, need_totals_delta(deleted_record, -1))
     
     return {"message": "Family need deleted successfully"}
 
+AUDIT_COUNT_LIMIT = int(os.environ.get('AUDIT_COUNT_LIMIT', 1000))
+
+def match_archived_audit_entry(entry: dict, action_type, user_id, search_tokens, search_mode) -> bool:
+    """تطبيق فلاتر سجل الحركات على سجل مؤرشف (نفس منطق استعلام MongoDB)"""
+    if action_type and entry.get("action_type") != action_type:
+        return False
+    if user_id and entry.get("user_id") != user_id:
+        return False
+    if search_tokens:
+        stored = entry.get("search_tokens") or []
+        if search_mode == "text":
+            return any(token in stored for token in search_tokens)
+        return all(any(word.startswith(token) for word in stored) for token in search_tokens)
+    return True
+
 @api_router.get("/families/{family_id}/needs-audit-log")
 async def get_family_needs_audit_log(
     family_id: str,
@@ -2051,9 +3558,24 @@ async def get_family_needs_audit_log(
     per_page: int = 10,
     action_type: Optional[str] = None,
     user_id: Optional[str] = None,
-    search: Optional[str] = None
+    search: Optional[str] = None,
+    search_mode: str = "prefix",
+    cursor: Optional[str] = None,
+    count_mode: str = "exact"
 ):
-    """جلب سجل الحركات لاحتياجات عائلة مع pagination وبحث"""
+    """جلب سجل الحركات لاحتياجات عائلة مع pagination وبحث
+    
+    - search: بحث في اسم الاحتياج واسم المستخدم (بعد توحيد الحروف العربية)
+    - search_mode: prefix (كل كلمة تطابق بداية كلمة مخزنة) أو text (كلمات كاملة عبر فهرس النص)
+    - cursor: التقسيم بالمؤشر (timestamp, id) بدلاً من page - القيمة من next_cursor في الرد السابق
+    - count_mode: exact أو estimated (حتى AUDIT_COUNT_LIMIT) أو none
+    """
+    await audit_sink.flush()  # إظهار الحركات التي لم تُكتب بعد
+    if search_mode not in ("prefix", "text"):
+        raise HTTPException(status_code=400, detail="search_mode يجب أن يكون prefix أو text")
+    if count_mode not in ("exact", "estimated", "none"):
+        raise HTTPException(status_code=400, detail="count_mode يجب أن يكون exact أو estimated أو none")
+    per_page = max(1, min(per_page, 100))
     
     # بناء الفلتر
     filter_query = {"family_id": family_id}
@@ -2065,41 +3587,99 @@ async def get_family_needs_audit_log(
         filter_query["user_id"] = user_id
     
     if search:
-        # البحث في اسم الاحتياج أو اسم المستخدم
-        filter_query["$or"] = [
-            {"need_name": {"$regex": search, "$options": "i"}},
-            {"user_name": {"$regex": search, "$options": "i"}}
-        ]
-    
-    # حساب العدد الإجمالي
-    total_count = await db.family_needs_audit_log.count_documents(filter_query)
-    
-    # حساب عدد الصفحات
-    total_pages = (total_count + per_page - 1) // per_page
-    
-    # حساب skip
-    skip = (page - 1) * per_page
+        # البحث في اسم الاحتياج أو اسم المستخدم (حقول البحث الموحّدة والمفهرسة)
+        normalized_search = normalize_search_text(search)
+        if search_mode == "text":
+            filter_query["$text"] = {"$search": normalized_search}
+        elif normalized_search:
+            filter_query["$and"] = [
+                {"search_tokens": re.compile(f"^{re.escape(token)}")} for token in normalized_search.split()
+            ]
+    
+    search_tokens = normalize_search_text(search).split() if search else []
+    has_archive = await has_archived_history("family_needs_audit_log", family_id)
+    
+    # حساب العدد الإجمالي (السجلات المؤرشفة تُعد من العدادات المخزنة مع كل حزمة)
+    total_count = None
+    hot_count = None
+    if count_mode == "exact":
+        hot_count = await db.family_needs_audit_log.count_documents(filter_query)
+        total_count = hot_count
+        if has_archive:
+            total_count += await count_archived_audit(family_id, action_type, user_id, search_tokens, search_mode)
+    elif count_mode == "estimated":
+        total_count = await db.family_needs_audit_log.count_documents(filter_query, limit=AUDIT_COUNT_LIMIT)
+        if has_archive and total_count < AUDIT_COUNT_LIMIT:
+            total_count = min(
+                total_count + await count_archived_audit(family_id, action_type, user_id, search_tokens, search_mode),
+                AUDIT_COUNT_LIMIT
+            )
     
     # جلب السجلات مع الترتيب من الأحدث للأقدم
-    logs = await db.family_needs_audit_log.find(
-        filter_query,
-        {"_id": 0}
-    ).sort("timestamp", -1).skip(skip).limit(per_page).to_list(per_page)
+    page_query = filter_query
+    position = None
+    if cursor:
+        position = decode_cursor(cursor)
+        page_query = {**filter_query, **build_keyset_filter("timestamp", -1, position.get("v"), position["id"])}
+    
+    find_cursor = db.family_needs_audit_log.find(
+        page_query,
+        {"_id": 0, "search_text": 0, "search_tokens": 0}
+    ).sort([("timestamp", -1), ("id", -1)])
+    if not cursor:
+        find_cursor = find_cursor.skip((page - 1) * per_page)
+    logs = await find_cursor.limit(per_page + 1).to_list(per_page + 1)
+    
+    # إكمال الصفحة من الأرشيف فقط بعد انتهاء السجلات الحالية (تُفك الحزم حسب الحاجة)
+    if has_archive and len(logs) <= per_page:
+        before = (as_utc(position.get("v")), position["id"]) if position else None
+        archived_skip = 0
+        if not position:
+            if hot_count is None:
+                hot_count = await db.family_needs_audit_log.count_documents(filter_query)
+            archived_skip = max(0, (page - 1) * per_page - hot_count)
+        hot_ids = {log["id"] for log in logs}
+        archived = iter_archived_history("family_needs_audit_log", [family_id], before[0] if before else None)
+        try:
+            async for entry in archived:
+                if before and (as_utc(entry["timestamp"]), entry["id"]) >= before:
+                    continue
+                if entry["id"] in hot_ids or not match_archived_audit_entry(entry, action_type, user_id, search_tokens, search_mode):
+                    continue
+                if archived_skip:
+                    archived_skip -= 1
+                    continue
+                entry.pop("search_text", None)
+                entry.pop("search_tokens", None)
+                logs.append(entry)
+                if len(logs) > per_page:
+                    break
+        finally:
+            await archived.aclose()
+    
+    next_cursor = None
+    if len(logs) > per_page:
+        logs = logs[:per_page]
+        next_cursor = encode_cursor(logs[-1].get("timestamp"), logs[-1].get("id"))
     
     # تحويل التواريخ
     for log in logs:
         if isinstance(log.get('timestamp'), str):
             log['timestamp'] = datetime.fromisoformat(log['timestamp'])
+        log['timestamp'] = as_utc(log.get('timestamp'))
     
+    total_pages = (total_count + per_page - 1) // per_page if total_count is not None else None
     return {
         "logs": logs,
+        "next_cursor": next_cursor,
         "pagination": {
             "current_page": page,
             "per_page": per_page,
             "total_count": total_count,
+            "total_count_is_estimate": count_mode == "estimated" and total_count is not None and total_count >= AUDIT_COUNT_LIMIT,
             "total_pages": total_pages,
-            "has_next": page < total_pages,
-            "has_prev": page > 1
+            "has_next": next_cursor is not None,
+            "has_prev": page > 1 or cursor is not None
         }
     }
 
@@ -2124,7 +3704,7 @@ async def get_health_case(case_id: str):
 
 @api_router.post("/health-cases", response_model=HealthCase)
 async def create_health_case(case_input: HealthCaseCreate, admin: User = Depends(get_admin_user)):
-    case_dict = case_input.model_dump()
+    case_dict = await normalize_image_fields("health_cases", case_input.model_dump())
     case_obj = HealthCase(**case_dict)
     
     doc = case_obj.model_dump()
@@ -2139,7 +3719,7 @@ async def update_health_case(case_id: str, case_input: HealthCaseCreate, admin:
     if not existing:
         raise HTTPException(status_code=404, detail="Health case not found")
     
-    update_data = case_input.model_dump()
+    update_data = await normalize_image_fields("health_cases", case_input.model_dump())
     await db.health_cases.update_one({"id": case_id}, {"$set": update_data})
     
     updated = await db.health_cases.find_one({"id": case_id}, {"_id": 0})
@@ -2250,7 +3830,7 @@ async def get_projects():
 
 @api_router.post("/projects", response_model=Project)
 async def create_project(project_input: ProjectCreate, admin: User = Depends(get_admin_user)):
-    project_dict = project_input.model_dump()
+    project_dict = await normalize_image_fields("projects", project_input.model_dump())
     project_obj = Project(**project_dict)
     
     doc = project_obj.model_dump()
@@ -2265,7 +3845,7 @@ async def update_project(project_id: str, project_input: ProjectCreate, admin: U
     if not existing:
         raise HTTPException(status_code=404, detail="Project not found")
     
-    update_data = project_input.model_dump()
+    update_data = await normalize_image_fields("projects", project_input.model_dump())
     await db.projects.update_one({"id": project_id}, {"$set": update_data})
     
     updated = await db.projects.find_one({"id": project_id}, {"_id": 0})
@@ -2292,7 +3872,7 @@ async def get_stories():
 
 @api_router.post("/stories", response_model=SuccessStory)
 async def create_story(story_input: SuccessStoryCreate, admin: User = Depends(get_admin_user)):
-    story_dict = story_input.model_dump()
+    story_dict = await normalize_image_fields("stories", story_input.model_dump())
     story_obj = SuccessStory(**story_dict)
     
     doc = story_obj.model_dump()
@@ -2310,17 +3890,204 @@ async def delete_story(story_id: str, admin: User = Depends(get_admin_user)):
 
 # ============= Donations Routes =============
 
+# ============= Donations Query Helpers =============
+
+async def get_family_neighborhood_id(family_id: Optional[str]) -> Optional[str]:
+    """حي العائلة - يُخزن على التبرع حتى تقرأ اللجان تبرعات حيّها باستعلام واحد مفهرس"""
+    if not family_id:
+        return None
+    family = await db.families.find_one({"id": family_id}, {"_id": 0, "neighborhood_id": 1})
+    return family.get('neighborhood_id') if family else None
+
+async def sync_donations_neighborhood(family_id: str, neighborhood_id: Optional[str]):
+    await db.donations.update_many(
+        {"$or": [{"family_id": family_id}, {"target_id": family_id}]},
+        {"$set": {"neighborhood_id": neighborhood_id}}
+    )
+
+DONATIONS_PAGE_SIZE = int(os.environ.get('DONATIONS_PAGE_SIZE', 1000))
+DONATIONS_COUNT_LIMIT = int(os.environ.get('DONATIONS_COUNT_LIMIT', 10000))
+DONATION_SORT_FIELDS = {"created_at", "updated_at", "donation_date", "family_id", "amount", "status", "donor_name"}
+
+def encode_cursor(sort_value, last_id: str) -> str:
+    """ترميز موضع آخر صف (قيمة الفرز + id) كمؤشر للصفحة التالية"""
+    position = {"v": sort_value, "id": last_id}
+    if isinstance(sort_value, datetime):
+        position = {"v": sort_value.isoformat(), "t": "datetime", "id": last_id}
+    payload = json.dumps(position, ensure_ascii=False, default=str)
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+        if not isinstance(payload, dict) or "id" not in payload:
+            raise ValueError("invalid cursor")
+        if payload.get("t") == "datetime":
+            payload["v"] = datetime.fromisoformat(payload["v"])
+        return payload
+    except Exception:
+        raise HTTPException(status_code=400, detail="مؤشر الصفحة غير صالح")
+
+def build_keyset_filter(sort_field: str, sort_direction: int, last_value, last_id: str) -> dict:
+    """شرط الصفحة التالية على (sort_field, id) بنفس ترتيب الفرز
+    
+    القيم الفارغة (null) تأتي أولاً في الترتيب التصاعدي وأخيراً في التنازلي
+    """
+    op = "$lt" if sort_direction < 0 else "$gt"
+    same_value_next_id = {sort_field: last_value, "id": {op: last_id}}
+    if last_value is None:
+        if sort_direction < 0:
+            return same_value_next_id
+        return {"$or": [{sort_field: {"$ne": None}}, same_value_next_id]}
+    conditions = [{sort_field: {op: last_value}}, same_value_next_id]
+    if sort_direction < 0:
+        conditions.append({sort_field: None})
+    return {"$or": conditions}
+
+def parse_filter_date(value: str) -> datetime:
+    """تاريخ من معامل الطلب بتوقيت UTC (بدون منطقة زمنية = UTC، ويقبل Z و +03:00)"""
+    parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+def date_range_filter(field: str, date_from: Optional[str], date_to: Optional[str]) -> dict:
+    """فلترة نطاق تاريخ - date_to بصيغة YYYY-MM-DD يشمل اليوم كاملاً
+    
+    الحقل يُخزن كنص ISO بتوقيت UTC (datetime.now(timezone.utc).isoformat()) أو كتاريخ في السجلات القديمة،
+    لذلك تُحوّل الحدود إلى UTC بنفس الصيغة النصية وتُقارن أيضاً كتواريخ
+    """
+    bounds = {}
+    try:
+        if date_from:
+            bounds["$gte"] = parse_filter_date(date_from)
+        if date_to:
+            end = parse_filter_date(date_to)
+            if len(date_to.strip()) == 10:
+                bounds["$lt"] = end + timedelta(days=1)
+            else:
+                bounds["$lte"] = end
+    except ValueError:
+        raise HTTPException(status_code=400, detail="صيغة التاريخ غير صحيحة (YYYY-MM-DD)")
+    if not bounds:
+        return {}
+    return {"$or": [
+        {field: {op: value.isoformat() for op, value in bounds.items()}},
+        {field: bounds},
+    ]}
+
+def _field_or(field: str, default=None):
+    return {"$ifNull": [f"${field}", default]}
+
+def _is_empty(expr) -> dict:
+    """نفس منطق Python: القيم الفارغة والصفر و null تعتبر false"""
+    return {"$in": [{"$ifNull": [expr, None]}, [None, "", 0, False]]}
+
+def _first_truthy(expr, fallback) -> dict:
+    return {"$cond": [_is_empty(expr), fallback, expr]}
+
+def _lookup_by_id(collection: str, local_expr: str, as_field: str, fields: List[str]) -> List[dict]:
+    """ربط مستند واحد من مجموعة مرجعية عبر id مع جلب الحقول المطلوبة فقط"""
+    return [
+        {"$lookup": {
+            "from": collection,
+            "let": {"ref_id": local_expr},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$id", "$$ref_id"]}}},
+                {"$project": {"_id": 0, **{f: 1 for f in fields}}},
+                {"$limit": 1},
+            ],
+            "as": as_field,
+        }},
+        {"$unwind": {"path": f"${as_field}", "preserveNullAndEmptyArrays": True}},
+    ]
+
+def donation_listing_pipeline(match: dict, sort: List[tuple], limit: int, include_family: bool = True) -> List[dict]:
+    """
+    قائمة التبرعات باستعلام واحد: الفلترة والفرز ثم ربط العائلة والحي والتصنيف ($lookup)
+    مع توحيد الحقول القديمة (target_id, items, message, type) داخل الـ pipeline
+    - _sort_value: قيمة حقل الفرز الأصلية لبناء مؤشر الصفحة التالية
+    """
+    sort_field = sort[0][0]
+    pipeline = [
+        {"$match": match},
+        {"$sort": dict(sort)},
+        {"$limit": limit},
+        {"$addFields": {"_family_id": _first_truthy("$family_id", "$target_id")}},
+    ]
+    family_fields = {}
+    if include_family:
+        pipeline += _lookup_by_id("families", "$_family_id", "_family", ["fac_name", "name", "family_number", "neighborhood_id", "category_id"])
+        pipeline += _lookup_by_id("neighborhoods", "$_family.neighborhood_id", "_neighborhood", ["name"])
+        pipeline += _lookup_by_id("family_categories", "$_family.category_id", "_category", ["name"])
+        family_fields = {
+            # معلومات العائلة
+            "family_name": _first_truthy("$_family.fac_name", _field_or("_family.name")),
+            "family_number": _field_or("_family.family_number"),
+            "family_category": _field_or("_category.name"),
+            "neighborhood_name": _field_or("_neighborhood.name"),
+        }
+    pipeline.append({"$project": {
+        "_id": 0,
+        "id": 1,
+        "_sort_value": _field_or(sort_field),
+        "family_id": _field_or("_family_id"),
+        "donor_id": _field_or("donor_id"),
+        "donor_name": _field_or("donor_name", "متبرع"),
+        "donor_phone": _field_or("donor_phone"),
+        "donor_email": _field_or("donor_email"),
+        "donation_type": _first_truthy("$donation_type", _field_or("type", "مالية")),
+        "amount": {"$cond": [_is_empty("$amount"), _field_or("items", "غير محدد"), {"$toString": "$amount"}]},
+        "description": _first_truthy("$description", _field_or("message", "تبرع")),
+        "notes": _field_or("notes"),
+        "status": _field_or("status", "pending"),
+        "created_at": _field_or("created_at"),
+        "created_by_user_id": _field_or("created_by_user_id"),
+        "updated_at": _field_or("updated_at"),
+        "updated_by_user_id": _field_or("updated_by_user_id"),
+        "updated_by_user_name": _field_or("updated_by_user_name"),
+        "is_active": _field_or("is_active", True),
+        "completion_images": _field_or("completion_images", []),
+        "delivery_images": _field_or("delivery_images", []),
+        "cancellation_reason": _field_or("cancellation_reason"),
+        "transfer_type": _field_or("transfer_type", "fixed"),
+        "delivery_status": _field_or("delivery_status"),
+        "donation_date": _field_or("donation_date"),
+        **family_fields,
+        # إضافة الحقول القديمة للتوافق
+        "type": _field_or("type", "family"),
+        "target_id": _first_truthy("$target_id", _field_or("family_id")),
+        "items": _field_or("items"),
+        "message": _field_or("message"),
+    }})
+    return pipeline
+
 @api_router.get("/donations")
 async def get_donations(
+    response: Response,
     sort_by: str = "created_at", 
     sort_order: str = "desc",
+    status: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    donation_type: Optional[str] = None,
+    transfer_type: Optional[str] = None,
+    family_id: Optional[str] = None,
+    limit: int = DONATIONS_PAGE_SIZE,
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user)
 ):
-    """جلب جميع التبرعات مع الفرز - بدون response_model للتوافق مع البيانات القديمة
+    """جلب التبرعات مع الفرز والفلترة والتقسيم لصفحات - بدون response_model للتوافق مع البيانات القديمة
     
     Parameters:
-    - sort_by: الحقل المراد الفرز عليه (created_at, family_id, amount)
+    - sort_by: الحقل المراد الفرز عليه (created_at, family_id, amount, ...)
     - sort_order: اتجاه الفرز (asc, desc)
+    - status, donation_type, transfer_type, family_id: فلاتر اختيارية
+    - date_from, date_to: نطاق تاريخ الإنشاء (YYYY-MM-DD)
+    - limit: عدد الصفوف في الصفحة
+    - cursor: مؤشر الصفحة التالية (من الترويسة X-Next-Cursor للصفحة السابقة)
+    
+    الترويسات: X-Next-Cursor (إن وجدت صفحة تالية)، X-Total-Count (العدد الكلي حتى DONATIONS_COUNT_LIMIT)
     """
     # تحديد اتجاه الفرز
     sort_direction = -1 if sort_order == "desc" else 1
@@ -2329,107 +4096,63 @@ async def get_donations(
     sort_field = sort_by
     if sort_by == "family_name":
         sort_field = "family_id"  # سنفرز على family_id ثم نرتب في الكود
+    if sort_field not in DONATION_SORT_FIELDS:
+        raise HTTPException(status_code=400, detail="حقل الفرز غير مدعوم")
+    limit = max(1, min(limit, DONATIONS_PAGE_SIZE))
     
     # تحديد الاستعلام بناءً على دور المستخدم
+    filters = []
     if current_user.role == "admin":
         # الأدمن يرى كل شيء
-        donations = await db.donations.find({}, {"_id": 0}).sort(sort_field, sort_direction).to_list(1000)
+        pass
     elif current_user.role in ["committee_member", "committee_president"]:
         # موظفو اللجنة يرون تبرعات حيّهم فقط
         if not current_user.neighborhood_id:
             return []
-        # نحصل على عائلات الحي أولاً
-        families_in_neighborhood = await db.families.find(
-            {"neighborhood_id": current_user.neighborhood_id}, 
-            {"_id": 0, "id": 1}
-        ).to_list(1000)
-        family_ids_in_neighborhood = [f['id'] for f in families_in_neighborhood]
-        donations = await db.donations.find(
-            {"family_id": {"$in": family_ids_in_neighborhood}}, 
-            {"_id": 0}
-        ).sort(sort_field, sort_direction).to_list(1000)
+        filters.append({"neighborhood_id": current_user.neighborhood_id})
     else:
         # المتبرعون يرون تبرعاتهم فقط
-        donations = await db.donations.find({"donor_id": current_user.id}, {"_id": 0}).sort(sort_field, sort_direction).to_list(1000)
-    
-    # جلب معلومات العائلات والأحياء والتصنيفات
-    family_ids = list(set([d.get('family_id') or d.get('target_id') for d in donations if d.get('family_id') or d.get('target_id')]))
-    families_dict = {}
-    neighborhoods_dict = {}
-    categories_dict = {}
+        filters.append({"donor_id": current_user.id})
+    
+    # الفلاتر الاختيارية
+    if status:
+        filters.append({"status": status})
+    if donation_type:
+        filters.append({"donation_type": donation_type})
+    if transfer_type:
+        filters.append({"transfer_type": transfer_type})
+    if family_id:
+        filters.append({"$or": [{"family_id": family_id}, {"target_id": family_id}]})
+    date_filter = date_range_filter("created_at", date_from, date_to)
+    if date_filter:
+        filters.append(date_filter)
+    
+    query = {"$and": filters} if filters else {}
+    
+    # العدد الكلي (محدود حتى لا يتحول لمسح كامل على المجموعات الكبيرة)
+    total_count = await db.donations.count_documents(query, limit=DONATIONS_COUNT_LIMIT)
+    response.headers["X-Total-Count"] = str(total_count)
+    if total_count >= DONATIONS_COUNT_LIMIT:
+        response.headers["X-Total-Count-Limited"] = "true"
+    
+    page_query = query
+    if cursor:
+        position = decode_cursor(cursor)
+        page_query = {"$and": filters + [build_keyset_filter(sort_field, sort_direction, position.get("v"), position["id"])]}
+    
+    # نجلب صفاً إضافياً لمعرفة وجود صفحة تالية - مع ربط العائلة والحي والتصنيف في نفس الاستعلام
+    donations = await db.donations.aggregate(
+        donation_listing_pipeline(page_query, [(sort_field, sort_direction), ("id", sort_direction)], limit + 1)
+    ).to_list(limit + 1)
+    if len(donations) > limit:
+        donations = donations[:limit]
+        last = donations[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last.get("_sort_value"), last.get("id"))
     
-    if family_ids:
-        families = await db.families.find({"id": {"$in": family_ids}}, {"_id": 0}).to_list(1000)
-        for family in families:
-            families_dict[family['id']] = family
-            
-        # جلب الأحياء
-        neighborhood_ids = list(set([f.get('neighborhood_id') for f in families if f.get('neighborhood_id')]))
-        if neighborhood_ids:
-            neighborhoods = await db.neighborhoods.find({"id": {"$in": neighborhood_ids}}, {"_id": 0}).to_list(1000)
-            for neighborhood in neighborhoods:
-                neighborhoods_dict[neighborhood['id']] = neighborhood
-        
-        # جلب التصنيفات
-        category_ids = list(set([f.get('category_id') for f in families if f.get('category_id')]))
-        if category_ids:
-            categories = await db.family_categories.find({"id": {"$in": category_ids}}, {"_id": 0}).to_list(1000)
-            for category in categories:
-                categories_dict[category['id']] = category
-    
-    # تحويل البيانات للصيغة الموحدة
-    result = []
     for donation in donations:
-        # تحويل التواريخ
-        if isinstance(donation.get('created_at'), str):
-            donation['created_at'] = datetime.fromisoformat(donation['created_at'])
-        
-        # الحصول على معلومات العائلة
-        family_id = donation.get('family_id') or donation.get('target_id')
-        family = families_dict.get(family_id, {})
-        neighborhood = neighborhoods_dict.get(family.get('neighborhood_id'), {}) if family else {}
-        category = categories_dict.get(family.get('category_id'), {}) if family else {}
-        
-        # توحيد الحقول بين القديم والجديد
-        normalized = {
-            'id': donation.get('id'),
-            'family_id': family_id,
-            'donor_id': donation.get('donor_id'),
-            'donor_name': donation.get('donor_name', 'متبرع'),
-            'donor_phone': donation.get('donor_phone'),
-            'donor_email': donation.get('donor_email'),
-            'donation_type': donation.get('donation_type') or donation.get('type', 'مالية'),
-            'amount': str(donation.get('amount', '')) if donation.get('amount') else donation.get('items', 'غير محدد'),
-            'description': donation.get('description') or donation.get('message', 'تبرع'),
-            'notes': donation.get('notes'),
-            'status': donation.get('status', 'pending'),
-            'created_at': donation.get('created_at'),
-            'created_by_user_id': donation.get('created_by_user_id'),
-            'updated_at': donation.get('updated_at'),
-            'updated_by_user_id': donation.get('updated_by_user_id'),
-            'updated_by_user_name': donation.get('updated_by_user_name'),
-            'is_active': donation.get('is_active', True),
-            # الحقول الجديدة
-            'completion_images': donation.get('completion_images', []),
-            'delivery_images': donation.get('delivery_images', []),
-            'cancellation_reason': donation.get('cancellation_reason'),
-            'transfer_type': donation.get('transfer_type', 'fixed'),
-            'delivery_status': donation.get('delivery_status'),
-            'donation_date': donation.get('donation_date'),
-            # معلومات العائلة
-            'family_name': family.get('fac_name') or family.get('name'),
-            'family_number': family.get('family_number'),
-            'family_category': category.get('name'),
-            'neighborhood_name': neighborhood.get('name'),
-            # إضافة الحقول القديمة للتوافق
-            'type': donation.get('type', 'family'),
-            'target_id': donation.get('target_id') or donation.get('family_id'),
-            'items': donation.get('items'),
-            'message': donation.get('message')
-        }
-        result.append(normalized)
+        donation.pop("_sort_value", None)
     
-    return result
+    return donations
 
 @api_router.post("/donations", response_model=Donation)
 async def create_donation(donation_input: DonationCreate, current_user: User = Depends(get_current_user)):
@@ -2450,6 +4173,8 @@ async def create_donation(donation_input: DonationCreate, current_user: User = D
     else:
         donation_dict['donation_date'] = None
     
+    donation_dict['parsed_amount'] = parse_amount(donation_dict.get('amount'))
+    donation_dict['neighborhood_id'] = await get_family_neighborhood_id(donation_dict.get('family_id'))
     donation_obj = Donation(**donation_dict)
     
     doc = donation_obj.model_dump()
@@ -2471,7 +4196,7 @@ async def create_donation(donation_input: DonationCreate, current_user: User = D
     
     # تحديث مجموع التبرعات للعائلة إذا كان التبرع مرتبط بعائلة
     if donation_dict.get('family_id'):
-        await update_family_total_donations_amount(donation_dict['family_id'])
+        await apply_family_totals_delta(donation_dict['family_id'], donation_totals_delta(doc, 1))
     
     return donation_obj
 
@@ -2481,52 +4206,22 @@ async def get_family_donations(family_id: str):
     try:
         # البحث بكلا الحقلين: family_id (الجديد) و target_id (القديم)
         # جلب جميع التبرعات (النشطة وغير النشطة)
-        donations = await db.donations.find(
+        donations = await db.donations.aggregate(donation_listing_pipeline(
             {
                 "$or": [
                     {"family_id": family_id},
                     {"target_id": family_id, "type": "family"}
                 ]
             },
-            {"_id": 0}
-        ).sort("created_at", -1).to_list(1000)
+            [("created_at", -1), ("id", -1)],
+            DONATIONS_PAGE_SIZE,
+            include_family=False
+        )).to_list(DONATIONS_PAGE_SIZE)
         
-        # تحويل البيانات القديمة للصيغة الجديدة
-        result = []
         for donation in donations:
-            # تحويل التواريخ
-            if isinstance(donation.get('created_at'), str):
-                donation['created_at'] = datetime.fromisoformat(donation['created_at'])
-            
-            # توحيد الحقول
-            normalized = {
-                'id': donation.get('id'),
-                'family_id': donation.get('family_id') or donation.get('target_id'),
-                'donor_id': donation.get('donor_id'),
-                'donor_name': donation.get('donor_name', 'متبرع'),
-                'donor_phone': donation.get('donor_phone'),
-                'donor_email': donation.get('donor_email'),
-                'donation_type': donation.get('donation_type') or donation.get('type', 'مالية'),
-                'amount': str(donation.get('amount', '')) if donation.get('amount') else donation.get('items', 'غير محدد'),
-                'description': donation.get('description') or donation.get('message', 'تبرع'),
-                'notes': donation.get('notes'),
-                'status': donation.get('status', 'pending'),
-                'delivery_status': donation.get('delivery_status'),
-                'donation_date': donation.get('donation_date'),
-                'transfer_type': donation.get('transfer_type', 'fixed'),
-                'completion_images': donation.get('completion_images', []),
-                'cancellation_reason': donation.get('cancellation_reason'),
-                'updated_at': donation.get('updated_at'),
-                'is_active': donation.get('is_active', True),
-                'updated_by_user_id': donation.get('updated_by_user_id'),
-                'updated_by_user_name': donation.get('updated_by_user_name'),
-                'created_at': donation.get('created_at'),
-                'created_by_user_id': donation.get('created_by_user_id'),
-                'is_active': donation.get('is_active', True)
-            }
-            result.append(normalized)
+            donation.pop("_sort_value", None)
         
-        return result
+        return donations
     except Exception as e:
         print(f"Error fetching family donations: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -2569,7 +4264,8 @@ async def update_donation_status(
         
         # إضافة صور الاستلام إذا كانت الحالة مكتملة
         if request.status == 'completed' and request.completion_images:
-            update_data["completion_images"] = request.completion_images
+            update_data["completion_images"] = await store_data_urls(request.completion_images)
+            schedule_image_renditions(update_data["completion_images"])
             changes["completion_images"] = {"count": len(request.completion_images)}
         
         # إضافة سبب الإلغاء إذا كانت الحالة ملغاة
@@ -2581,77 +4277,58 @@ async def update_donation_status(
         update_data["updated_by_user_id"] = current_user.id
         update_data["updated_by_user_name"] = current_user.full_name
         
-        await db.donations.update_one(
+        previous_donation = await db.donations.find_one_and_update(
             {"id": donation_id},
-            {"$set": update_data}
-        )
+            {"$set": update_data},
+            projection={"_id": 0},
+            return_document=ReturnDocument.BEFORE
+        ) or donation
+        
+        # تحديث الملخص المالي للعائلة بفرق الحالة (نقل المبلغ من الحالة القديمة للجديدة)
+        totals_family_id = donation.get('family_id')
+        new_donation_state = {**previous_donation, **update_data}
+        await apply_family_totals_delta(totals_family_id, merge_totals_deltas(
+            donation_totals_delta(previous_donation, -1),
+            donation_totals_delta(new_donation_state, 1)
+        ))
         
         # معالجة خاصة عند إكمال التبرع
         additional_info = {}
+        family_id = donation.get('family_id') or donation.get('target_id')
         if request.status == 'completed':
-            family_id = donation.get('family_id') or donation.get('target_id')
-            print(f"🔍 DEBUG: Processing completed donation for family_id: {family_id}")
-            print(f"🔍 DEBUG: Donation data: {donation}")
+            logger.debug("Processing completed donation %s for family_id: %s", donation_id, family_id)
             
             if family_id:
                 # 1. حساب مجموع كل الاحتياجات (النشطة والمتوقفة)
-                all_needs = await db.family_needs.find(
+                # المبلغ التقديري إن وجد، وإلا المبلغ الرقمي المحفوظ
+                active_needs_count = await db.family_needs.count_documents(
+                    {"family_id": family_id, "is_active": {"$ne": False}}
+                )
+                total_needs = await sum_amounts(
+                    db.family_needs,
                     {"family_id": family_id},
-                    {"_id": 0}
-                ).to_list(1000)
-                
-                active_needs = [n for n in all_needs if n.get('is_active', True) != False]
-                
-                print(f"🔍 DEBUG: Found {len(all_needs)} total needs, {len(active_needs)} active")
-                
-                # حساب إجمالي كل الاحتياجات
-                total_needs = 0.0
-                for need in all_needs:
-                    estimated = need.get('estimated_amount', 0.0)
-                    if estimated and estimated > 0:
-                        total_needs += estimated
-                    else:
-                        amount_str = need.get('amount', '')
-                        if amount_str:
-                            try:
-                                import re
-                                clean_str = str(amount_str).replace(",", "").replace(" ", "").replace("ل.س", "")
-                                numbers = re.findall(r'\d+(?:\.\d+)?', clean_str)
-                                if numbers:
-                                    for num in numbers:
-                                        total_needs += float(num)
-                            except Exception as e:
-                                print(f"خطأ في معالجة مبلغ الاحتياج '{amount_str}': {e}")
+                    {"$cond": [
+                        {"$gt": [{"$ifNull": ["$estimated_amount", 0]}, 0]},
+                        "$estimated_amount",
+                        _stored_amount_expr()
+                    ]}
+                )
                 
                 # حساب مجموع كل التبرعات المكتملة (بما فيها هذا التبرع)
-                all_completed_donations = await db.donations.find(
+                total_completed_amount = await sum_amounts(
+                    db.donations,
                     {
                         "family_id": family_id,
                         "status": "completed",
                         "is_active": True
-                    },
-                    {"_id": 0}
-                ).to_list(1000)
+                    }
+                )
                 
-                total_completed_amount = 0.0
-                for don in all_completed_donations:
-                    amount_str = don.get('amount', '')
-                    if amount_str:
-                        try:
-                            import re
-                            clean_str = str(amount_str).replace(",", "").replace(" ", "").replace("ل.س", "")
-                            numbers = re.findall(r'\d+(?:\.\d+)?', clean_str)
-                            if numbers:
-                                for num in numbers:
-                                    total_completed_amount += float(num)
-                        except Exception as e:
-                            print(f"خطأ في معالجة مبلغ التبرع '{amount_str}': {e}")
-                
-                print(f"🔍 DEBUG: Total needs (all): {total_needs}, Total completed donations: {total_completed_amount}")
+                logger.debug("Total needs (all): %s, total completed donations: %s", total_needs, total_completed_amount)
                 
                 # 2. إذا كان مجموع التبرعات المكتملة >= مجموع الاحتياجات
                 if total_completed_amount >= total_needs and total_needs > 0:
-                    print(f"✅ DEBUG: Donation covers needs! Deactivating {len(active_needs)} family needs")
+                    logger.debug("Donation covers needs, deactivating %s family needs", active_needs_count)
                     
                     # إيقاف جميع احتياجات العائلة (في family_needs وليس needs)
                     result = await db.family_needs.update_many(
@@ -2665,14 +4342,14 @@ async def update_donation_status(
                         }}
                     )
                     
-                    print(f"✅ DEBUG: Updated {result.modified_count} needs")
+                    logger.debug("Updated %s needs", result.modified_count)
                     
                     # حساب المبلغ الزائد
                     excess_amount = total_completed_amount - total_needs
                     if excess_amount > 0:
                         additional_info["excess_amount"] = excess_amount
                         additional_info["message"] = f"تنبيه: يوجد مبلغ زائد قدره {excess_amount:,.0f} ل.س"
-                        print(f"⚠️ DEBUG: Excess amount: {excess_amount}")
+                        logger.debug("Excess amount: %s", excess_amount)
                     
                     additional_info["needs_deactivated"] = result.modified_count
                     additional_info["total_needs"] = total_needs
@@ -2689,10 +4366,9 @@ async def update_donation_status(
                         {"_id": 0}
                     ).to_list(1000)
                     
-                    print(f"🔍 DEBUG: Found {len(other_donations)} other donations (pending/inprogress)")
+                    logger.debug("Found %s other donations (pending/inprogress)", len(other_donations))
                     
                     if other_donations:
-                        print(f"✅ DEBUG: Converting {len(other_donations)} donations to transferable")
                         # تحويلها إلى قابلة للنقل وتعطيلها
                         result = await db.donations.update_many(
                             {
@@ -2711,12 +4387,15 @@ async def update_donation_status(
                             }}
                         )
                         
-                        print(f"✅ DEBUG: Updated {result.modified_count} donations")
+                        logger.debug("Converted %s donations to transferable", result.modified_count)
                         additional_info["other_donations_deactivated"] = len(other_donations)
+                        
+                        # update_many قد يشمل تبرعات تغيرت بعد قراءتها: إعادة حساب ملخص العائلة في الخلفية
+                        family_summary_queue.mark_dirty(family_id)
                 else:
-                    print(f"❌ DEBUG: Conditions not met - total_completed: {total_completed_amount}, total_needs: {total_needs}")
+                    logger.debug("Needs not covered - total completed: %s, total needs: %s", total_completed_amount, total_needs)
             else:
-                print(f"❌ DEBUG: No family_id found in donation!")
+                logger.debug("No family_id found in donation %s", donation_id)
         
         # تسجيل في التاريخ
         await log_donation_history(
@@ -2729,11 +4408,6 @@ async def update_donation_status(
             changes=changes
         )
         
-        # تحديث الملخص المالي للعائلة
-        if family_id:
-            await update_family_total_donations_amount(family_id)
-            await update_family_total_needs_amount(family_id)
-        
         # جلب التبرع المحدث
         updated_donation = await db.donations.find_one({"id": donation_id}, {"_id": 0})
         
@@ -2777,16 +4451,19 @@ async def transfer_donation_to_family(
         old_family = await db.families.find_one({"id": old_family_id}, {"_id": 0}) if old_family_id else None
         
         # تحديث التبرع
-        await db.donations.update_one(
+        previous_donation = await db.donations.find_one_and_update(
             {"id": donation_id},
             {"$set": {
                 "family_id": new_family_id,
+                "neighborhood_id": new_family.get('neighborhood_id'),
                 "transfer_type": "fixed",  # تحويل لثابت
                 "updated_at": datetime.now(timezone.utc).isoformat(),
                 "updated_by_user_id": current_user.id,
                 "updated_by_user_name": current_user.full_name
-            }}
-        )
+            }},
+            projection={"_id": 0},
+            return_document=ReturnDocument.BEFORE
+        ) or donation
         
         # تسجيل في التاريخ
         await log_donation_history(
@@ -2801,10 +4478,9 @@ async def transfer_donation_to_family(
             }
         )
         
-        # تحديث المبالغ للعائلتين
-        if old_family_id:
-            await update_family_total_donations_amount(old_family_id)
-        await update_family_total_donations_amount(new_family_id)
+        # تحديث المبالغ للعائلتين (إزالة من القديمة وإضافة للجديدة)
+        await apply_family_totals_delta(previous_donation.get('family_id'), donation_totals_delta(previous_donation, -1))
+        await apply_family_totals_delta(new_family_id, donation_totals_delta(previous_donation, 1))
         
         return {"message": "تم نقل التبرع بنجاح"}
         
@@ -2867,23 +4543,228 @@ async def get_donation_history(
 ):
     """الحصول على سجل تاريخ التبرع"""
     try:
+        await audit_sink.flush()  # إظهار الحركات التي لم تُكتب بعد
         history = await db.donation_history.find(
             {"donation_id": donation_id},
             {"_id": 0}
         ).sort("timestamp", -1).to_list(1000)
         
+        # السجلات الأقدم من فترة الاحتفاظ في الأرشيف
+        if len(history) < 1000 and await has_archived_history("donation_history", donation_id):
+            hot_ids = {entry["id"] for entry in history}
+            archived = await load_archived_history("donation_history", donation_id)
+            history += [entry for entry in archived if entry["id"] not in hot_ids][:1000 - len(history)]
+        
         return history
     except Exception as e:
         print(f"Error fetching donation history: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# ============= Family Timeline (سجل نشاط العائلة الموحّد) =============
+
+TIMELINE_PAGE_SIZE = 20
+
+# نوع الحدث -> (المجموعة، حقل الوقت)
+TIMELINE_SOURCES = {
+    "donation": ("donations", "created_at"),
+    "donation_history": ("donation_history", "timestamp"),
+    "need_audit": ("family_needs_audit_log", "timestamp"),
+}
+
+TIMELINE_PROJECTIONS = {
+    "donation": {"_id": 0, "completion_images": 0},
+    "donation_history": {"_id": 0},
+    "need_audit": {"_id": 0, "search_text": 0, "search_tokens": 0},
+}
+
+def timeline_time(value):
+    """وقت الحدث كتاريخ UTC (التبرعات تخزن created_at كنص ISO)"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return as_utc(value)
+
+class TimelineEntry:
+    """عنصر في heap الدمج - الترتيب معكوس (الأحدث أولاً) حسب (الوقت، النوع، id)"""
+    __slots__ = ("key", "kind", "doc", "stream")
+
+    def __init__(self, kind: str, doc: dict, timestamp: datetime):
+        self.key = (timestamp, kind, doc["id"])
+        self.kind = kind
+        self.doc = doc
+        self.stream = None
+
+    def __lt__(self, other):
+        return self.key > other.key
+
+# التبرعات تخزن created_at كنص ISO بصيغ مختلفة (Z، +00:00، بدون منطقة) أو كتاريخ في السجلات القديمة
+# ترتيب النصوص لا يطابق ترتيب الوقت، لذلك يُحوّل الوقت إلى تاريخ داخل الاستعلام قبل الفرز والمقارنة
+TIMELINE_NORMALIZED_TIME_KINDS = {"donation"}
+
+def timeline_position_filter(kind: str, field: str, position) -> dict:
+    """شرط ما بعد position (الوقت، النوع، id) على حقل الوقت"""
+    timestamp, position_kind, position_id = position
+    if kind == position_kind:
+        return build_keyset_filter(field, -1, timestamp, position_id)
+    # عند تساوي الوقت يأتي النوع الأصغر بعد الأكبر
+    return {field: {"$lte" if kind < position_kind else "$lt": timestamp}}
+
+async def timeline_hot_stream(kind: str, query: dict, position, limit: int):
+    """مؤشر مرتب (الأحدث أولاً) على مجموعة - يقرأ limit مستند على الأكثر"""
+    collection, time_field = TIMELINE_SOURCES[kind]
+    if kind in TIMELINE_NORMALIZED_TIME_KINDS:
+        pipeline = [
+            {"$match": query},
+            {"$addFields": {"_timeline_time": {"$convert": {"input": f"${time_field}", "to": "date", "onError": None, "onNull": None}}}},
+            {"$match": {"_timeline_time": {"$type": "date"}}},
+        ]
+        if position:
+            pipeline.append({"$match": timeline_position_filter(kind, "_timeline_time", position)})
+        pipeline += [
+            {"$sort": {"_timeline_time": -1, "id": -1}},
+            {"$limit": limit},
+            {"$project": TIMELINE_PROJECTIONS[kind]},
+        ]
+        async for doc in db[collection].aggregate(pipeline):
+            yield TimelineEntry(kind, doc, as_utc(doc.pop("_timeline_time")))
+        return
+    if position:
+        query = {**query, **timeline_position_filter(kind, time_field, position)}
+    cursor = db[collection].find(query, TIMELINE_PROJECTIONS[kind]).sort([(time_field, -1), ("id", -1)])
+    async for doc in cursor.limit(limit):
+        timestamp = timeline_time(doc.get(time_field))
+        if timestamp is not None:
+            yield TimelineEntry(kind, doc, timestamp)
+
+async def timeline_archive_stream(kind: str, keys: List[str], position):
+    """السجلات المؤرشفة كأحداث في سجل النشاط (بنفس الترتيب)"""
+    archived = iter_archived_history(TIMELINE_SOURCES[kind][0], keys, position[0] if position else None)
+    try:
+        async for doc in archived:
+            doc.pop("search_text", None)
+            doc.pop("search_tokens", None)
+            entry = TimelineEntry(kind, doc, as_utc(doc["timestamp"]))
+            if not position or entry.key < position:
+                yield entry
+    finally:
+        await archived.aclose()
+
+async def push_next_timeline_entry(heap: list, stream):
+    try:
+        entry = await stream.__anext__()
+    except StopAsyncIteration:
+        return
+    entry.stream = stream
+    heapq.heappush(heap, entry)
+
+async def merge_timeline(streams: list, limit: int) -> List[TimelineEntry]:
+    """دمج k مصدر مرتب عبر heap - يُقرأ من كل مصدر العنصر التالي فقط عند الحاجة"""
+    heap = []
+    for stream in streams:
+        await push_next_timeline_entry(heap, stream)
+    entries = []
+    seen = set()
+    while heap and len(entries) < limit:
+        entry = heapq.heappop(heap)
+        await push_next_timeline_entry(heap, entry.stream)
+        # السجل قد يظهر في المجموعة والأرشيف معاً أثناء الأرشفة
+        if (entry.kind, entry.doc["id"]) in seen:
+            continue
+        seen.add((entry.kind, entry.doc["id"]))
+        entries.append(entry)
+    for stream in streams:
+        await stream.aclose()
+    return entries
+
+@api_router.get("/families/{family_id}/timeline")
+async def get_family_timeline(
+    family_id: str,
+    current_user: User = Depends(get_current_user),
+    limit: int = TIMELINE_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    types: Optional[str] = None
+):
+    """سجل نشاط العائلة: التبرعات وتاريخها وحركات الاحتياجات مدموجة ومرتبة من الأحدث للأقدم
+    
+    - types: أنواع الأحداث مفصولة بفاصلة (donation, donation_history, need_audit) - الافتراضي الكل
+    - cursor: القيمة من next_cursor في الرد السابق
+    """
+    family = await db.families.find_one(filter_by_neighborhood(current_user, {"id": family_id}), {"_id": 0, "id": 1})
+    if not family:
+        raise HTTPException(status_code=404, detail="Family not found")
+    
+    kinds = types.split(",") if types else list(TIMELINE_SOURCES)
+    if any(kind not in TIMELINE_SOURCES for kind in kinds):
+        raise HTTPException(status_code=400, detail=f"types يجب أن تكون من: {', '.join(TIMELINE_SOURCES)}")
+    limit = max(1, min(limit, 100))
+    
+    position = None
+    if cursor:
+        payload = decode_cursor(cursor)
+        position_kind, _, position_id = str(payload["id"]).partition("/")
+        if position_kind not in TIMELINE_SOURCES or not isinstance(payload.get("v"), datetime):
+            raise HTTPException(status_code=400, detail="مؤشر الصفحة غير صالح")
+        position = (as_utc(payload["v"]), position_kind, position_id)
+    
+    await audit_sink.flush()  # إظهار الحركات التي لم تُكتب بعد
+    # التبرعات القديمة مربوطة بالعائلة عبر target_id
+    family_donations = {"$or": [{"family_id": family_id}, {"target_id": family_id}]}
+    streams = []
+    if "donation" in kinds:
+        streams.append(timeline_hot_stream("donation", family_donations, position, limit + 1))
+    if "donation_history" in kinds:
+        donation_ids = await db.donations.distinct("id", family_donations)
+        if donation_ids:
+            streams.append(timeline_hot_stream("donation_history", {"donation_id": {"$in": donation_ids}}, position, limit + 1))
+            streams.append(timeline_archive_stream("donation_history", donation_ids, position))
+    if "need_audit" in kinds:
+        streams.append(timeline_hot_stream("need_audit", {"family_id": family_id}, position, limit + 1))
+        streams.append(timeline_archive_stream("need_audit", [family_id], position))
+    
+    entries = await merge_timeline(streams, limit + 1)
+    next_cursor = None
+    if len(entries) > limit:
+        entries = entries[:limit]
+        last = entries[-1]
+        next_cursor = encode_cursor(last.key[0], f"{last.kind}/{last.doc['id']}")
+    
+    return {
+        "items": [
+            {"type": entry.kind, "id": entry.doc["id"], "timestamp": entry.key[0], "data": entry.doc}
+            for entry in entries
+        ],
+        "next_cursor": next_cursor,
+        "has_next": next_cursor is not None
+    }
+
 @api_router.post("/admin/recalculate-family-totals")
-async def recalculate_all_family_totals(current_user: User = Depends(get_current_user)):
-    """إعادة حساب جميع المبالغ الإجمالية لجميع العائلات - للمشرفين فقط"""
+async def recalculate_all_family_totals(
+    mode: str = "pipeline",
+    current_user: User = Depends(get_current_user)
+):
+    """إعادة حساب جميع المبالغ الإجمالية لجميع العائلات - للمشرفين فقط
+
+    Parameters:
+    - mode: pipeline (حساب جماعي على الخادم عبر $group و $merge) أو legacy (عائلة تلو الأخرى)
+    """
     if current_user.role != 'admin':
         raise HTTPException(status_code=403, detail="غير مصرح")
-    
+
+    if mode not in ["pipeline", "legacy"]:
+        raise HTTPException(status_code=400, detail="mode must be 'pipeline' or 'legacy'")
+
     try:
+        if mode == "pipeline":
+            started_at = datetime.now(timezone.utc)
+            await recalculate_family_totals_pipeline()
+            updated_count = await db.families.count_documents({})
+            duration = (datetime.now(timezone.utc) - started_at).total_seconds()
+            return {
+                "success": True,
+                "message": f"تم تحديث {updated_count} عائلة بنجاح",
+                "updated_count": updated_count,
+                "duration_seconds": duration
+            }
+
         families = await db.families.find({}, {"_id": 0, "id": 1}).to_list(10000)
         updated_count = 0
         results = []
@@ -2910,6 +4791,349 @@ async def recalculate_all_family_totals(current_user: User = Depends(get_current
         print(f"خطأ في إعادة الحساب: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# ============= Family Totals Reconciliation (background) =============
+
+RECONCILIATION_JOB_ID = "family_totals_reconciliation"
+RECONCILIATION_BATCH_SIZE = int(os.environ.get('RECONCILIATION_BATCH_SIZE', 200))
+RECONCILIATION_CONCURRENCY = int(os.environ.get('RECONCILIATION_CONCURRENCY', 8))
+RECONCILIATION_START_DELAY_SECONDS = float(os.environ.get('RECONCILIATION_START_DELAY_SECONDS', 5))
+# إعادة المطابقة الكاملة بعد اكتمالها (0 = لا تُعاد، فقط تُستكمل المطابقة المتوقفة)
+RECONCILIATION_RERUN_HOURS = float(os.environ.get('RECONCILIATION_RERUN_HOURS', 0))
+# عقد (lease) المهمة: عامل واحد فقط ينفذها، ويُجدد مع كل دفعة
+RECONCILIATION_LEASE_SECONDS = float(os.environ.get('RECONCILIATION_LEASE_SECONDS', 300))
+WORKER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:12]}"
+# الفحص الدوري لتطابق المبالغ المحدثة بالفروقات ($inc) مع الحساب الكامل
+FAMILY_TOTALS_CHECK_INTERVAL_HOURS = float(os.environ.get('FAMILY_TOTALS_CHECK_INTERVAL_HOURS', 24))
+
+app_state = {
+    "started": False,
+    "migrations_task": None,
+    "reconciliation_task": None,
+    "consistency_check_task": None,
+}
+
+async def _reconcile_family(family_id: str, semaphore: asyncio.Semaphore):
+    async with semaphore:
+        # نفس pipeline الحساب الكامل - لا يكتب فوق فرق $inc وصل أثناء الحساب
+        await recalculate_family_totals_pipeline([family_id])
+
+def reconciliation_due(job: Optional[dict]) -> bool:
+    """المطابقة مطلوبة أول مرة، أو لاستكمال مطابقة متوقفة، أو بعد RECONCILIATION_RERUN_HOURS من آخر اكتمال"""
+    if not job or job.get("status") in (None, "running"):
+        return True
+    finished_at = as_utc(job.get("finished_at"))
+    if not RECONCILIATION_RERUN_HOURS or not isinstance(finished_at, datetime):
+        return False
+    return datetime.now(timezone.utc) - finished_at >= timedelta(hours=RECONCILIATION_RERUN_HOURS)
+
+async def acquire_reconciliation_lease() -> Optional[dict]:
+    """حجز المهمة لهذا العامل (findOneAndUpdate ذري) - يعيد المستند أو None إذا كان العقد لدى عامل آخر"""
+    now = datetime.now(timezone.utc)
+    await db.maintenance_jobs.update_one(
+        {"id": RECONCILIATION_JOB_ID},
+        {"$setOnInsert": {"status": None}},
+        upsert=True
+    )
+    return await db.maintenance_jobs.find_one_and_update(
+        {"id": RECONCILIATION_JOB_ID, "$or": [
+            {"lease_owner": WORKER_ID},
+            {"lease_expires_at": None},
+            {"lease_expires_at": {"$lt": now}},
+        ]},
+        {"$set": {"lease_owner": WORKER_ID, "lease_expires_at": now + timedelta(seconds=RECONCILIATION_LEASE_SECONDS)}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+
+async def update_reconciliation_job(fields: dict, release: bool = False) -> bool:
+    """حفظ التقدم وتجديد العقد - يعيد False إذا فقد هذا العامل العقد"""
+    now = datetime.now(timezone.utc)
+    lease_expires_at = None if release else now + timedelta(seconds=RECONCILIATION_LEASE_SECONDS)
+    result = await db.maintenance_jobs.update_one(
+        {"id": RECONCILIATION_JOB_ID, "lease_owner": WORKER_ID},
+        {"$set": {**fields, "updated_at": now, "lease_expires_at": lease_expires_at}}
+    )
+    return result.matched_count > 0
+
+async def run_family_totals_reconciliation():
+    """
+    إعادة مطابقة المبالغ الإجمالية لجميع العائلات في الخلفية
+    - تتم المعالجة على دفعات مع حد أقصى للتوازي
+    - يتم حفظ التقدم في maintenance_jobs لاستكمال العمل بعد إعادة التشغيل
+    - تعمل مرة واحدة (ثم كل RECONCILIATION_RERUN_HOURS إن حُدد) وعلى عامل واحد فقط عبر عقد في maintenance_jobs
+    """
+    await asyncio.sleep(RECONCILIATION_START_DELAY_SECONDS)
+
+    while True:
+        job = await db.maintenance_jobs.find_one({"id": RECONCILIATION_JOB_ID}, {"_id": 0})
+        if not reconciliation_due(job):
+            return
+        job = await acquire_reconciliation_lease()
+        if job:
+            break
+        # عامل آخر ينفذ المطابقة - ننتظر حتى تنتهي أو ينتهي عقده (توقف العامل)
+        await asyncio.sleep(RECONCILIATION_LEASE_SECONDS)
+
+    if not reconciliation_due(job):
+        await update_reconciliation_job({}, release=True)
+        return
+    if job.get("status") == "running":
+        # استكمال العمل من آخر نقطة محفوظة
+        last_family_id = job.get("last_family_id") or ""
+        processed = job.get("processed", 0)
+        logger.info(f"استكمال مطابقة المبالغ من العائلة {last_family_id} ({processed} تمت معالجتها)")
+    else:
+        last_family_id = ""
+        processed = 0
+        total = await db.families.count_documents({})
+        await update_reconciliation_job({
+            "status": "running",
+            "total": total,
+            "processed": 0,
+            "last_family_id": None,
+            "started_at": datetime.now(timezone.utc),
+            "finished_at": None,
+            "error": None
+        })
+
+    semaphore = asyncio.Semaphore(RECONCILIATION_CONCURRENCY)
+    try:
+        while True:
+            # ترقيم بالمفتاح (keyset) على id لتجنب skip
+            batch = await db.families.find(
+                {"id": {"$gt": last_family_id}},
+                {"_id": 0, "id": 1}
+            ).sort("id", 1).limit(RECONCILIATION_BATCH_SIZE).to_list(RECONCILIATION_BATCH_SIZE)
+            if not batch:
+                break
+
+            await asyncio.gather(*[_reconcile_family(f["id"], semaphore) for f in batch])
+
+            last_family_id = batch[-1]["id"]
+            processed += len(batch)
+            if not await update_reconciliation_job({"last_family_id": last_family_id, "processed": processed}):
+                logger.warning("فقد هذا العامل عقد مطابقة المبالغ - يتوقف ويستكملها العامل الآخر")
+                return
+
+        await update_reconciliation_job({
+            "status": "completed",
+            "finished_at": datetime.now(timezone.utc)
+        }, release=True)
+        logger.info(f"تمت مطابقة المبالغ الإجمالية لـ {processed} عائلة")
+    except asyncio.CancelledError:
+        # تبقى الحالة running ليتم الاستكمال عند التشغيل التالي - ويُحرر العقد فوراً
+        await asyncio.shield(update_reconciliation_job({}, release=True))
+        raise
+    except Exception as e:
+        logger.error(f"خطأ في مطابقة المبالغ الإجمالية: {e}")
+        await update_reconciliation_job({"error": str(e)}, release=True)
+
+async def run_periodic_family_totals_check():
+    """إعادة الحساب الكامل دورياً (pipeline واحد) لتصحيح أي انحراف في المبالغ المحدثة بالفروقات"""
+    while True:
+        await asyncio.sleep(FAMILY_TOTALS_CHECK_INTERVAL_HOURS * 3600)
+        try:
+            started_at = datetime.now(timezone.utc)
+            await recalculate_family_totals_pipeline()
+            duration = (datetime.now(timezone.utc) - started_at).total_seconds()
+            logger.info(f"تم الفحص الدوري لمبالغ العائلات خلال {duration:.1f} ثانية")
+        except Exception as e:
+            logger.error(f"خطأ في الفحص الدوري لمبالغ العائلات: {e}")
+
+# ============= History Archive (أرشفة السجلات القديمة) =============
+
+# السجلات الأقدم من فترة الاحتفاظ تُنقل إلى مستندات أرشيف شهرية مضغوطة لكل عائلة/تبرع
+# وتبقى قابلة للقراءة من نفس الـ endpoints (0 = بدون أرشفة)
+HISTORY_HOT_RETENTION_DAYS = int(os.environ.get('HISTORY_HOT_RETENTION_DAYS', 365))
+HISTORY_ARCHIVE_INTERVAL_HOURS = float(os.environ.get('HISTORY_ARCHIVE_INTERVAL_HOURS', 24))
+HISTORY_ARCHIVE_BATCH_SIZE = 5000
+HISTORY_ARCHIVE_BUCKET_SIZE = 1000
+
+# المجموعة -> الحقل الذي تُجمع عليه السجلات
+HISTORY_SOURCES = {
+    "family_needs_audit_log": "family_id",
+    "donation_history": "donation_id",
+}
+
+def as_utc(value):
+    """التواريخ من MongoDB تعود بدون منطقة زمنية (UTC)"""
+    if isinstance(value, datetime) and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+def _archive_buckets(source: str, entries: List[dict]) -> List[dict]:
+    """تجميع السجلات (مرتبة حسب المفتاح ثم الوقت) في مستندات أرشيف لكل (مفتاح، شهر)"""
+    key_field = HISTORY_SOURCES[source]
+    groups = {}
+    for entry in entries:
+        timestamp = entry["timestamp"]
+        groups.setdefault((entry.get(key_field), timestamp.strftime("%Y-%m")), []).append(entry)
+    buckets = []
+    for (key, month), group in groups.items():
+        for start in range(0, len(group), HISTORY_ARCHIVE_BUCKET_SIZE):
+            chunk = group[start:start + HISTORY_ARCHIVE_BUCKET_SIZE]
+            # عدد السجلات لكل (نوع الحركة، المستخدم) - للعد بدون فك الضغط
+            facets = {}
+            for entry in chunk:
+                facet = (entry.get("action_type"), entry.get("user_id"))
+                facets[facet] = facets.get(facet, 0) + 1
+            buckets.append({
+                "id": str(uuid.uuid4()),
+                "source": source,
+                "key": key,
+                "month": month,
+                "count": len(chunk),
+                "facets": [
+                    {"action_type": action_type, "user_id": user_id, "count": count}
+                    for (action_type, user_id), count in facets.items()
+                ],
+                "min_timestamp": chunk[0]["timestamp"],
+                "max_timestamp": chunk[-1]["timestamp"],
+                "archived_at": datetime.now(timezone.utc),
+                # BSON يحافظ على أنواع الحقول (التواريخ) و zlib يضغطها
+                "data": bson.Binary(zlib.compress(bson.encode({"entries": chunk}))),
+            })
+    return buckets
+
+async def archive_history_source(source: str, cutoff: datetime) -> int:
+    """نقل سجلات مجموعة أقدم من cutoff إلى الأرشيف (الإضافة للأرشيف قبل الحذف - لا فقدان عند التوقف)"""
+    key_field = HISTORY_SOURCES[source]
+    archived = 0
+    while True:
+        entries = await db[source].find(
+            {"timestamp": {"$lt": cutoff}}, {"_id": 0}
+        ).sort([(key_field, 1), ("timestamp", 1)]).limit(HISTORY_ARCHIVE_BATCH_SIZE).to_list(HISTORY_ARCHIVE_BATCH_SIZE)
+        entries = [entry for entry in entries if isinstance(entry.get("timestamp"), datetime)]
+        if not entries:
+            return archived
+        await db.history_archive.insert_many(_archive_buckets(source, entries))
+        await db[source].delete_many({"id": {"$in": [entry["id"] for entry in entries]}})
+        archived += len(entries)
+
+async def run_history_archive():
+    if HISTORY_HOT_RETENTION_DAYS <= 0:
+        return
+    await audit_sink.flush()
+    cutoff = datetime.now(timezone.utc) - timedelta(days=HISTORY_HOT_RETENTION_DAYS)
+    for source in HISTORY_SOURCES:
+        archived = await archive_history_source(source, cutoff)
+        if archived:
+            logger.info(f"تمت أرشفة {archived} سجل من {source}")
+
+async def run_periodic_history_archive():
+    await asyncio.sleep(RECONCILIATION_START_DELAY_SECONDS)
+    while True:
+        try:
+            await run_history_archive()
+        except Exception as e:
+            logger.error(f"خطأ في أرشفة السجلات القديمة: {e}")
+        await asyncio.sleep(HISTORY_ARCHIVE_INTERVAL_HOURS * 3600)
+
+async def load_archived_history(source: str, key: str) -> List[dict]:
+    """كل السجلات المؤرشفة لعائلة/تبرع مرتبة من الأحدث للأقدم"""
+    entries = {}
+    async for bucket in db.history_archive.find({"source": source, "key": key}, {"_id": 0, "data": 1}):
+        for entry in bson.decode(zlib.decompress(bucket["data"]))["entries"]:
+            entries[entry["id"]] = entry
+    return sorted(entries.values(), key=lambda entry: (entry["timestamp"], entry["id"]), reverse=True)
+
+class NewestFirst:
+    """عنصر heap بترتيب معكوس (الأحدث أولاً)"""
+    __slots__ = ("key", "item")
+
+    def __init__(self, key, item):
+        self.key = key
+        self.item = item
+
+    def __lt__(self, other):
+        return self.key > other.key
+
+async def iter_archived_history(source: str, keys: List[str], not_after: Optional[datetime] = None):
+    """السجلات المؤرشفة من الأحدث للأقدم - تُفك الحزم الشهرية واحدة تلو الأخرى حسب الحاجة
+    
+    not_after: تجاهل الحزم التي كل سجلاتها أحدث من هذا الوقت
+    """
+    query = {"source": source, "key": {"$in": keys}}
+    if not_after:
+        query["min_timestamp"] = {"$lte": not_after}
+    pending = []
+    buckets = db.history_archive.find(query, {"_id": 0, "data": 1, "max_timestamp": 1}).sort("max_timestamp", -1)
+    async for bucket in buckets:
+        # كل السجلات التي لم تُقرأ بعد أقدم من أو تساوي max_timestamp لهذه الحزمة
+        bucket_max = as_utc(bucket["max_timestamp"])
+        while pending and pending[0].key[0] > bucket_max:
+            yield heapq.heappop(pending).item
+        for entry in bson.decode(zlib.decompress(bucket["data"]))["entries"]:
+            heapq.heappush(pending, NewestFirst((as_utc(entry["timestamp"]), entry["id"]), entry))
+    while pending:
+        yield heapq.heappop(pending).item
+
+async def count_archived_audit(family_id: str, action_type, user_id, search_tokens, search_mode) -> int:
+    """عدد السجلات المؤرشفة المطابقة - من العدادات المخزنة مع كل حزمة (فك الضغط فقط عند البحث النصي)"""
+    total = 0
+    query = {"source": "family_needs_audit_log", "key": family_id}
+    async for bucket in db.history_archive.find(query, {"_id": 0, "id": 1, "count": 1, "facets": 1}):
+        if not (action_type or user_id or search_tokens):
+            total += bucket["count"]
+        elif not search_tokens and "facets" in bucket:
+            total += sum(
+                facet["count"] for facet in bucket["facets"]
+                if (not action_type or facet["action_type"] == action_type)
+                and (not user_id or facet["user_id"] == user_id)
+            )
+        else:
+            data = await db.history_archive.find_one({"id": bucket["id"]}, {"_id": 0, "data": 1})
+            total += sum(
+                1 for entry in bson.decode(zlib.decompress(data["data"]))["entries"]
+                if match_archived_audit_entry(entry, action_type, user_id, search_tokens, search_mode)
+            )
+    return total
+
+async def has_archived_history(source: str, key: str) -> bool:
+    return await db.history_archive.find_one({"source": source, "key": key}, {"_id": 1}) is not None
+
+@api_router.get("/admin/metrics")
+async def get_runtime_metrics(admin: User = Depends(get_admin_user)):
+    """مؤشرات التشغيل الداخلية (الطوابير والذاكرة المؤقتة) - للأدمن فقط"""
+    return {
+        "password_hashing": password_hash_metrics(),
+        "user_cache": user_cache.stats(),
+        "token_cache": token_cache.stats(),
+        "public_stats_cache": public_stats_cache.stats(),
+        "reference_cache": reference_cache.stats(),
+        "audit_sink": audit_sink.stats(),
+        "family_summary_queue": family_summary_queue.stats()
+    }
+
+@api_router.get("/health/ready")
+async def get_readiness():
+    """حالة جاهزية الخادم وتقدم مطابقة المبالغ في الخلفية - بدون authentication"""
+    job = await db.maintenance_jobs.find_one({"id": RECONCILIATION_JOB_ID}, {"_id": 0}) or {}
+    migrations_job = await db.maintenance_jobs.find_one({"id": SCHEMA_MIGRATIONS_JOB_ID}, {"_id": 0}) or {}
+    total = job.get("total") or 0
+    processed = job.get("processed") or 0
+    return {
+        "ready": app_state["started"],
+        "family_summary_queue": family_summary_queue.stats(),
+        "migrations": {
+            "status": migrations_job.get("status", "not_started"),
+            "pending": migrations_job.get("pending", []),
+            "current_version": migrations_job.get("current_version"),
+            "started_at": migrations_job.get("started_at"),
+            "finished_at": migrations_job.get("finished_at"),
+            "error": migrations_job.get("error")
+        },
+        "reconciliation": {
+            "status": job.get("status", "not_started"),
+            "processed": processed,
+            "total": total,
+            "progress": round(processed / total * 100, 1) if total else 100.0,
+            "started_at": job.get("started_at"),
+            "finished_at": job.get("finished_at"),
+            "error": job.get("error")
+        }
+    }
+
 @api_router.get("/stats")
 async def get_stats():
     families_count = await db.families.count_documents({})
@@ -2929,6 +5153,380 @@ async def get_stats():
         "total_donated": total_amount
     }
 
+# ============= Admin Bootstrap (بيانات لوحة التحكم بطلب واحد) =============
+
+BOOTSTRAP_MAX_ROWS = 10000
+
+# القسم -> (المجموعة، الحقول) - حقول مختصرة تكفي للقوائم والقوائم المنسدلة
+# التفاصيل الكاملة تُجلب من الـ endpoint الخاص بكل عنصر عند فتحه
+BOOTSTRAP_SECTIONS = {
+    "families": ("families", ["family_number", "name", "fac_name", "neighborhood_id", "category_id", "income_level_id",
+                              "need_assessment_id", "members_count", "total_needs_amount", "total_donations_amount", "is_active"]),
+    "donations": ("donations", ["family_id", "neighborhood_id", "donor_name", "donation_type", "amount", "status",
+                                "donation_date", "created_at", "is_active"]),
+    "users": ("users", ["full_name", "email", "role", "neighborhood_id", "is_active"]),
+    "family_needs": ("family_needs", ["family_id", "need_id", "estimated_amount", "duration_type", "month", "status", "is_active"]),
+    "neighborhoods": ("neighborhoods", ["name", "number", "is_active", "families_count"]),
+    "positions": ("positions", ["title", "is_active"]),
+    "jobs": ("jobs", ["title", "is_active"]),
+    "education_levels": ("education_levels", ["title", "is_active"]),
+    "user_roles": ("user_roles", ["name", "display_name", "is_active"]),
+    "family_categories": ("family_categories", ["name", "color", "is_active"]),
+    "income_levels": ("income_levels", ["name", "min_amount", "max_amount", "is_active"]),
+    "need_assessments": ("need_assessments", ["name", "color", "priority", "is_active"]),
+    "needs": ("needs", ["name", "default_amount", "is_active"]),
+    "committee_members": ("committee_members", ["first_name", "father_name", "last_name", "neighborhood_id", "position_id", "is_active"]),
+    "health_cases": ("health_cases", ["patient_name", "required_amount", "collected_amount"]),
+    "courses": ("courses", ["title", "category", "date"]),
+    "projects": ("projects", ["title", "status", "required_funding", "collected_funding"]),
+    "initiatives": ("initiatives", ["title", "status", "date"]),
+    "stories": ("stories", ["title"]),
+}
+
+# المحتوى الثابت (مستند واحد لكل مجموعة)
+BOOTSTRAP_SINGLETONS = {
+    "hero_content": "hero_content",
+    "mission_content": "mission_content",
+}
+
+# حقول تتغير بـ $inc بدون updated_at (المجاميع) - تدخل في بصمة القسم
+BOOTSTRAP_STAMP_SUMS = {
+    "families": ["total_needs_amount", "total_donations_amount", "members_count"],
+    "health_cases": ["collected_amount"],
+    "projects": ["collected_funding"],
+}
+
+def section_version(data) -> str:
+    """بصمة محتوى القسم - تتغير فقط عند تغير البيانات"""
+    payload = json.dumps(data, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+def parse_section_versions(versions: Optional[str]) -> dict:
+    """versions بصيغة families:abc123,users:def456"""
+    parsed = {}
+    for item in (versions or "").split(","):
+        name, _, version = item.partition(":")
+        if name.strip() and version.strip():
+            parsed[name.strip()] = version.strip()
+    return parsed
+
+async def bootstrap_section_stamp(name: str) -> str:
+    """إصدار قسم كبير بدون تحميل صفوفه: العدد + آخر created_at/updated_at + مجاميع الحقول المتراكمة"""
+    collection, _ = BOOTSTRAP_SECTIONS[name]
+    group = {
+        "_id": None,
+        "count": {"$sum": 1},
+        "created": {"$max": "$created_at"},
+        "updated": {"$max": "$updated_at"},
+        **{f"sum_{field}": {"$sum": f"${field}"} for field in BOOTSTRAP_STAMP_SUMS.get(name, [])},
+    }
+    rows = await db[collection].aggregate([{"$group": group}]).to_list(1)
+    return section_version(rows[0] if rows else {})
+
+async def load_bootstrap_section(name: str, known_version: Optional[str] = None) -> dict:
+    """يعيد {"version", "data"} أو {"version", "unchanged": True} إذا طابق إصدار العميل
+    
+    الأقسام الكبيرة تُقارن ببصمة رخيصة قبل تحميل الصفوف، وتعود مع truncated إذا تجاوزت BOOTSTRAP_MAX_ROWS
+    """
+    if name in BOOTSTRAP_SINGLETONS:
+        collection = BOOTSTRAP_SINGLETONS[name]
+        data = await db[collection].find_one({"id": collection}, {"_id": 0})
+        version = section_version(data)
+    elif name == "counts":
+        names = ["families", "donations", "users", "family_needs", "health_cases", "projects"]
+        counts = await asyncio.gather(*(db[collection].count_documents({}) for collection in names))
+        data = dict(zip(names, counts))
+        version = section_version(data)
+    elif BOOTSTRAP_SECTIONS[name][0] in REFERENCE_COLLECTIONS:
+        collection, fields = BOOTSTRAP_SECTIONS[name]
+        docs = await reference_cache.get(collection)
+        data = [{key: item[key] for key in ("id", *fields) if key in item} for item in docs]
+        # بصمة المحتوى محسوبة مسبقاً في الكاش
+        etag = reference_cache.etag([collection])
+        version = etag.strip('"') if etag else section_version(data)
+    else:
+        version = await bootstrap_section_stamp(name)
+        if known_version == version:
+            return {"version": version, "unchanged": True}
+        collection, fields = BOOTSTRAP_SECTIONS[name]
+        projection = {"_id": 0, "id": 1, **{field: 1 for field in fields}}
+        data = await db[collection].find({}, projection).to_list(BOOTSTRAP_MAX_ROWS + 1)
+        if len(data) > BOOTSTRAP_MAX_ROWS:
+            return {"version": version, "data": data[:BOOTSTRAP_MAX_ROWS], "truncated": True}
+    
+    if known_version == version:
+        return {"version": version, "unchanged": True}
+    return {"version": version, "data": data}
+
+@api_router.get("/admin/bootstrap")
+async def get_admin_bootstrap(
+    sections: Optional[str] = None,
+    versions: Optional[str] = None,
+    admin: User = Depends(get_admin_user)
+):
+    """كل بيانات لوحة التحكم بطلب واحد (الاستعلامات تعمل بالتوازي)
+    
+    - sections: أسماء الأقسام المطلوبة مفصولة بفاصلة (الافتراضي الكل)
+    - versions: الإصدارات المحفوظة لدى العميل (name:version,...) - القسم غير المتغير يعود بدون data
+    - truncated: القسم تجاوز BOOTSTRAP_MAX_ROWS صفاً - يجب تحميله من نقطة النهاية المقسمة إلى صفحات
+    """
+    available = ["counts", *BOOTSTRAP_SECTIONS, *BOOTSTRAP_SINGLETONS]
+    names = [name.strip() for name in sections.split(",") if name.strip()] if sections else available
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"أقسام غير معروفة: {', '.join(unknown)}")
+    known_versions = parse_section_versions(versions)
+    
+    results = await asyncio.gather(*(load_bootstrap_section(name, known_versions.get(name)) for name in names))
+    return {"sections": dict(zip(names, results))}
+
+@api_router.get("/reference-data")
+async def get_reference_data(
+    request: Request,
+    response: Response,
+    collections: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """كل البيانات المرجعية (الأحياء، الاختصاصات، المهن، ...) بطلب واحد مع ETag
+    
+    - collections: أسماء المجموعات مفصولة بفاصلة (الافتراضي الكل)
+    - If-None-Match: إذا لم تتغير البيانات يعود 304 بدون الوصول لقاعدة البيانات
+    """
+    names = [name.strip() for name in collections.split(",") if name.strip()] if collections else list(REFERENCE_COLLECTIONS)
+    unknown = [name for name in names if name not in REFERENCE_COLLECTIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"مجموعات غير معروفة: {', '.join(unknown)}")
+    if current_user.role != "admin" and "user_roles" in names:
+        names.remove("user_roles")  # أدوار المستخدمين للأدمن فقط
+    
+    headers = {"Cache-Control": "private, no-cache"}
+    etag = reference_cache.etag(names)
+    if etag is None:
+        data = await asyncio.gather(*(reference_cache.get(name) for name in names))
+        etag = reference_cache.etag(names)
+    else:
+        data = None
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={**headers, "ETag": etag})
+    if data is None:
+        data = await asyncio.gather(*(reference_cache.get(name) for name in names))
+    
+    response.headers.update(headers)
+    if etag:
+        response.headers["ETag"] = etag
+    return {
+        "versions": {name: reference_cache.versions[name] for name in names},
+        "collections": dict(zip(names, data))
+    }
+
+# ============= Data Export (CSV / Excel) =============
+
+EXPORT_FLUSH_ROWS = 500
+EXPORT_BATCH_SIZE = 1000
+
+# أعمدة كل تصدير: (العنوان، مسار الحقل، المجموعة المرجعية لتحويل المعرف إلى اسم)
+# عناوين أعمدة العائلات مطابقة لأعمدة الاستيراد (FAMILY_IMPORT_COLUMNS) ليمكن إعادة استيراد الملف
+FAMILY_EXPORT_COLUMNS = [
+    ("رقم العائلة", "family_number", None),
+    ("رمز العائلة", "family_code", None),
+    ("اسم الفاك", "fac_name", None),
+    ("الاسم", "name", None),
+    ("الهاتف", "phone", None),
+    ("الاسم الأول للمعيل", "provider_first_name", None),
+    ("اسم الأب للمعيل", "provider_father_name", None),
+    ("الكنية للمعيل", "provider_surname", None),
+    ("عدد الأفراد", "members_count", None),
+    ("الوصف", "description", None),
+    ("الاحتياج الشهري", "monthly_need", None),
+    ("الحي", "neighborhood_id", "neighborhoods"),
+    ("التصنيف", "category_id", "family_categories"),
+    ("مستوى الدخل", "income_level_id", "income_levels"),
+    ("تقييم الاحتياج", "need_assessment_id", "need_assessments"),
+    ("الأب موجود", "father_present", None),
+    ("الأم موجودة", "mother_present", None),
+    ("عدد الأطفال الإناث", "female_children_count", None),
+    ("عدد الأطفال الذكور", "male_children_count", None),
+    ("إجمالي الاحتياجات", "total_needs_amount", None),
+    ("إجمالي التبرعات", "total_donations_amount", None),
+    ("نشطة", "is_active", None),
+    ("تاريخ الإضافة", "created_at", None),
+]
+
+FAMILY_NEED_EXPORT_COLUMNS = [
+    ("رقم العائلة", "_family.family_number", None),
+    ("اسم العائلة", "_family.name", None),
+    ("الحي", "_family.neighborhood_id", "neighborhoods"),
+    ("الاحتياج", "need_id", "needs"),
+    ("المبلغ", "amount", None),
+    ("المبلغ التقديري", "estimated_amount", None),
+    ("نوع المدة", "duration_type", None),
+    ("الشهر", "month", None),
+    ("الحالة", "status", None),
+    ("نشط", "is_active", None),
+    ("ملاحظات", "notes", None),
+    ("تاريخ الإضافة", "created_at", None),
+]
+
+DONATION_EXPORT_COLUMNS = [
+    ("رقم العائلة", "_family.family_number", None),
+    ("اسم العائلة", "_family.name", None),
+    ("الحي", "neighborhood_id", "neighborhoods"),
+    ("المتبرع", "donor_name", None),
+    ("هاتف المتبرع", "donor_phone", None),
+    ("نوع التبرع", "donation_type", None),
+    ("المبلغ", "amount", None),
+    ("الوصف", "description", None),
+    ("الحالة", "status", None),
+    ("نوع النقل", "transfer_type", None),
+    ("تاريخ التبرع", "donation_date", None),
+    ("نشط", "is_active", None),
+    ("تاريخ الإضافة", "created_at", None),
+]
+
+def _family_lookup_stages(local_field: str) -> List[dict]:
+    return _lookup_by_id("families", f"${local_field}", "_family", ["family_number", "name", "neighborhood_id"])
+
+async def build_export_cursor(dataset: str, neighborhood_id: Optional[str], date_filter: dict):
+    """مؤشر Mongo للبيانات المطلوب تصديرها (بدون تحميلها في الذاكرة)"""
+    if dataset == "families":
+        query = dict(date_filter)
+        if neighborhood_id:
+            query["neighborhood_id"] = neighborhood_id
+        return db.families.find(query, {"_id": 0}).sort("family_number", 1).batch_size(EXPORT_BATCH_SIZE), FAMILY_EXPORT_COLUMNS
+    if dataset == "family-needs":
+        query = dict(date_filter)
+        if neighborhood_id:
+            # تصفية الاحتياجات بعائلات الحي قبل $lookup (بدل ربط المجموعة كاملة ثم التصفية)
+            query["family_id"] = {"$in": await db.families.distinct("id", {"neighborhood_id": neighborhood_id})}
+        pipeline = [{"$match": query}, {"$sort": {"created_at": 1}}, *_family_lookup_stages("family_id")]
+        return db.family_needs.aggregate(pipeline, batchSize=EXPORT_BATCH_SIZE), FAMILY_NEED_EXPORT_COLUMNS
+    query = dict(date_filter)
+    if neighborhood_id:
+        query["neighborhood_id"] = neighborhood_id
+    pipeline = [{"$match": query}, {"$sort": {"created_at": 1}}, *_family_lookup_stages("family_id")]
+    return db.donations.aggregate(pipeline, batchSize=EXPORT_BATCH_SIZE), DONATION_EXPORT_COLUMNS
+
+# بداية نص يفسره Excel/LibreOffice كمعادلة (CSV/formula injection)
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+# أرقام الهواتف والمبالغ بإشارة (+963 933 ...، -500) ليست معادلات وتبقى كما هي
+SIGNED_NUMBER_PATTERN = re.compile(r'^[+-][\d\s.,]*\d[\d\s.,]*$')
+
+def escape_formula(value):
+    """النصوص التي تبدأ بحرف معادلة تُسبق بـ ' لتُعرض كنص ولا تُنفذ"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES) and not SIGNED_NUMBER_PATTERN.match(value):
+        return "'" + value
+    return value
+
+def unescape_formula(value):
+    """عكس escape_formula عند إعادة استيراد ملف مُصدّر"""
+    if isinstance(value, str) and value.startswith("'") and value[1:].startswith(FORMULA_PREFIXES):
+        return value[1:]
+    return value
+
+def export_cell(doc: dict, path: str, reference: Optional[str], reference_names: dict):
+    value = doc
+    for key in path.split("."):
+        value = value.get(key) if isinstance(value, dict) else None
+    if reference and value:
+        return escape_formula(reference_names[reference].get(value, value))
+    if isinstance(value, bool):
+        return "نعم" if value else "لا"
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        return escape_formula(json.dumps(value, ensure_ascii=False, default=str))
+    return "" if value is None else escape_formula(value)
+
+async def load_reference_names(columns) -> dict:
+    """أسماء المجموعات المرجعية الصغيرة (المعرف -> الاسم) المستخدمة في أعمدة التصدير"""
+    reference_names = {}
+    for collection in {reference for _, _, reference in columns if reference}:
+        if collection in REFERENCE_COLLECTIONS:
+            items = await reference_cache.get(collection)
+        else:
+            items = await db[collection].find({}, {"_id": 0, "id": 1, "name": 1}).to_list(None)
+        reference_names[collection] = {item["id"]: item.get("name") for item in items}
+    return reference_names
+
+async def export_rows(cursor, columns, reference_names):
+    async for doc in cursor:
+        yield [export_cell(doc, path, reference, reference_names) for _, path, reference in columns]
+
+async def stream_csv(columns, rows):
+    """CSV على دفعات (مع BOM ليفتح Excel النص العربي بشكل صحيح)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")
+    writer.writerow([header for header, _, _ in columns])
+    count = 0
+    async for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count % EXPORT_FLUSH_ROWS == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate(0)
+    yield buffer.getvalue().encode("utf-8")
+
+async def write_xlsx(title: str, columns, rows) -> str:
+    """كتابة ملف Excel بوضع write_only (الصفوف تُكتب مباشرة ولا تبقى في الذاكرة) وإرجاع مساره"""
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet(title)
+    sheet.append([header for header, _, _ in columns])
+    async for row in rows:
+        sheet.append(row)
+    handle, path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(handle)
+    try:
+        await asyncio.to_thread(workbook.save, path)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+@api_router.get("/export/{dataset}")
+async def export_data(
+    dataset: str,
+    format: str = "csv",
+    neighborhood_id: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    current_user: User = Depends(get_admin_or_committee_user)
+):
+    """
+    تصدير البيانات كملف CSV أو Excel
+    - dataset: families أو family-needs أو donations
+    - format: csv أو xlsx
+    - neighborhood_id: فلترة حسب الحي (موظفو اللجنة: حيّهم فقط)
+    - date_from, date_to: نطاق تاريخ الإضافة (YYYY-MM-DD)
+    """
+    if dataset not in ("families", "family-needs", "donations"):
+        raise HTTPException(status_code=404, detail="نوع التصدير غير موجود")
+    if format not in ("csv", "xlsx"):
+        raise HTTPException(status_code=400, detail="صيغة التصدير غير مدعومة (csv أو xlsx)")
+    
+    if current_user.role in ["committee_member", "committee_president"]:
+        neighborhood_id = filter_by_neighborhood(current_user)["neighborhood_id"]
+    
+    cursor, columns = await build_export_cursor(dataset, neighborhood_id, date_range_filter("created_at", date_from, date_to))
+    rows = export_rows(cursor, columns, await load_reference_names(columns))
+    filename = f"{dataset}-{datetime.now(timezone.utc).strftime('%Y%m%d')}.{format}"
+    
+    if format == "csv":
+        return StreamingResponse(
+            stream_csv(columns, rows),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
+    
+    path = await write_xlsx(dataset, columns, rows)
+    return FileResponse(
+        path,
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        filename=filename,
+        background=BackgroundTask(os.remove, path)
+    )
+
 # ============= Mission Content Routes =============
 
 @api_router.get("/mission-content")
@@ -2957,6 +5555,7 @@ async def get_mission_content():
 async def update_mission_content(content_input: MissionContentUpdate, admin: User = Depends(get_admin_user)):
     update_data = content_input.model_dump(exclude_none=True)
     update_data['updated_at'] = datetime.now(timezone.utc).isoformat()
+    await normalize_image_fields("mission_content", update_data)
     
     await db.mission_content.update_one(
         {"id": "mission_content"},
@@ -3016,6 +5615,7 @@ async def get_hero_content():
 async def update_hero_content(content_input: HeroContentUpdate, admin: User = Depends(get_admin_user)):
     update_data = content_input.model_dump(exclude_none=True)
     update_data['updated_at'] = datetime.now(timezone.utc).isoformat()
+    await normalize_image_fields("hero_content", update_data)
     
     await db.hero_content.update_one(
         {"id": "hero_content"},
@@ -3032,14 +5632,23 @@ async def update_hero_content(content_input: HeroContentUpdate, admin: User = De
 # Image upload
 @api_router.post("/upload-image")
 async def upload_image(file: UploadFile = File(...), admin: User = Depends(get_admin_user)):
-    contents = await file.read()
-    base64_encoded = base64.b64encode(contents).decode('utf-8')
-    image_data = f"data:{file.content_type};base64,{base64_encoded}"
-    return {"image_url": image_data}
+    image_url = await store_upload(file)
+    schedule_image_renditions(image_url)
+    return {"image_url": image_url}
 
 # ============= Neighborhoods Routes =============
+def neighborhood_created_key(item: dict):
+    """مفتاح ترتيب حسب تاريخ الإنشاء (نص ISO أو datetime) - الأحياء بدون تاريخ في النهاية"""
+    try:
+        created_at = timeline_time(item.get("created_at"))
+    except (TypeError, ValueError):
+        created_at = None
+    if not isinstance(created_at, datetime):
+        return (False, datetime.min.replace(tzinfo=timezone.utc))
+    return (True, created_at)
+
 @api_router.get("/neighborhoods")
-async def get_neighborhoods(page: int = 1, limit: int = 20):
+async def get_neighborhoods(page: int = Query(1, ge=1), limit: int = Query(20, ge=1)):
     """
     Get neighborhoods with pagination
     - page: Page number (default: 1)
@@ -3047,14 +5656,14 @@ async def get_neighborhoods(page: int = 1, limit: int = 20):
     """
     skip = (page - 1) * limit
     
-    # Get total count
-    total = await db.neighborhoods.count_documents({})
-    
-    # Get paginated neighborhoods
-    neighborhoods = await db.neighborhoods.find(
-        {}, 
-        {"_id": 0}
-    ).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
+    # الأحياء من الذاكرة المؤقتة مرتبة من الأحدث
+    all_neighborhoods = sorted(
+        await reference_cache.get("neighborhoods"),
+        key=neighborhood_created_key,
+        reverse=True
+    )
+    total = len(all_neighborhoods)
+    neighborhoods = all_neighborhoods[skip:skip + limit]
     
     return {
         "items": neighborhoods,
@@ -3076,10 +5685,11 @@ async def create_neighborhood(neighborhood: NeighborhoodCreate, current_user: Us
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    neighborhood_obj = Neighborhood(**neighborhood.model_dump())
+    neighborhood_obj = Neighborhood(**await normalize_image_fields("neighborhoods", neighborhood.model_dump()))
     doc = neighborhood_obj.model_dump()
     doc['created_at'] = doc['created_at'].isoformat()
     await db.neighborhoods.insert_one(doc)
+    reference_cache.bump("neighborhoods")
     return neighborhood_obj
 
 @api_router.put("/neighborhoods/{neighborhood_id}", response_model=Neighborhood)
@@ -3097,10 +5707,12 @@ async def update_neighborhood(
     
     # Add updated_at timestamp
     update_data['updated_at'] = datetime.now(timezone.utc).isoformat()
+    await normalize_image_fields("neighborhoods", update_data)
     
     result = await db.neighborhoods.update_one({"id": neighborhood_id}, {"$set": update_data})
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Neighborhood not found")
+    reference_cache.bump("neighborhoods")
     
     updated = await db.neighborhoods.find_one({"id": neighborhood_id}, {"_id": 0})
     return updated
@@ -3113,12 +5725,13 @@ async def delete_neighborhood(neighborhood_id: str, current_user: User = Depends
     result = await db.neighborhoods.delete_one({"id": neighborhood_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Neighborhood not found")
+    reference_cache.bump("neighborhoods")
     return {"message": "Neighborhood deleted successfully"}
 
 # ============= Positions Routes =============
 @api_router.get("/positions", response_model=List[Position])
 async def get_positions():
-    positions = await db.positions.find({}, {"_id": 0}).to_list(1000)
+    positions = await reference_cache.get("positions")
     return positions
 
 @api_router.post("/positions", response_model=Position)
@@ -3130,6 +5743,7 @@ async def create_position(position: PositionCreate, current_user: User = Depends
     doc = position_obj.model_dump()
     doc['created_at'] = doc['created_at'].isoformat()
     await db.positions.insert_one(doc)
+    reference_cache.bump("positions")
     return position_obj
 
 @api_router.put("/positions/{position_id}", response_model=Position)
@@ -3148,6 +5762,7 @@ async def update_position(
     result = await db.positions.update_one({"id": position_id}, {"$set": update_data})
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Position not found")
+    reference_cache.bump("positions")
     
     updated = await db.positions.find_one({"id": position_id}, {"_id": 0})
     return updated
@@ -3160,12 +5775,13 @@ async def delete_position(position_id: str, current_user: User = Depends(get_cur
     result = await db.positions.delete_one({"id": position_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Position not found")
+    reference_cache.bump("positions")
     return {"message": "Position deleted successfully"}
 
 # ============= Jobs/Occupations Routes =============
 @api_router.get("/jobs", response_model=List[Job])
 async def get_jobs():
-    jobs = await db.jobs.find({}, {"_id": 0}).to_list(1000)
+    jobs = await reference_cache.get("jobs")
     return jobs
 
 @api_router.post("/jobs", response_model=Job)
@@ -3177,6 +5793,7 @@ async def create_job(job: JobCreate, current_user: User = Depends(get_current_us
     doc = job_obj.model_dump()
     doc['created_at'] = doc['created_at'].isoformat()
     await db.jobs.insert_one(doc)
+    reference_cache.bump("jobs")
     return job_obj
 
 @api_router.put("/jobs/{job_id}", response_model=Job)
@@ -3195,6 +5812,7 @@ async def update_job(
     result = await db.jobs.update_one({"id": job_id}, {"$set": update_data})
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Job not found")
+    reference_cache.bump("jobs")
     
     updated = await db.jobs.find_one({"id": job_id}, {"_id": 0})
     return updated
@@ -3207,12 +5825,13 @@ async def delete_job(job_id: str, current_user: User = Depends(get_current_user)
     result = await db.jobs.delete_one({"id": job_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Job not found")
+    reference_cache.bump("jobs")
     return {"message": "Job deleted successfully"}
 
 # ============= Education Levels Routes =============
 @api_router.get("/education-levels", response_model=List[EducationLevel])
 async def get_education_levels():
-    levels = await db.education_levels.find({}, {"_id": 0}).to_list(1000)
+    levels = await reference_cache.get("education_levels")
     return levels
 
 @api_router.post("/education-levels", response_model=EducationLevel)
@@ -3224,6 +5843,7 @@ async def create_education_level(level: EducationLevelCreate, current_user: User
     doc = level_obj.model_dump()
     doc['created_at'] = doc['created_at'].isoformat()
     await db.education_levels.insert_one(doc)
+    reference_cache.bump("education_levels")
     return level_obj
 
 @api_router.put("/education-levels/{level_id}", response_model=EducationLevel)
@@ -3242,6 +5862,7 @@ async def update_education_level(
     result = await db.education_levels.update_one({"id": level_id}, {"$set": update_data})
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Education level not found")
+    reference_cache.bump("education_levels")
     
     updated = await db.education_levels.find_one({"id": level_id}, {"_id": 0})
     return updated
@@ -3254,6 +5875,7 @@ async def delete_education_level(level_id: str, current_user: User = Depends(get
     result = await db.education_levels.delete_one({"id": level_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Education level not found")
+    reference_cache.bump("education_levels")
     return {"message": "Education level deleted successfully"}
 
 # ============= User Roles Routes =============
@@ -3261,7 +5883,7 @@ async def delete_education_level(level_id: str, current_user: User = Depends(get
 async def get_user_roles(current_user: User = Depends(get_current_user)):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
-    roles = await db.user_roles.find({}, {"_id": 0}).to_list(1000)
+    roles = await reference_cache.get("user_roles")
     return roles
 
 @api_router.post("/user-roles", response_model=UserRole)
@@ -3271,6 +5893,7 @@ async def create_user_role(role_data: UserRoleCreate, current_user: User = Depen
     
     role = UserRole(**role_data.model_dump())
     await db.user_roles.insert_one(role.model_dump())
+    reference_cache.bump("user_roles")
     return role
 
 @api_router.put("/user-roles/{role_id}", response_model=UserRole)
@@ -3289,6 +5912,7 @@ async def update_user_role(
     result = await db.user_roles.update_one({"id": role_id}, {"$set": update_dict})
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="User role not found")
+    reference_cache.bump("user_roles")
     
     updated_role = await db.user_roles.find_one({"id": role_id}, {"_id": 0})
     return UserRole(**updated_role)
@@ -3312,6 +5936,7 @@ async def toggle_user_role_status(
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="User role not found")
+    reference_cache.bump("user_roles")
     
     return {"message": f"User role {'activated' if is_active else 'deactivated'} successfully"}
 
@@ -3340,7 +5965,7 @@ async def create_committee_member(member: CommitteeMemberCreate, current_user: U
         if member.neighborhood_id != current_user.neighborhood_id:
             raise HTTPException(status_code=403, detail="يمكنك إدارة موظفي حيك فقط")
     
-    member_obj = CommitteeMember(**member.model_dump())
+    member_obj = CommitteeMember(**await normalize_image_fields("committee_members", member.model_dump()))
     doc = member_obj.model_dump()
     doc['created_at'] = doc['created_at'].isoformat()
     await db.committee_members.insert_one(doc)
@@ -3370,6 +5995,7 @@ async def update_committee_member(
     
     # Add updated_at timestamp
     update_data['updated_at'] = datetime.now(timezone.utc).isoformat()
+    await normalize_image_fields("committee_members", update_data)
     
     result = await db.committee_members.update_one({"id": member_id}, {"$set": update_data})
     if result.matched_count == 0:
@@ -3397,6 +6023,7 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "X-Total-Count-Limited", "ETag"],
 )
 
 
@@ -3464,7 +6091,7 @@ async def create_healthcare_provider(
         raise HTTPException(status_code=400, detail="نوع مقدم الخدمة غير صحيح")
     
     new_provider = HealthcareProvider(
-        **provider.model_dump(),
+        **await normalize_image_fields("healthcare_providers", provider.model_dump()),
         created_by_user_id=current_user.id,
         created_at=datetime.now(timezone.utc)
     )
@@ -3503,6 +6130,7 @@ async def update_healthcare_provider(
     if update_data:
         update_data['updated_at'] = datetime.now(timezone.utc).isoformat()
         update_data['updated_by_user_id'] = current_user.id
+        await normalize_image_fields("healthcare_providers", update_data)
         
         await db.healthcare_providers.update_one(
             {"id": provider_id},
@@ -3588,26 +6216,365 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# ============= Database Indexes & Migrations =============
+
+MIGRATION_BATCH_SIZE = 500
+
+async def bulk_update_in_batches(collection, query: dict, projection: dict, build_update):
+    """
+    ترحيل بيانات على دفعات باستخدام bulk_write
+    - build_update(doc) يعيد مستند $set أو None لتجاهل السجل
+    """
+    operations = []
+    updated = 0
+    async for doc in collection.find(query, projection).batch_size(MIGRATION_BATCH_SIZE):
+        update = build_update(doc)
+        if update:
+            operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": update}))
+        if len(operations) >= MIGRATION_BATCH_SIZE:
+            await collection.bulk_write(operations, ordered=False)
+            updated += len(operations)
+            operations = []
+    if operations:
+        await collection.bulk_write(operations, ordered=False)
+        updated += len(operations)
+    return updated
+
+async def backfill_parsed_amounts():
+    for collection in (db.family_needs, db.donations):
+        updated = await bulk_update_in_batches(
+            collection,
+            {"parsed_amount": {"$exists": False}},
+            {"_id": 1, "amount": 1},
+            lambda doc: {"parsed_amount": parse_amount(doc.get("amount"))}
+        )
+        logger.info(f"تم حفظ parsed_amount لـ {updated} سجل في {collection.name}")
+
+async def backfill_donation_neighborhoods():
+    """نسخ حي العائلة إلى التبرعات الحالية داخل قاعدة البيانات ($lookup + $merge)"""
+    await db.donations.aggregate([
+        {"$match": {"neighborhood_id": {"$exists": False}}},
+        {"$project": {"_id": 1, "_family_id": {"$ifNull": ["$family_id", "$target_id"]}}},
+        {"$lookup": {"from": "families", "localField": "_family_id", "foreignField": "id", "as": "_family"}},
+        {"$project": {"_id": 1, "neighborhood_id": {"$ifNull": [{"$arrayElemAt": ["$_family.neighborhood_id", 0]}, None]}}},
+        {"$merge": {"into": "donations", "on": "_id", "whenMatched": "merge", "whenNotMatched": "discard"}},
+    ]).to_list(None)
+    logger.info("تم نسخ neighborhood_id إلى التبرعات")
+
+async def extract_embedded_images():
+    """نقل الصور المضمّنة (data URLs) من المستندات إلى مخزن الملفات واستبدالها بروابط"""
+    for collection_name, fields in EMBEDDED_IMAGE_FIELDS.items():
+        collection = db[collection_name]
+        query = {"$or": [{field: {"$regex": "^data:"}} for field in fields]}
+        projection = {"_id": 1, **{field: 1 for field in fields}}
+        operations = []
+        updated = 0
+        async for doc in collection.find(query, projection).batch_size(50):
+            update = {field: await store_data_urls(doc[field]) for field in fields if doc.get(field)}
+            operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": update}))
+            if len(operations) >= 50:
+                await collection.bulk_write(operations, ordered=False)
+                updated += len(operations)
+                operations = []
+        if operations:
+            await collection.bulk_write(operations, ordered=False)
+            updated += len(operations)
+        if updated:
+            logger.info(f"تم نقل صور {updated} مستند من {collection_name} إلى مخزن الملفات")
+
+async def seed_family_number_counter():
+    """تهيئة عداد أرقام العائلات من أكبر رقم FAM-NNN موجود (رقمياً وليس نصياً)"""
+    result = await db.families.aggregate([
+        {"$match": {"family_number": {"$regex": "^FAM-[0-9]+$"}}},
+        {"$group": {"_id": None, "max_number": {"$max": {"$toInt": {"$arrayElemAt": [{"$split": ["$family_number", "-"]}, 1]}}}}},
+    ]).to_list(1)
+    max_number = result[0]["max_number"] if result else 0
+    await db.counters.update_one(
+        {"id": FAMILY_NUMBER_COUNTER_ID},
+        {"$max": {"value": max_number}},
+        upsert=True
+    )
+    logger.info(f"عداد أرقام العائلات يبدأ من {max_number}")
+
+async def make_family_need_month_unique():
+    """استبدال فهرس (family_id, need_id, month) بفهرس فريد للاحتياجات الشهرية (month محفوظ كنص)"""
+    try:
+        await db.family_needs.drop_index("family_need_month")
+    except OperationFailure:
+        pass  # الفهرس غير موجود
+    await db.family_needs.create_index(
+        [("family_id", ASCENDING), ("need_id", ASCENDING), ("month", ASCENDING)],
+        name="family_need_month_unique",
+        unique=True,
+        partialFilterExpression={"month": {"$type": "string"}}
+    )
+
+async def backfill_audit_search_fields():
+    updated = await bulk_update_in_batches(
+        db.family_needs_audit_log,
+        {"search_tokens": {"$exists": False}},
+        {"_id": 1, "need_name": 1, "user_name": 1},
+        audit_search_fields
+    )
+    logger.info(f"تم حفظ حقول البحث لـ {updated} سجل حركة")
+
+async def convert_history_timestamps():
+    """تحويل timestamp المخزن كنص ISO إلى تاريخ (date) - يتم داخل MongoDB بدون نقل المستندات"""
+    for source in HISTORY_SOURCES:
+        result = await db[source].update_many(
+            {"timestamp": {"$type": "string"}},
+            [{"$set": {"timestamp": {"$dateFromString": {"dateString": "$timestamp"}}}}]
+        )
+        if result.modified_count:
+            logger.info(f"تم تحويل {result.modified_count} تاريخ في {source}")
+
+def _id_index(collection: str):
+    """فهرس فريد على الحقل id (المعرف المستخدم في جميع الاستعلامات)"""
+    return (collection, [("id", ASCENDING)], {"unique": True, "name": "id_unique"})
+
+# سجل الترحيلات: كل ترحيل له رقم إصدار وقائمة فهارس ودالة ترحيل بيانات اختيارية
+# - indexes و ddl: تُطبق عند التشغيل قبل استقبال الطلبات (سريعة)
+# - migrate: ترحيل البيانات (backfill) يعمل في الخلفية بعد جاهزية الخادم
+# لإضافة فهرس أو ترحيل جديد: أضف عنصراً جديداً برقم إصدار أكبر ولا تعدّل العناصر القديمة
+SCHEMA_MIGRATIONS = [
+    {
+        "version": 1,
+        "description": "فهارس أساسية لجميع المجموعات",
+        "indexes": [
+            *[_id_index(name) for name in [
+                "users", "families", "family_needs", "donations",
+                "family_needs_audit_log", "donation_history",
+                "neighborhoods", "positions", "jobs", "education_levels",
+                "user_roles", "family_categories", "income_levels",
+                "need_assessments", "needs", "committee_members",
+                "healthcare_providers", "health_cases", "initiatives",
+                "courses", "projects", "stories",
+            ]],
+            ("users", [("email", ASCENDING)], {"name": "email"}),
+            ("users", [("phone", ASCENDING)], {"name": "phone"}),
+            ("families", [("neighborhood_id", ASCENDING), ("is_active", ASCENDING)], {"name": "neighborhood_active"}),
+            ("families", [("category_id", ASCENDING), ("is_active", ASCENDING)], {"name": "category_active"}),
+            ("families", [("family_number", ASCENDING)], {"name": "family_number"}),
+            ("family_needs", [("family_id", ASCENDING), ("need_id", ASCENDING), ("month", ASCENDING)], {"name": "family_need_month"}),
+            ("donations", [("family_id", ASCENDING), ("status", ASCENDING), ("is_active", ASCENDING)], {"name": "family_status_active"}),
+            ("donations", [("target_id", ASCENDING)], {"name": "target_id", "sparse": True}),
+            ("donations", [("donor_id", ASCENDING), ("created_at", DESCENDING)], {"name": "donor_created"}),
+            ("donations", [("created_at", DESCENDING)], {"name": "created_at"}),
+            ("family_needs_audit_log", [("family_id", ASCENDING), ("timestamp", DESCENDING)], {"name": "family_timestamp"}),
+            ("donation_history", [("donation_id", ASCENDING), ("timestamp", DESCENDING)], {"name": "donation_timestamp"}),
+            ("committee_members", [("neighborhood_id", ASCENDING)], {"name": "neighborhood"}),
+            ("healthcare_providers", [("neighborhood_id", ASCENDING), ("type", ASCENDING)], {"name": "neighborhood_type"}),
+        ],
+    },
+    {
+        "version": 2,
+        "description": "حفظ القيمة الرقمية للمبالغ (parsed_amount) للاحتياجات والتبرعات الحالية",
+        "migrate": backfill_parsed_amounts,
+    },
+    {
+        "version": 3,
+        "description": "فهارس التقسيم لصفحات (keyset) لقائمة التبرعات",
+        "indexes": [
+            ("donations", [("created_at", DESCENDING), ("id", DESCENDING)], {"name": "created_at_id"}),
+            ("donations", [("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], {"name": "status_created_at_id"}),
+            ("donations", [("family_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], {"name": "family_created_at_id"}),
+        ],
+    },
+    {
+        "version": 4,
+        "description": "نسخ حي العائلة إلى التبرعات وفهرس (neighborhood_id, created_at) لاستعلامات اللجان",
+        "indexes": [
+            ("donations", [("neighborhood_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], {"name": "neighborhood_created_at_id"}),
+        ],
+        "migrate": backfill_donation_neighborhoods,
+    },
+    {
+        "version": 5,
+        "description": "نقل الصور المضمّنة (base64) إلى مخزن الملفات GridFS",
+        "indexes": [
+            ("blobs.files", [("filename", ASCENDING), ("uploadDate", DESCENDING)], {"name": "filename_upload_date"}),
+        ],
+        "migrate": extract_embedded_images,
+    },
+    {
+        "version": 6,
+        "description": "عداد ذري لأرقام العائلات (counters)",
+        "indexes": [_id_index("counters")],
+        "migrate": seed_family_number_counter,
+    },
+    {
+        "version": 7,
+        "description": "فهرس فريد (family_id, need_id, month) للاحتياجات الشهرية",
+        "ddl": make_family_need_month_unique,
+    },
+    {
+        "version": 8,
+        "description": "حقول وفهارس البحث والتقسيم بالمؤشر لسجل حركات الاحتياجات",
+        "indexes": [
+            ("family_needs_audit_log", [("family_id", ASCENDING), ("timestamp", DESCENDING), ("id", DESCENDING)], {"name": "family_timestamp_id"}),
+            ("family_needs_audit_log", [("family_id", ASCENDING), ("search_tokens", ASCENDING)], {"name": "family_search_tokens"}),
+            ("family_needs_audit_log", [("search_text", "text")], {"name": "search_text", "default_language": "none"}),
+        ],
+        "migrate": backfill_audit_search_fields,
+    },
+    {
+        "version": 9,
+        "description": "تواريخ (date) بدلاً من النصوص في السجلات وفهارس أرشيف السجلات الشهري",
+        "indexes": [
+            _id_index("history_archive"),
+            ("history_archive", [("source", ASCENDING), ("key", ASCENDING), ("max_timestamp", DESCENDING)], {"name": "source_key_max_timestamp"}),
+        ],
+        "migrate": convert_history_timestamps,
+    },
+    {
+        "version": 10,
+        "description": "فهرس فريد لمهام الصيانة (عقد تنفيذ المهمة على عامل واحد)",
+        "indexes": [_id_index("maintenance_jobs")],
+    },
+]
+
+SCHEMA_STATE_ID = "schema"
+SCHEMA_MIGRATIONS_JOB_ID = "schema_data_migrations"
+
+async def _record_migration_failure(version: int, description: str, error: Exception):
+    logger.error(f"فشل ترحيل قاعدة البيانات {version} ({description}): {error}")
+    await db.schema_migrations.update_one(
+        {"id": SCHEMA_STATE_ID},
+        {"$set": {f"failed.{version}": str(error)}},
+        upsert=True
+    )
+
+async def _mark_migration_applied(version: int, applied: set):
+    applied.add(version)
+    # الإصدار الحالي = أعلى إصدار متصل مطبق
+    current_version = 0
+    while current_version + 1 in applied:
+        current_version += 1
+
+    await db.schema_migrations.update_one(
+        {"id": SCHEMA_STATE_ID},
+        {
+            "$set": {
+                "version": current_version,
+                "updated_at": datetime.now(timezone.utc)
+            },
+            "$addToSet": {"applied": version},
+            "$unset": {f"failed.{version}": ""}
+        },
+        upsert=True
+    )
+
+async def apply_schema_indexes():
+    """
+    تطبيق الفهارس وتغييرات البنية (ddl) للترحيلات غير المطبقة بالترتيب - عند التشغيل
+    - الإصدارات التي طُبقت فهارسها تُحفظ في indexed وترحيل بياناتها يعمل في الخلفية
+    - الترحيل الفاشل لا يُسجل ويُعاد تجربته عند التشغيل التالي
+    """
+    state = await db.schema_migrations.find_one({"id": SCHEMA_STATE_ID}, {"_id": 0}) or {}
+    applied = set(state.get("applied", []))
+    indexed = set(state.get("indexed", []))
+
+    for migration in sorted(SCHEMA_MIGRATIONS, key=lambda m: m["version"]):
+        version = migration["version"]
+        if version in applied or version in indexed:
+            continue
+
+        try:
+            indexes_by_collection = {}
+            for collection, keys, options in migration.get("indexes", []):
+                indexes_by_collection.setdefault(collection, []).append(IndexModel(keys, **options))
+            for collection, models in indexes_by_collection.items():
+                await db[collection].create_indexes(models)
+
+            if migration.get("ddl"):
+                await migration["ddl"]()
+        except Exception as e:
+            await _record_migration_failure(version, migration['description'], e)
+            continue
+
+        if migration.get("migrate"):
+            await db.schema_migrations.update_one(
+                {"id": SCHEMA_STATE_ID},
+                {"$addToSet": {"indexed": version}, "$unset": {f"failed.{version}": ""}},
+                upsert=True
+            )
+        else:
+            await _mark_migration_applied(version, applied)
+            logger.info(f"تم تطبيق ترحيل قاعدة البيانات {version}: {migration['description']}")
+
+async def run_schema_data_migrations():
+    """
+    ترحيلات البيانات (backfill) بالترتيب في الخلفية - لا تؤخر جاهزية الخادم
+    - التقدم محفوظ في maintenance_jobs ويظهر في /health/ready
+    - عند فشل ترحيل تتوقف الترحيلات التالية (قد تعتمد عليه) ويُعاد تجربته عند التشغيل التالي
+    """
+    state = await db.schema_migrations.find_one({"id": SCHEMA_STATE_ID}, {"_id": 0}) or {}
+    applied = set(state.get("applied", []))
+    indexed = set(state.get("indexed", []))
+    pending = [
+        migration for migration in sorted(SCHEMA_MIGRATIONS, key=lambda m: m["version"])
+        if migration["version"] in indexed and migration["version"] not in applied
+    ]
+    if not pending:
+        return
+
+    await db.maintenance_jobs.update_one(
+        {"id": SCHEMA_MIGRATIONS_JOB_ID},
+        {"$set": {
+            "status": "running",
+            "pending": [migration["version"] for migration in pending],
+            "current_version": None,
+            "started_at": datetime.now(timezone.utc),
+            "updated_at": datetime.now(timezone.utc),
+            "finished_at": None,
+            "error": None
+        }},
+        upsert=True
+    )
+    for migration in pending:
+        version = migration["version"]
+        await db.maintenance_jobs.update_one(
+            {"id": SCHEMA_MIGRATIONS_JOB_ID},
+            {"$set": {"current_version": version, "updated_at": datetime.now(timezone.utc)}}
+        )
+        try:
+            await migration["migrate"]()
+        except asyncio.CancelledError:
+            # يُعاد الترحيل الحالي عند التشغيل التالي (دوال الترحيل idempotent)
+            raise
+        except Exception as e:
+            await _record_migration_failure(version, migration['description'], e)
+            await db.maintenance_jobs.update_one(
+                {"id": SCHEMA_MIGRATIONS_JOB_ID},
+                {"$set": {"status": "failed", "error": f"{version}: {e}", "updated_at": datetime.now(timezone.utc)}}
+            )
+            return
+
+        await _mark_migration_applied(version, applied)
+        await db.maintenance_jobs.update_one(
+            {"id": SCHEMA_MIGRATIONS_JOB_ID},
+            {"$pull": {"pending": version}, "$set": {"updated_at": datetime.now(timezone.utc)}}
+        )
+        logger.info(f"تم تطبيق ترحيل قاعدة البيانات {version}: {migration['description']}")
+
+    await db.maintenance_jobs.update_one(
+        {"id": SCHEMA_MIGRATIONS_JOB_ID},
+        {"$set": {
+            "status": "completed",
+            "current_version": None,
+            "finished_at": datetime.now(timezone.utc),
+            "updated_at": datetime.now(timezone.utc)
+        }}
+    )
+
 @app.on_event("startup")
 async def startup_db():
-    # تحديث جميع العائلات بالحقول الجديدة إذا لم تكن موجودة
+    # تطبيق الفهارس (ترحيلات البيانات تعمل في الخلفية بعد الجاهزية)
     try:
-        families = await db.families.find({}, {"_id": 0}).to_list(10000)
-        updated_count = 0
-        
-        for family in families:
-            family_id = family.get('id')
-            if family_id:
-                # تحديث المبالغ
-                needs_total = await update_family_total_needs_amount(family_id)
-                donations_total = await update_family_total_donations_amount(family_id)
-                updated_count += 1
-        
-        if updated_count > 0:
-            logger.info(f"تم تحديث {updated_count} عائلة بالمبالغ الإجمالية")
+        await apply_schema_indexes()
     except Exception as e:
-        logger.error(f"خطأ في تحديث العائلات: {e}")
-    
+        logger.error(f"خطأ في تطبيق ترحيلات قاعدة البيانات: {e}")
+
     # Create default positions if they don't exist
     default_positions = [
         "رئيس اللجنة",
@@ -3668,7 +6635,7 @@ async def startup_db():
             password="admin",
             role="admin"
         )
-        hashed_password = get_password_hash(admin_user.password)
+        hashed_password = await get_password_hash_async(admin_user.password)
         user_obj = User(
             full_name=admin_user.full_name,
             email=admin_user.email,
@@ -3683,6 +6650,28 @@ async def startup_db():
     else:
         logger.info("Admin user exists (admin@example.com)")
 
+    # ترحيلات البيانات ومطابقة المبالغ الإجمالية للعائلات في الخلفية (لا تؤخر جاهزية الخادم)
+    app_state["migrations_task"] = asyncio.create_task(run_schema_data_migrations())
+    app_state["reconciliation_task"] = asyncio.create_task(run_family_totals_reconciliation())
+    app_state["consistency_check_task"] = asyncio.create_task(run_periodic_family_totals_check())
+    app_state["history_archive_task"] = asyncio.create_task(run_periodic_history_archive())
+    family_summary_queue.start()
+    audit_sink.start()
+    app_state["started"] = True
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for task_name in ["migrations_task", "reconciliation_task", "consistency_check_task", "history_archive_task"]:
+        task = app_state.get(task_name)
+        if task and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+    await family_summary_queue.drain()
+    await audit_sink.stop()
+    password_hash_executor.shutdown(wait=False)
+    if image_process_pool is not None:
+        image_process_pool.shutdown(wait=False, cancel_futures=True)
     client.close()
\ No newline at end of file
@@ -0,0 +1,37 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+# server.py يقرأ إعدادات قاعدة البيانات عند الاستيراد
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "hama_togather_test")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import server  # noqa: E402
+
+
+@pytest.fixture
+def mock_db(monkeypatch):
+    """قاعدة بيانات في الذاكرة بدل MongoDB (بدون الذاكرة المؤقتة للبيانات المرجعية من اختبار سابق)"""
+    from mongomock_motor import AsyncMongoMockClient
+
+    database = AsyncMongoMockClient()[os.environ["DB_NAME"]]
+    monkeypatch.setattr(server, "db", database)
+    for collection in server.REFERENCE_COLLECTIONS:
+        server.reference_cache.bump(collection)
+    return database
+
+
+@pytest.fixture
+def api_client(mock_db):
+    """client_for(user) - TestClient باسم مستخدم مسجل (فحوصات الأدوار تبقى كما هي)"""
+    def client_for(user: server.User) -> TestClient:
+        server.app.dependency_overrides[server.get_current_user] = lambda: user
+        return TestClient(server.app)
+
+    yield client_for
+    server.app.dependency_overrides.clear()
@@ -0,0 +1,56 @@
+"""
+Tests for the conditional and range request helpers used by GET /blobs/{blob_hash}
+"""
+
+import pytest
+
+from server import etag_matches, parse_range_header
+
+ETAG = '"4f1c2d"'
+
+
+@pytest.mark.parametrize("if_none_match, expected", [
+    ('"4f1c2d"', True),
+    ('W/"4f1c2d"', True),
+    ('"aaaa", "4f1c2d"', True),
+    ("*", True),
+    ('"4f1c2"', False),
+    ('"4f1c2d-gzip"', False),
+    ('"aaaa", "bbbb"', False),
+    (None, False),
+    ("", False),
+])
+def test_etag_matches(if_none_match, expected):
+    assert etag_matches(if_none_match, ETAG) is expected
+
+
+def test_etag_matches_weak_current_etag():
+    assert etag_matches('"4f1c2d"', 'W/"4f1c2d"')
+
+
+def test_etag_matches_without_current_etag():
+    assert not etag_matches("*", None)
+
+
+@pytest.mark.parametrize("range_header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=900-5000", (900, 999)),
+    (" bytes=0-0 ", (0, 0)),
+])
+def test_parse_range_header(range_header, expected):
+    assert parse_range_header(range_header, 1000) == expected
+
+
+@pytest.mark.parametrize("range_header", [
+    "bytes=-",
+    "bytes=1000-",
+    "bytes=500-100",
+    "bytes=0-10,20-30",
+    "items=0-10",
+    "bytes=abc",
+])
+def test_parse_range_header_invalid(range_header):
+    assert parse_range_header(range_header, 1000) is None
@@ -0,0 +1,112 @@
+"""
+Tests for the keyset pagination helpers and date filters used by GET /donations
+"""
+
+from datetime import datetime, timezone
+
+import mongomock
+import pytest
+from fastapi import HTTPException
+
+from server import build_keyset_filter, date_range_filter, decode_cursor, encode_cursor
+
+
+@pytest.mark.parametrize("sort_value", [
+    "2025-01-15T10:00:00+00:00",
+    150000.0,
+    None,
+    datetime(2025, 1, 15, 10, 0, tzinfo=timezone.utc),
+    "عائلة",
+])
+def test_cursor_round_trip(sort_value):
+    position = decode_cursor(encode_cursor(sort_value, "donation-1"))
+    assert position["v"] == sort_value
+    assert position["id"] == "donation-1"
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", encode_cursor("x", "1")[:-4] + "!!!!", "W10="])
+def test_decode_cursor_rejects_invalid_cursor(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor)
+    assert exc.value.status_code == 400
+
+
+def _page_through(collection, sort_field, sort_direction, page_size):
+    """قراءة كل الصفحات بالمؤشر كما تفعل GET /donations"""
+    seen = []
+    query = {}
+    while True:
+        page = list(
+            collection.find(query, {"_id": 0})
+            .sort([(sort_field, sort_direction), ("id", sort_direction)])
+            .limit(page_size)
+        )
+        seen.extend(doc["id"] for doc in page)
+        if len(page) < page_size:
+            return seen
+        position = decode_cursor(encode_cursor(page[-1].get(sort_field), page[-1]["id"]))
+        query = build_keyset_filter(sort_field, sort_direction, position["v"], position["id"])
+
+
+@pytest.mark.parametrize("sort_direction", [1, -1])
+@pytest.mark.parametrize("page_size", [1, 2, 3, 10])
+def test_keyset_pages_cover_every_row_once(sort_direction, page_size):
+    collection = mongomock.MongoClient().db.donations
+    amounts = [500, 100, None, 100, 300, None, 500, 100]
+    collection.insert_many([
+        {"id": f"d{i}", "amount": amount} for i, amount in enumerate(amounts)
+    ])
+    expected = [
+        doc["id"] for doc in collection.find({}, {"_id": 0})
+        .sort([("amount", sort_direction), ("id", sort_direction)])
+    ]
+
+    assert _page_through(collection, "amount", sort_direction, page_size) == expected
+
+
+def test_keyset_filter_after_null_value_descending_stays_in_nulls():
+    assert build_keyset_filter("amount", -1, None, "d5") == {"amount": None, "id": {"$lt": "d5"}}
+
+
+def test_date_range_filter_empty_without_bounds():
+    assert date_range_filter("created_at", None, None) == {}
+
+
+def test_date_range_filter_date_to_includes_whole_day():
+    query = date_range_filter("created_at", "2025-01-01", "2025-01-31")
+    string_bounds, date_bounds = (condition["created_at"] for condition in query["$or"])
+    assert string_bounds == {
+        "$gte": "2025-01-01T00:00:00+00:00",
+        "$lt": "2025-02-01T00:00:00+00:00",
+    }
+    assert date_bounds == {
+        "$gte": datetime(2025, 1, 1, tzinfo=timezone.utc),
+        "$lt": datetime(2025, 2, 1, tzinfo=timezone.utc),
+    }
+
+
+def test_date_range_filter_converts_offsets_to_utc():
+    query = date_range_filter("created_at", "2025-01-01T03:00:00+03:00", "2025-01-02T10:30:00Z")
+    string_bounds = query["$or"][0]["created_at"]
+    assert string_bounds == {
+        "$gte": "2025-01-01T00:00:00+00:00",
+        "$lte": "2025-01-02T10:30:00+00:00",
+    }
+
+
+def test_date_range_filter_matches_iso_strings_and_dates():
+    collection = mongomock.MongoClient().db.donations
+    collection.insert_many([
+        {"id": "before", "created_at": "2024-12-31T23:59:59+00:00"},
+        {"id": "string", "created_at": "2025-01-10T08:00:00+00:00"},
+        {"id": "date", "created_at": datetime(2025, 1, 31, 22, 0)},
+        {"id": "after", "created_at": "2025-02-01T00:00:00+00:00"},
+    ])
+    query = date_range_filter("created_at", "2025-01-01", "2025-01-31")
+    assert sorted(doc["id"] for doc in collection.find(query)) == ["date", "string"]
+
+
+def test_date_range_filter_rejects_invalid_date():
+    with pytest.raises(HTTPException) as exc:
+        date_range_filter("created_at", "01/02/2025", None)
+    assert exc.value.status_code == 400
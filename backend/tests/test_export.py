@@ -0,0 +1,107 @@
+"""
+Tests for GET /api/export/{dataset} and spreadsheet formula escaping
+"""
+
+import asyncio
+import csv
+import io
+
+import pytest
+
+import server
+from server import escape_formula, unescape_formula
+
+ADMIN = server.User(id="admin-1", full_name="Admin", role="admin")
+COMMITTEE = server.User(id="committee-1", full_name="Committee", role="committee_member", neighborhood_id="n1")
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("=SUM(A1:A2)", "'=SUM(A1:A2)"),
+    ("@cmd", "'@cmd"),
+    ("+cmd|' /C calc'!A0", "'+cmd|' /C calc'!A0"),
+    ("-1+1", "'-1+1"),
+    ("\t=1", "'\t=1"),
+    ("+963 933 123 456", "+963 933 123 456"),
+    ("-500", "-500"),
+    ("-1,500.5", "-1,500.5"),
+    ("أسرة أحمد", "أسرة أحمد"),
+    (100, 100),
+    (None, None),
+])
+def test_escape_formula(value, expected):
+    assert escape_formula(value) == expected
+
+
+@pytest.mark.parametrize("value", ["=SUM(A1:A2)", "@cmd", "+963 933 123 456", "'quoted", "نص عادي"])
+def test_unescape_formula_reverses_escape(value):
+    assert unescape_formula(escape_formula(value)) == value
+
+
+@pytest.fixture
+def families_db(mock_db):
+    async def seed():
+        await mock_db.neighborhoods.insert_many([
+            {"id": "n1", "name": "الميدان"},
+            {"id": "n2", "name": "الحاضر"},
+        ])
+        await mock_db.families.insert_many([
+            {"id": "f1", "family_number": "FAM-001", "name": "=HYPERLINK(\"x\")", "phone": "+963 933 123 456",
+             "members_count": 5, "description": "وصف", "monthly_need": 100000.0, "neighborhood_id": "n1",
+             "father_present": True, "created_at": "2025-01-10T08:00:00+00:00"},
+            {"id": "f2", "family_number": "FAM-002", "name": "أسرة علي", "members_count": 3,
+             "description": "وصف", "monthly_need": 50000.0, "neighborhood_id": "n2",
+             "created_at": "2025-02-10T08:00:00+00:00"},
+        ])
+    asyncio.run(seed())
+    return mock_db
+
+
+def read_csv(response):
+    assert response.status_code == 200
+    assert response.content.startswith("\ufeff".encode("utf-8"))
+    return list(csv.DictReader(io.StringIO(response.content.decode("utf-8-sig"))))
+
+
+def test_export_families_csv(families_db, api_client):
+    rows = read_csv(api_client(ADMIN).get("/api/export/families"))
+
+    assert [row["رقم العائلة"] for row in rows] == ["FAM-001", "FAM-002"]
+    first = rows[0]
+    assert first["الاسم"] == "'=HYPERLINK(\"x\")"
+    assert first["الهاتف"] == "+963 933 123 456"
+    assert first["الحي"] == "الميدان"
+    assert first["الأب موجود"] == "نعم"
+
+
+def test_export_families_filters_by_date(families_db, api_client):
+    rows = read_csv(api_client(ADMIN).get("/api/export/families", params={"date_from": "2025-02-01"}))
+    assert [row["رقم العائلة"] for row in rows] == ["FAM-002"]
+
+
+def test_export_is_scoped_to_committee_neighborhood(families_db, api_client):
+    response = api_client(COMMITTEE).get("/api/export/families", params={"neighborhood_id": "n2"})
+    assert [row["رقم العائلة"] for row in read_csv(response)] == ["FAM-001"]
+
+
+def test_export_rejects_unknown_dataset_and_format(families_db, api_client):
+    client = api_client(ADMIN)
+    assert client.get("/api/export/users").status_code == 404
+    assert client.get("/api/export/families", params={"format": "pdf"}).status_code == 400
+
+
+def test_exported_csv_imports_back_unchanged(families_db, api_client):
+    client = api_client(ADMIN)
+    exported = client.get("/api/export/families").content
+    asyncio.run(families_db.families.delete_many({}))
+    asyncio.run(families_db.counters.insert_one({"id": server.FAMILY_NUMBER_COUNTER_ID, "value": 0}))
+
+    result = client.post(
+        "/api/families/import",
+        files={"file": ("families.csv", exported, "text/csv")},
+    ).json()
+
+    assert result["imported"] == 2, result["errors"]
+    imported = asyncio.run(families_db.families.find({}, {"_id": 0}).sort("family_number", 1).to_list(None))
+    assert imported[0]["name"] == "=HYPERLINK(\"x\")"
+    assert imported[0]["phone"] == "+963 933 123 456"
+    assert [family["neighborhood_id"] for family in imported] == ["n1", "n2"]
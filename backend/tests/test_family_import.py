@@ -0,0 +1,156 @@
+"""
+Tests for POST /api/families/import (CSV/XLSX, dry_run, row errors, limits)
+"""
+
+import asyncio
+import io
+
+import openpyxl
+import pytest
+
+import server
+
+ADMIN = server.User(id="admin-1", full_name="Admin", role="admin")
+COMMITTEE = server.User(id="committee-1", full_name="Committee", role="committee_member", neighborhood_id="n1")
+
+HEADER = "الاسم,عدد الأفراد,الوصف,الاحتياج الشهري,الحي\n"
+
+
+@pytest.fixture
+def seeded_db(mock_db):
+    async def seed():
+        await mock_db.neighborhoods.insert_many([
+            {"id": "n1", "name": "الميدان"},
+            {"id": "n2", "name": "الحاضر"},
+        ])
+        await mock_db.families.create_index("family_number", unique=True)
+        await mock_db.counters.insert_one({"id": server.FAMILY_NUMBER_COUNTER_ID, "value": 0})
+    asyncio.run(seed())
+    return mock_db
+
+
+def upload(client, content: bytes, filename="families.csv", **params):
+    return client.post(
+        "/api/families/import",
+        params=params,
+        files={"file": (filename, content, "text/csv")},
+    )
+
+
+def families(db):
+    return asyncio.run(db.families.find({}, {"_id": 0}).sort("family_number", 1).to_list(None))
+
+
+def test_import_csv_creates_families(seeded_db, api_client):
+    csv = HEADER + "أسرة أحمد,5,وصف,100000,الميدان\nأسرة علي,3,وصف,50000,n2\n"
+    response = upload(api_client(ADMIN), csv.encode("utf-8-sig"))
+
+    assert response.status_code == 200
+    result = response.json()
+    assert result["imported"] == 2
+    assert result["failed"] == 0
+    assert result["truncated"] is False
+    stored = families(seeded_db)
+    assert [(f["name"], f["neighborhood_id"]) for f in stored] == [("أسرة أحمد", "n1"), ("أسرة علي", "n2")]
+    assert [f["family_number"] for f in stored] == [result["first_family_number"], result["last_family_number"]]
+    assert all(f["created_by_user_id"] == ADMIN.id for f in stored)
+
+
+def test_import_dry_run_validates_without_saving(seeded_db, api_client):
+    csv = HEADER + "أسرة أحمد,5,وصف,100000,الميدان\nأسرة علي,abc,وصف,50000,الميدان\n"
+    result = upload(api_client(ADMIN), csv.encode(), dry_run="true").json()
+
+    assert result["dry_run"] is True
+    assert result["total_rows"] == 2
+    assert result["valid_rows"] == 1
+    assert result["imported"] == 0
+    assert [error["row"] for error in result["errors"]] == [3]
+    assert families(seeded_db) == []
+
+
+def test_import_reports_row_errors_and_keeps_valid_rows(seeded_db, api_client):
+    csv = (
+        HEADER
+        + "أسرة أحمد,5,وصف,100000,حي مجهول\n"
+        + ",,,,\n"
+        + ",4,وصف,20000,الميدان\n"
+        + "أسرة علي,3,وصف,50000,الحاضر\n"
+    )
+    result = upload(api_client(ADMIN), csv.encode()).json()
+
+    assert result["total_rows"] == 3  # الصف الفارغ لا يُحسب
+    assert result["imported"] == 1
+    errors = {error["row"]: error["errors"] for error in result["errors"]}
+    assert set(errors) == {2, 4}
+    assert "حي مجهول" in errors[2][0]
+    assert errors[4][0].startswith("name")
+    assert [f["name"] for f in families(seeded_db)] == ["أسرة علي"]
+
+
+def test_import_reports_bulk_write_failures_per_row(seeded_db, api_client):
+    # رقم العائلة التالي من العداد مستخدم مسبقاً - الصف الأول يفشل والثاني يُحفظ
+    asyncio.run(seeded_db.families.insert_one({"id": "existing", "family_number": server.format_family_number(1)}))
+
+    csv = HEADER + "أسرة أحمد,5,وصف,100000,الميدان\nأسرة علي,3,وصف,50000,الميدان\n"
+    result = upload(api_client(ADMIN), csv.encode()).json()
+
+    assert result["imported"] == 1
+    assert [error["row"] for error in result["errors"]] == [2]
+    assert result["errors"][0]["errors"][0].startswith("تعذر الحفظ")
+    assert result["first_family_number"] == result["last_family_number"] == server.format_family_number(2)
+
+
+def test_import_by_committee_member_forces_neighborhood(seeded_db, api_client):
+    csv = HEADER + "أسرة أحمد,5,وصف,100000,حي مجهول\nأسرة علي,3,وصف,50000,الحاضر\n"
+    result = upload(api_client(COMMITTEE), csv.encode()).json()
+
+    assert result["imported"] == 2
+    assert result["errors"] == []
+    assert {f["neighborhood_id"] for f in families(seeded_db)} == {"n1"}
+
+
+def test_import_unescapes_exported_formulas(seeded_db, api_client):
+    csv = HEADER + "'=أسرة أحمد,5,'@وصف,100000,الميدان\n"
+    upload(api_client(ADMIN), csv.encode())
+
+    stored, = families(seeded_db)
+    assert stored["name"] == "=أسرة أحمد"
+    assert stored["description"] == "@وصف"
+
+
+def test_import_xlsx(seeded_db, api_client):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["الاسم", "عدد الأفراد", "الوصف", "الاحتياج الشهري", "الحي", "الأب موجود"])
+    sheet.append(["أسرة أحمد", 5, "وصف", 100000, "الميدان", "نعم"])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+
+    result = upload(api_client(ADMIN), buffer.getvalue(), filename="families.xlsx").json()
+
+    assert result["imported"] == 1
+    stored, = families(seeded_db)
+    assert stored["members_count"] == 5
+    assert stored["father_present"] is True
+
+
+def test_import_truncates_after_max_rows(seeded_db, api_client, monkeypatch):
+    monkeypatch.setattr(server, "FAMILY_IMPORT_MAX_ROWS", 2)
+    csv = HEADER + "".join(f"أسرة {i},5,وصف,100,الميدان\n" for i in range(4))
+    result = upload(api_client(ADMIN), csv.encode()).json()
+
+    assert result["truncated"] is True
+    assert result["total_rows"] == 2
+    assert result["imported"] == 2
+
+
+def test_import_rejects_large_file(seeded_db, api_client, monkeypatch):
+    monkeypatch.setattr(server, "FAMILY_IMPORT_MAX_BYTES", 10)
+    response = upload(api_client(ADMIN), (HEADER + "أسرة أحمد,5,وصف,100000,الميدان\n").encode())
+    assert response.status_code == 413
+    assert families(seeded_db) == []
+
+
+def test_import_requires_admin_or_committee(seeded_db, api_client):
+    response = upload(api_client(server.User(id="u1", full_name="User")), HEADER.encode())
+    assert response.status_code == 403
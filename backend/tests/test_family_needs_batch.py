@@ -0,0 +1,126 @@
+"""
+Tests for POST/PUT /api/family-needs/batch and the $inc family totals they apply
+"""
+
+import asyncio
+
+import pytest
+
+import server
+
+ADMIN = server.User(id="admin-1", full_name="Admin", role="admin")
+COMMITTEE = server.User(id="committee-1", full_name="Committee", role="committee_member", neighborhood_id="n1")
+
+
+@pytest.fixture
+def needs_db(mock_db):
+    async def seed():
+        await mock_db.families.insert_many([
+            {"id": "f1", "neighborhood_id": "n1", "total_needs_amount": 0.0},
+            {"id": "f2", "neighborhood_id": "n2", "total_needs_amount": 0.0},
+        ])
+        await mock_db.needs.insert_many([
+            {"id": "bread", "name": "خبز"},
+            {"id": "rent", "name": "إيجار"},
+        ])
+    asyncio.run(seed())
+    return mock_db
+
+
+def family(db, family_id):
+    return asyncio.run(db.families.find_one({"id": family_id}, {"_id": 0}))
+
+
+def audit_actions(db):
+    async def read():
+        await server.audit_sink.flush()
+        return [doc["action_type"] async for doc in db.family_needs_audit_log.find({})]
+    return asyncio.run(read())
+
+
+def test_batch_add_updates_totals_once_per_family(needs_db, api_client):
+    response = api_client(ADMIN).post("/api/family-needs/batch", json={
+        "family_id": "f1",
+        "needs": [
+            {"need_id": "bread", "amount": "100,000 ل.س"},
+            {"need_id": "rent", "amount": "250000"},
+            {"need_id": "bread", "amount": "50000", "family_id": "f2"},
+        ],
+    })
+
+    assert response.status_code == 200
+    result = response.json()
+    assert result["created_count"] == 3
+    assert result["errors"] == []
+    assert family(needs_db, "f1")["total_needs_amount"] == 350000.0
+    assert family(needs_db, "f1")["totals_seq"] == 1
+    assert family(needs_db, "f2")["total_needs_amount"] == 50000.0
+    assert result["created"][0]["parsed_amount"]["currency"] == "SYP"
+    assert audit_actions(needs_db) == ["created", "created", "created"]
+
+
+def test_batch_add_reports_invalid_items_by_index(needs_db, api_client):
+    result = api_client(ADMIN).post("/api/family-needs/batch", json={
+        "needs": [
+            {"need_id": "bread", "amount": "100", "family_id": "f1"},
+            {"need_id": "bread", "amount": "100"},
+            {"need_id": "bread", "amount": "100", "family_id": "missing"},
+            {"need_id": "unknown", "amount": "100", "family_id": "f1"},
+            {"need_id": "bread", "amount": "200", "family_id": "f1"},
+        ],
+    }).json()
+
+    assert result["created_count"] == 1
+    assert [error["index"] for error in result["errors"]] == [1, 2, 3, 4]
+    assert family(needs_db, "f1")["total_needs_amount"] == 100.0
+
+
+def test_batch_add_by_committee_member_is_limited_to_neighborhood(needs_db, api_client):
+    result = api_client(COMMITTEE).post("/api/family-needs/batch", json={
+        "needs": [
+            {"need_id": "bread", "amount": "100", "family_id": "f1"},
+            {"need_id": "bread", "amount": "100", "family_id": "f2"},
+        ],
+    }).json()
+
+    assert result["created_count"] == 1
+    assert result["errors"] == [{"index": 1, "detail": "Family not found"}]
+    assert family(needs_db, "f2")["total_needs_amount"] == 0.0
+
+
+def test_batch_update_applies_amount_deltas(needs_db, api_client):
+    client = api_client(ADMIN)
+    created = client.post("/api/family-needs/batch", json={
+        "family_id": "f1",
+        "needs": [
+            {"need_id": "bread", "amount": "100"},
+            {"need_id": "rent", "amount": "50"},
+        ],
+    }).json()["created"]
+    bread, rent = (need["id"] for need in created)
+
+    result = client.put("/api/family-needs/batch", json={
+        "updates": [
+            {"id": bread, "amount": "300"},
+            {"id": rent, "is_active": False},
+            {"id": "missing", "amount": "1"},
+            {"id": rent, "need_id": "unknown"},
+        ],
+    }).json()
+
+    assert result["updated_count"] == 2
+    assert [error["index"] for error in result["errors"]] == [2, 3]
+    # الاحتياجات المتوقفة تبقى ضمن مجموع الاحتياجات - فقط تغيير المبلغ يغير المجموع
+    assert family(needs_db, "f1")["total_needs_amount"] == 350.0
+    assert {need["id"]: need["parsed_amount"]["value"] for need in result["updated"]}[bread] == 300.0
+    assert audit_actions(needs_db) == ["created", "created", "updated", "deactivated"]
+
+
+def test_batch_requests_are_bounded(needs_db, api_client, monkeypatch):
+    monkeypatch.setattr(server, "FAMILY_NEEDS_BATCH_MAX", 2)
+    client = api_client(ADMIN)
+    needs = [{"need_id": "bread", "amount": "1", "family_id": "f1"}] * 3
+
+    assert client.post("/api/family-needs/batch", json={"needs": []}).status_code == 400
+    assert client.post("/api/family-needs/batch", json={"needs": needs}).status_code == 400
+    assert client.put("/api/family-needs/batch", json={"updates": []}).status_code == 400
@@ -0,0 +1,60 @@
+"""
+Tests for parse_amount (amounts parsed once at write time)
+"""
+
+import pytest
+
+from server import parse_amount
+
+
+@pytest.mark.parametrize("text, value, currency", [
+    ("100,000 ل.س", 100000.0, "SYP"),
+    ("50 دولار", 50.0, "USD"),
+    ("$300", 300.0, "USD"),
+    ("500 USD", 500.0, "USD"),
+    ("200 بالدولار", 200.0, "USD"),
+    ("1000 ليرة تركية", 1000.0, "TRY"),
+    ("20 €", 20.0, "EUR"),
+    ("150 ريال", 150.0, "SAR"),
+    ("75000", 75000.0, None),
+])
+def test_parse_amount_value_and_currency(text, value, currency):
+    parsed = parse_amount(text)
+    assert parsed["value"] == value
+    assert parsed["currency"] == currency
+    assert parsed["confidence"] == 1.0
+
+
+def test_parse_amount_sums_multiple_numbers_with_lower_confidence():
+    parsed = parse_amount("100 و 200")
+    assert parsed["value"] == 300.0
+    assert parsed["confidence"] == 0.5
+
+
+@pytest.mark.parametrize("text", [None, "", "لا يوجد"])
+def test_parse_amount_without_numbers(text):
+    parsed = parse_amount(text)
+    assert parsed["value"] == 0.0
+    assert parsed["currency"] is None
+    assert parsed["confidence"] == 0.0
+
+
+@pytest.mark.parametrize("text, unit", [
+    ("2 سلة", "سلة"),
+    ("3 سلال غذائية", "سلال"),
+    ("5 kg", "kg"),
+    ("10 كيلو", "كيلو"),
+])
+def test_parse_amount_unit(text, unit):
+    assert parse_amount(text)["unit"] == unit
+
+
+@pytest.mark.parametrize("text", [
+    "20 country",
+    "سلالم 20",
+    "تركيب 300",
+])
+def test_parse_amount_markers_match_whole_words_only(text):
+    parsed = parse_amount(text)
+    assert parsed["currency"] is None
+    assert parsed["unit"] is None
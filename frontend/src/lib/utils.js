@@ -4,3 +4,11 @@ import { twMerge } from "tailwind-merge"
 export function cn(...inputs) {
   return twMerge(clsx(inputs));
 }
+
+// روابط الصور المرفوعة تُحفظ نسبية (/api/blobs/...) - تُحل مقابل عنوان الـ API لأن الواجهة قد تعمل من نطاق آخر
+export function resolveImageUrl(url) {
+  if (typeof url === "string" && url.startsWith("/api/")) {
+    return `${process.env.REACT_APP_BACKEND_URL || ""}${url}`;
+  }
+  return url;
+}
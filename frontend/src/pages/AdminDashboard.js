@@ -17,6 +17,7 @@ import { Plus, Edit, Trash2, Users, Heart, Activity, GraduationCap, Building2, H
 import ReferenceDataManagement from '../components/admin/ReferenceDataManagement';
 import FamilyNeedsManager from '../components/admin/FamilyNeedsManager';
 import FamilyNeedsList from '../components/admin/FamilyNeedsList';
+import { resolveImageUrl } from '@/lib/utils';
 
 const API_URL = `${process.env.REACT_APP_BACKEND_URL}/api`;
 
@@ -1320,7 +1321,7 @@ const AdminDashboard = () => {
                 <Label>معاينة الصورة:</Label>
                 <div className="relative mt-2">
                   <img 
-                    src={formData.vision_image} 
+                    src={resolveImageUrl(formData.vision_image)} 
                     alt="معاينة" 
                     className="w-full h-64 object-cover rounded-lg border"
                     onError={(e) => {
@@ -2157,7 +2158,7 @@ const AdminDashboard = () => {
                           </div>
                           
                           {heroContent.background_image && (
-                            <img src={heroContent.background_image} alt="background" className="mt-2 h-32 rounded" />
+                            <img src={resolveImageUrl(heroContent.background_image)} alt="background" className="mt-2 h-32 rounded" />
                           )}
                         </div>
                         
@@ -2688,7 +2689,7 @@ const AdminDashboard = () => {
                                         <td className="px-6 py-4 text-center">
                                           {member.image ? (
                                             <img 
-                                              src={member.image} 
+                                              src={resolveImageUrl(member.image)} 
                                               alt={member.first_name}
                                               className="w-12 h-12 rounded-full object-cover mx-auto border-2 border-gray-200"
                                             />
@@ -2916,7 +2917,7 @@ const AdminDashboard = () => {
                             <td className="px-4 py-3 text-sm text-gray-900 text-center">
                               <div className="flex items-center gap-2 justify-center">
                                 {member.image && (
-                                  <img src={member.image} alt={member.first_name} className="w-8 h-8 rounded-full object-cover" />
+                                  <img src={resolveImageUrl(member.image)} alt={member.first_name} className="w-8 h-8 rounded-full object-cover" />
                                 )}
                                 <span>{member.first_name} {member.father_name} {member.last_name}</span>
                               </div>
@@ -4360,7 +4361,7 @@ const AdminDashboard = () => {
                             </div>
                             
                             {missionContent.hero_background_image && (
-                              <img src={missionContent.hero_background_image} alt="hero background" className="mt-2 h-32 rounded" />
+                              <img src={resolveImageUrl(missionContent.hero_background_image)} alt="hero background" className="mt-2 h-32 rounded" />
                             )}
                           </div>
                           
@@ -4446,7 +4447,7 @@ const AdminDashboard = () => {
                             {missionContent.vision_image ? (
                               <div className="relative group">
                                 <img 
-                                  src={missionContent.vision_image} 
+                                  src={resolveImageUrl(missionContent.vision_image)} 
                                   alt="صورة الرؤية" 
                                   className="w-full h-64 object-cover rounded-lg border-2 border-gray-300"
                                 />
@@ -5002,7 +5003,7 @@ const AdminDashboard = () => {
               {viewingMember.image && (
                 <div className="flex justify-center">
                   <img 
-                    src={viewingMember.image} 
+                    src={resolveImageUrl(viewingMember.image)} 
                     alt={viewingMember.first_name} 
                     className="w-32 h-32 rounded-full object-cover border-4 border-emerald-100"
                   />
@@ -5240,7 +5241,7 @@ const AdminDashboard = () => {
                     {selectedFamilyForImages.images.map((image, index) => (
                       <div key={index} className="relative group aspect-video rounded-lg overflow-hidden shadow-md">
                         <img
-                          src={image}
+                          src={resolveImageUrl(image)}
                           alt={`صورة ${index + 1}`}
                           className="w-full h-full object-cover"
                         />
@@ -10,6 +10,7 @@ import {
 } from 'lucide-react';
 import { useAuth } from '../context/AuthContext';
 import { toast } from 'sonner';
+import { resolveImageUrl } from '@/lib/utils';
 
 const API_URL = `${process.env.REACT_APP_BACKEND_URL}/api`;
 
@@ -88,21 +89,35 @@ const DonationsManagement = () => {
     return () => document.removeEventListener('mousedown', handleClickOutside);
   }, [isDropdownOpen]);
 
+  // الخادم يعيد التبرعات على صفحات - نتابع الترويسة X-Next-Cursor حتى آخر صفحة
+  const fetchAllDonations = async () => {
+    const allDonations = [];
+    let cursor = null;
+    do {
+      const params = { sort_by: sortBy, sort_order: sortOrder };
+      if (cursor) params.cursor = cursor;
+      const response = await axios.get(`${API_URL}/donations`, { params });
+      allDonations.push(...(response.data || []));
+      cursor = response.headers['x-next-cursor'];
+    } while (cursor);
+    return allDonations;
+  };
+
   const fetchData = async () => {
     setLoading(true);
     try {
-      const [donationsRes, familiesRes, neighborhoodsRes, categoriesRes] = await Promise.all([
-        axios.get(`${API_URL}/donations?sort_by=${sortBy}&sort_order=${sortOrder}`),
+      const [donationsData, familiesRes, neighborhoodsRes, categoriesRes] = await Promise.all([
+        fetchAllDonations(),
         axios.get(`${API_URL}/families`),
         axios.get(`${API_URL}/neighborhoods`),
         axios.get(`${API_URL}/family-categories`)
       ]);
 
-      setDonations(donationsRes.data || []);
+      setDonations(donationsData);
       setFamilies(familiesRes.data || []);
       setNeighborhoods(neighborhoodsRes.data?.items || neighborhoodsRes.data || []);
       setCategories(categoriesRes.data?.items || categoriesRes.data || []);
-      calculateStats(donationsRes.data || []);
+      calculateStats(donationsData);
     } catch (error) {
       console.error('Error fetching data:', error);
       toast.error('حدث خطأ في تحميل البيانات');
@@ -1095,7 +1110,7 @@ const DonationsManagement = () => {
                         onClick={() => openImageModal(selectedDonation.completion_images, idx)}
                       >
                         <img
-                          src={img}
+                          src={resolveImageUrl(img)}
                           alt={`وصل ${idx + 1}`}
                           className="w-full h-32 object-cover rounded-lg border-2 border-green-300 hover:border-green-500 transition-colors"
                         />
@@ -1316,7 +1331,7 @@ const DonationsManagement = () => {
                       {completionImages.map((img, idx) => (
                         <div key={idx} className="relative group">
                           <img
-                            src={img}
+                            src={resolveImageUrl(img)}
                             alt={`صورة ${idx + 1}`}
                             className="w-full h-20 object-cover rounded-lg border-2 border-green-200"
                           />
@@ -1423,7 +1438,7 @@ const DonationsManagement = () => {
               onClick={(e) => e.stopPropagation()}
             >
               <img
-                src={currentImages[selectedImageIndex]}
+                src={resolveImageUrl(currentImages[selectedImageIndex])}
                 alt={`صورة ${selectedImageIndex + 1}`}
                 style={{
                   maxWidth: '95vw',
@@ -12,6 +12,7 @@ import { Textarea } from '@/components/ui/textarea';
 import { toast } from 'sonner';
 import { Users, Heart } from 'lucide-react';
 import { useAuth } from '../context/AuthContext';
+import { resolveImageUrl } from '@/lib/utils';
 
 const API_URL = `${process.env.REACT_APP_BACKEND_URL}/api`;
 
@@ -99,7 +100,7 @@ const FamiliesPage = () => {
                 >
                   <div className="h-48 bg-gradient-to-br from-emerald-100 to-emerald-200 flex items-center justify-center">
                     {family.image ? (
-                      <img src={family.image} alt={family.name} className="w-full h-full object-cover" />
+                      <img src={resolveImageUrl(family.image)} alt={family.name} className="w-full h-full object-cover" />
                     ) : (
                       <Users className="w-20 h-20 text-emerald-700" />
                     )}
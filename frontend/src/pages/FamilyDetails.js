@@ -11,6 +11,7 @@ import {
 } from 'lucide-react';
 import { useAuth } from '../context/AuthContext';
 import { toast } from 'sonner';
+import { resolveImageUrl } from '@/lib/utils';
 
 const API_URL = `${process.env.REACT_APP_BACKEND_URL}/api`;
 
@@ -1113,7 +1114,7 @@ const FamilyDetails = () => {
                           className="relative aspect-video rounded-lg overflow-hidden group cursor-pointer shadow-md hover:shadow-xl transition-all"
                         >
                           <img
-                            src={image}
+                            src={resolveImageUrl(image)}
                             alt={`صورة ${index + 1}`}
                             className="w-full h-full object-cover group-hover:scale-110 transition-transform duration-300"
                           />
@@ -1703,7 +1704,7 @@ const FamilyDetails = () => {
             onClick={(e) => e.stopPropagation()}
           >
             <img
-              src={familyImages[currentImageIndex]}
+              src={resolveImageUrl(familyImages[currentImageIndex])}
               alt={`صورة ${currentImageIndex + 1}`}
               className="max-w-full max-h-full object-contain rounded-lg shadow-2xl"
             />
@@ -1726,7 +1727,7 @@ const FamilyDetails = () => {
                   }`}
                 >
                   <img
-                    src={image}
+                    src={resolveImageUrl(image)}
                     alt={`صورة مصغرة ${index + 1}`}
                     className="w-full h-full object-cover"
                   />
@@ -2632,7 +2633,7 @@ const FamilyDetails = () => {
                           onClick={() => openDonationImageModal(selectedDonation.completion_images, idx)}
                         >
                           <img
-                            src={img}
+                            src={resolveImageUrl(img)}
                             alt={`وصل ${idx + 1}`}
                             className="w-full h-32 object-cover rounded-lg border-2 border-white shadow"
                           />
@@ -2714,7 +2715,7 @@ const FamilyDetails = () => {
               onClick={(e) => e.stopPropagation()}
             >
               <img
-                src={currentImages[selectedImageIndex]}
+                src={resolveImageUrl(currentImages[selectedImageIndex])}
                 alt={`صورة ${selectedImageIndex + 1}`}
                 style={{
                   maxWidth: '95vw',
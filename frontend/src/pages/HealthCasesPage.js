@@ -13,6 +13,7 @@ import { Progress } from '@/components/ui/progress';
 import { toast } from 'sonner';
 import { Heart, Activity } from 'lucide-react';
 import { useAuth } from '../context/AuthContext';
+import { resolveImageUrl } from '@/lib/utils';
 
 const API_URL = `${process.env.REACT_APP_BACKEND_URL}/api`;
 
@@ -102,7 +103,7 @@ const HealthCasesPage = () => {
                   >
                     <div className="h-48 bg-gradient-to-br from-rose-100 to-rose-200 flex items-center justify-center">
                       {healthCase.image ? (
-                        <img src={healthCase.image} alt={healthCase.patient_name} className="w-full h-full object-cover" />
+                        <img src={resolveImageUrl(healthCase.image)} alt={healthCase.patient_name} className="w-full h-full object-cover" />
                       ) : (
                         <Activity className="w-20 h-20 text-rose-700" />
                       )}
@@ -8,6 +8,7 @@ import {
   Stethoscope, Package, TestTube, Check, X, AlertCircle,
   ChevronDown, ChevronUp
 } from 'lucide-react';
+import { resolveImageUrl } from '@/lib/utils';
 
 const API_URL = process.env.REACT_APP_BACKEND_URL;
 
@@ -325,7 +326,7 @@ const HealthcareManagement = () => {
                   {/* Card Header with Image */}
                   <div className="relative h-40 bg-gradient-to-br from-gray-100 to-gray-200">
                     <img
-                      src={provider.image || getDefaultImage(provider.type)}
+                      src={resolveImageUrl(provider.image) || getDefaultImage(provider.type)}
                       alt={provider.full_name}
                       className="w-full h-full object-cover"
                     />
@@ -4,6 +4,7 @@ import axios from 'axios';
 import Navbar from '../components/Navbar';
 import Footer from '../components/Footer';
 import LoadingLogo from '../components/LoadingLogo';
+import { resolveImageUrl } from '@/lib/utils';
 
 const API_URL = `${process.env.REACT_APP_BACKEND_URL}/api`;
 
@@ -48,7 +49,7 @@ const HomePage = () => {
       <section 
         className="hero"
         style={heroContent?.background_image ? {
-          background: `linear-gradient(rgba(4, 51, 43, 0.9), rgba(4, 51, 43, 0.8)), url(${heroContent.background_image})`,
+          background: `linear-gradient(rgba(4, 51, 43, 0.9), rgba(4, 51, 43, 0.8)), url(${resolveImageUrl(heroContent.background_image)})`,
           backgroundSize: 'cover',
           backgroundPosition: 'center'
         } : {}}
@@ -6,6 +6,7 @@ import LoadingLogo from '../components/LoadingLogo';
 import { toast } from 'sonner';
 import { Heart, Calendar, Clock, Phone, Gift, Eye, AlertTriangle, Image as ImageIcon, ChevronLeft, ChevronRight, X } from 'lucide-react';
 import { Dialog, DialogContent } from '@/components/ui/dialog';
+import { resolveImageUrl } from '@/lib/utils';
 
 const API_URL = `${process.env.REACT_APP_BACKEND_URL}/api`;
 
@@ -365,7 +366,7 @@ const MyDonationsPage = () => {
                                       className="relative aspect-square rounded-lg overflow-hidden cursor-pointer group border-2 border-green-200 hover:border-green-400 transition-all"
                                     >
                                       <img
-                                        src={image}
+                                        src={resolveImageUrl(image)}
                                         alt={`صورة استلام ${idx + 1}`}
                                         className="w-full h-full object-cover group-hover:scale-110 transition-transform"
                                       />
@@ -458,7 +459,7 @@ const MyDonationsPage = () => {
             <div className="relative w-full h-[70vh] flex items-center justify-center bg-black">
               {currentImages.length > 0 && (
                 <img
-                  src={currentImages[currentImageIndex]}
+                  src={resolveImageUrl(currentImages[currentImageIndex])}
                   alt={`صورة ${currentImageIndex + 1}`}
                   className="max-w-full max-h-full object-contain"
                 />
@@ -494,7 +495,7 @@ const MyDonationsPage = () => {
                       idx === currentImageIndex ? 'border-white scale-110' : 'border-transparent opacity-60 hover:opacity-100'
                     }`}
                   >
-                    <img src={img} alt={`Thumbnail ${idx + 1}`} className="w-full h-full object-cover" />
+                    <img src={resolveImageUrl(img)} alt={`Thumbnail ${idx + 1}`} className="w-full h-full object-cover" />
                   </button>
                 ))}
               </div>
@@ -5,6 +5,7 @@ import Navbar from '../components/Navbar';
 import Footer from '../components/Footer';
 import LoadingLogo from '../components/LoadingLogo';
 import { toast } from 'sonner';
+import { resolveImageUrl } from '@/lib/utils';
 
 const API_URL = `${process.env.REACT_APP_BACKEND_URL}/api`;
 
@@ -39,7 +40,7 @@ const OurMissionPage = () => {
       <section 
         className="hero" 
         style={content?.hero_background_image ? {
-          background: `linear-gradient(rgba(4, 51, 43, 0.9), rgba(4, 51, 43, 0.8)), url(${content.hero_background_image})`,
+          background: `linear-gradient(rgba(4, 51, 43, 0.9), rgba(4, 51, 43, 0.8)), url(${resolveImageUrl(content.hero_background_image)})`,
           backgroundSize: 'cover',
           backgroundPosition: 'center',
           padding: '120px 0',
@@ -89,7 +90,7 @@ const OurMissionPage = () => {
             <div style={{flex: 1, minWidth: '300px', borderRadius: '15px', overflow: 'hidden', boxShadow: '0 15px 40px rgba(0,0,0,0.1)', border: '3px solid #b8a57b'}}>
               {content?.vision_image ? (
                 <img 
-                  src={content.vision_image} 
+                  src={resolveImageUrl(content.vision_image)} 
                   alt="قيادة وتنمية مجتمعية"
                   style={{width: '100%', height: 'auto', display: 'block'}}
                   onError={(e) => {
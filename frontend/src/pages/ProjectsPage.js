@@ -13,6 +13,7 @@ import { Progress } from '@/components/ui/progress';
 import { toast } from 'sonner';
 import { Building2, Heart } from 'lucide-react';
 import { useAuth } from '../context/AuthContext';
+import { resolveImageUrl } from '@/lib/utils';
 
 const API_URL = `${process.env.REACT_APP_BACKEND_URL}/api`;
 
@@ -102,7 +103,7 @@ const ProjectsPage = () => {
                   >
                     <div className="h-48 bg-gradient-to-br from-amber-100 to-amber-200 flex items-center justify-center">
                       {project.image ? (
-                        <img src={project.image} alt={project.title} className="w-full h-full object-cover" />
+                        <img src={resolveImageUrl(project.image)} alt={project.title} className="w-full h-full object-cover" />
                       ) : (
                         <Building2 className="w-20 h-20 text-amber-700" />
                       )}